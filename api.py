@@ -1,15 +1,59 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+from typing import Callable, Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from modules.data_input import DataInputValidator
-from modules.preprocessing import DataPreprocessor
+from modules.data_input import DataInputValidator, normalize_sections
 from modules.feature_engineering import FeatureEngineer
+from modules.reference_data import ReferenceData
 from modules.risk_scoring import RiskScorer
+from modules.metrics import REGISTRY, REQUESTS_TOTAL, StageTimer, observe_validation_errors, timing_requested
+
+METRICS_APP = "rules"
+
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "30"))
+REFERENCE_RELOAD_INTERVAL = float(os.getenv("REFERENCE_RELOAD_INTERVAL", "60"))
+
+# Rules come from RISK_RULES_PATH when set (reloaded when the file changes), else the built-in table.
+# Only the features the rules read are computed; a rule on a feature nothing provides fails here,
+# and a reloaded file with one is rejected in favour of the current rules
+RULES_SCORER = RiskScorer(rules_path=os.getenv("RISK_RULES_PATH") or None, engineer=FeatureEngineer())
+
+# Optional reference data that expands industry / region / postcode keys (reloaded when the file changes)
+REFERENCE = ReferenceData(os.environ["REFERENCE_DATA_PATH"]) if os.getenv("REFERENCE_DATA_PATH") else None
+
 
-app = FastAPI(title="AI Loan Risk Scoring API", version="1.0.0")
+async def watch_file(refresh: Callable[[], bool], interval: float):
+    """Call a rules or reference data refresh every interval seconds, off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(refresh)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    watchers = []
+    if RULES_SCORER.rules_path and RULES_RELOAD_INTERVAL > 0:
+        watchers.append(asyncio.create_task(watch_file(RULES_SCORER.refresh, RULES_RELOAD_INTERVAL)))
+    if REFERENCE is not None and REFERENCE_RELOAD_INTERVAL > 0:
+        watchers.append(asyncio.create_task(watch_file(REFERENCE.refresh, REFERENCE_RELOAD_INTERVAL)))
+    yield
+    for watcher in watchers:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+
+
+app = FastAPI(title="AI Loan Risk Scoring API", version="1.0.0", lifespan=lifespan)
 
 # Pydantic Model for request validation
+# Same schema as api_service.py; borrower_details is still accepted as the old name of borrower_profile
 class BorrowerInput(BaseModel):
-    borrower_details: dict
+    borrower_profile: Optional[dict] = None
+    borrower_details: Optional[dict] = None
     loan_details: dict
     property_details: dict
     fraud_risk_signals: dict
@@ -19,30 +63,47 @@ class BorrowerInput(BaseModel):
 def health_check():
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/score")
-def score(data: BorrowerInput):
+def score(data: BorrowerInput, request: Request, response: Response):
+    timer = StageTimer(METRICS_APP)
+    status_code = 200
     try:
-        data = data.dict()
+        data = normalize_sections(data.dict())
+        if REFERENCE is not None:
+            data = REFERENCE.resolve(data)
 
         # Step 1: Validate input
         validator = DataInputValidator()
         validation_result = validator.validate_input(data)
+        timer.mark("validation")
         if validation_result["status"] != "success":
+            observe_validation_errors(METRICS_APP, validation_result)
             raise HTTPException(status_code=400, detail=validation_result)
 
-        # Step 2: Preprocess
-        preprocessor = DataPreprocessor()
-        processed = preprocessor.preprocess(data)
-
-        # Step 3: Feature Engineering
-        engineer = FeatureEngineer()
-        engineered = engineer.calculate_features(processed, data)
+        # Step 2: Feature Engineering; a reloaded rules file may read different features,
+        # so the plan is taken from the same rule set that scores
+        rules = RULES_SCORER.rules
+        engineered = rules.feature_plan.compute(data)
+        timer.mark("feature_engineering")
 
-        # Step 4: Risk Scoring
-        scorer = RiskScorer()
-        risk_result = scorer.calculate_risk(engineered)
+        # Step 3: Risk Scoring
+        risk_result = rules.evaluate(engineered)
+        timer.mark("predict")
 
         return risk_result
 
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
     except Exception as e:
+        status_code = 500
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        timer.record()
+        REQUESTS_TOTAL.inc(METRICS_APP, "/score", str(status_code))
+        if timing_requested(request.headers):
+            response.headers["Server-Timing"] = timer.server_timing()
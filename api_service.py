@@ -1,48 +1,303 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from modules.data_input import DataInputValidator
-from modules.preprocessing import DataPreprocessor
-from modules.feature_engineering import FeatureEngineer
-from modules.ml_risk_scoring import AIRiskScorer
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager, suppress
+from typing import Any, List, Optional
+
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from modules.pipeline import ScoringPipeline
+from modules.batcher import MicroBatcher
+from modules.cache import ResultCache
+from modules.data_input import extract_scoring_fields, normalize_sections
+from modules.reference_data import ReferenceData
+from modules.executor import BoundedExecutor, DeadlineExceededError, QueueFullError
+from modules.shadow import ShadowRunner
+from modules.metrics import (REGISTRY, REQUESTS_TOTAL, StageTimer, observe_validation_errors,
+                             render_cache_stats, render_executor_stats, timing_requested)
+
+METRICS_APP = "ml"
+
+MODEL_PATH = os.getenv("MODEL_PATH", "modules/model.pkl")
+SCORING_ENGINE = os.getenv("SCORING_ENGINE", "compiled")
+REASON_SOURCE = os.getenv("REASON_SOURCE", "thresholds")
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+SCORING_CONCURRENCY = int(os.getenv("SCORING_CONCURRENCY", str(os.cpu_count() or 1)))
+SCORING_QUEUE_SIZE = int(os.getenv("SCORING_QUEUE_SIZE", "64"))
+SCORING_DEADLINE_MS = float(os.getenv("SCORING_DEADLINE_MS", "2000"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", "32"))
+SCORING_BATCH_WAIT_MS = float(os.getenv("SCORING_BATCH_WAIT_MS", "2"))
+SHADOW_SCORERS = os.getenv("SHADOW_SCORERS", "")
+SHADOW_LOG_PATH = os.getenv("SHADOW_LOG_PATH", "shadow_scores.jsonl")
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "10000"))
+REFERENCE_DATA_PATH = os.getenv("REFERENCE_DATA_PATH", "")
+REFERENCE_RELOAD_INTERVAL = float(os.getenv("REFERENCE_RELOAD_INTERVAL", "60"))
+
+
+async def watch_model(pipeline: ScoringPipeline, interval: float):
+    """Poll the model file and hot-reload it when a new one lands"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(pipeline.reload_if_changed)
+
+
+async def watch_reference_data(reference: ReferenceData, interval: float):
+    """Poll the reference data file and swap in new tables when it changes"""
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(reference.refresh)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cache = ResultCache(max_size=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL) if RESULT_CACHE_SIZE > 0 else None
+    shadow = None
+    if SHADOW_SCORERS:
+        shadow = ShadowRunner(SHADOW_SCORERS, SHADOW_LOG_PATH, model_path=MODEL_PATH,
+                              max_queue=SHADOW_QUEUE_SIZE, app=METRICS_APP)
+    reference = ReferenceData(REFERENCE_DATA_PATH) if REFERENCE_DATA_PATH else None
+    pipeline = ScoringPipeline(model_path=MODEL_PATH, engine=SCORING_ENGINE, cache=cache, shadow=shadow,
+                               reference=reference, reason_source=REASON_SOURCE)
+    pipeline.load()
+    app.state.pipeline = pipeline
+    app.state.executor = BoundedExecutor(max_workers=SCORING_CONCURRENCY, max_queue=SCORING_QUEUE_SIZE)
+    app.state.batcher = None
+    if SCORING_BATCH_SIZE > 1:
+        app.state.batcher = MicroBatcher(app.state.executor, max_batch_size=SCORING_BATCH_SIZE,
+                                         max_wait_ms=SCORING_BATCH_WAIT_MS, app=METRICS_APP)
+
+    watchers = []
+    if MODEL_RELOAD_INTERVAL > 0:
+        watchers.append(asyncio.create_task(watch_model(pipeline, MODEL_RELOAD_INTERVAL)))
+    if reference is not None and REFERENCE_RELOAD_INTERVAL > 0:
+        watchers.append(asyncio.create_task(watch_reference_data(reference, REFERENCE_RELOAD_INTERVAL)))
+    yield
+    for watcher in watchers:
+        watcher.cancel()
+        with suppress(asyncio.CancelledError):
+            await watcher
+    app.state.executor.shutdown()
+    if shadow is not None:
+        shadow.close()
+
+
+app = FastAPI(title="AI Loan Risk Scoring API", version="1.0.0", lifespan=lifespan)
+
+
+async def get_pipeline(request: Request) -> ScoringPipeline:
+    return request.app.state.pipeline
+
+
+async def get_executor(request: Request) -> BoundedExecutor:
+    return request.app.state.executor
+
+
+def request_deadline(request: Request) -> float:
+    """Seconds this request may spend scoring: X-Deadline-Ms if sent, else SCORING_DEADLINE_MS"""
+    value = request.headers.get("x-deadline-ms")
+    try:
+        deadline_ms = float(value) if value else SCORING_DEADLINE_MS
+    except ValueError:
+        deadline_ms = SCORING_DEADLINE_MS
+    return max(deadline_ms, 1.0) / 1000
+
+
+def score_payload(scorer, data: dict, timer: StageTimer) -> tuple:
+    """CPU-bound part of /score, run on the scoring executor; returns (features, result)"""
+    timer.mark("queue_wait")
+
+    # Step 2: Feature Engineering, only what the scorer (and any shadow scorer) reads
+    engineered = scorer.feature_plan.compute(data)
+    timer.mark("feature_engineering")
+
+    # Step 3: Risk Scoring
+    risk_result = scorer.calculate_risk(engineered)
+    timer.mark("predict")
+    return engineered, risk_result
 
-app = FastAPI(title="AI Loan Risk Scoring API", version="1.0.0")
 
 # Pydantic Model for request validation
+# borrower_details is the section name older rules-service clients send; it is read as borrower_profile
 class BorrowerInput(BaseModel):
-    borrower_profile: dict
+    borrower_profile: Optional[dict] = None
+    borrower_details: Optional[dict] = None
     loan_details: dict
     property_details: dict
     fraud_risk_signals: dict
     external_data: dict
 
+# /score checks this shape itself; the model still documents the body and reports bad ones
+SCORE_SECTIONS = ("loan_details", "property_details", "fraud_risk_signals", "external_data")
+SCORE_OPTIONAL_SECTIONS = ("borrower_profile", "borrower_details")
+SCORE_REQUEST_BODY = {"requestBody": {"required": True,
+                                      "content": {"application/json": {"schema": BorrowerInput.model_json_schema()}}}}
+
+
+def parse_score_body(body: bytes) -> dict:
+    """/score payload parsed with orjson and reduced to the fields scoring reads.
+
+    A body that is not a BorrowerInput is handed to the Pydantic model only to
+    raise the same 422 errors FastAPI would.
+    """
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                                       "input": {}, "ctx": {"error": e.msg}}])
+    if not (isinstance(payload, dict)
+            and all(isinstance(payload.get(section), dict) for section in SCORE_SECTIONS)
+            and all(isinstance(payload.get(section), (dict, type(None))) for section in SCORE_OPTIONAL_SECTIONS)):
+        try:
+            BorrowerInput.model_validate(payload, from_attributes=True)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])}
+                                          for error in e.errors(include_url=False)])
+    return extract_scoring_fields(normalize_sections(payload))
+
+
+def encode_result(result: dict) -> bytes:
+    """Result as JSON bytes, encoded once and reused for every cache hit"""
+    return orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def score_response(encoded: bytes, cache_hit: bool) -> Response:
+    # The encoded result is a JSON object: splice cache_hit in before its closing brace
+    body = encoded[:-1] + (b',"cache_hit":true}' if cache_hit else b',"cache_hit":false}')
+    return Response(content=body, media_type="application/json")
+
+
+# Items are plain dicts so one malformed application cannot reject the whole batch
+class BatchInput(BaseModel):
+    applications: List[Any]
+
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "API is running"}
 
-@app.post("/score")
-def score(data: BorrowerInput):
+@app.get("/ready")
+def readiness_check(pipeline: ScoringPipeline = Depends(get_pipeline)):
+    status = pipeline.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/cache/stats")
+def cache_stats(pipeline: ScoringPipeline = Depends(get_pipeline)):
+    if pipeline.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **pipeline.cache.stats()}
+
+@app.get("/metrics")
+def metrics(pipeline: ScoringPipeline = Depends(get_pipeline), executor: BoundedExecutor = Depends(get_executor)):
+    body = REGISTRY.render() + render_executor_stats(executor.stats())
+    if pipeline.cache is not None:
+        body += render_cache_stats(pipeline.cache.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.post("/score", openapi_extra=SCORE_REQUEST_BODY)
+async def score(request: Request, pipeline: ScoringPipeline = Depends(get_pipeline),
+                executor: BoundedExecutor = Depends(get_executor)):
+    timer = StageTimer(METRICS_APP)
+    status_code = 200
+    response = None
     try:
-        data = data.dict()
+        # A malformed body is a 422 before scoring starts, as with any FastAPI body model
+        data = parse_score_body(await request.body())
+        timer.mark("parse")
+
+        # Industry, region and postcode keys are expanded from the reference data, if configured
+        data = pipeline.resolve(data)
 
         # Step 1: Validate input
-        validator = DataInputValidator()
-        validation_result = validator.validate_input(data)
+        validation_result = pipeline.validator.validate_input(data)
+        timer.mark("validation")
         if validation_result["status"] != "success":
+            observe_validation_errors(METRICS_APP, validation_result)
             raise HTTPException(status_code=400, detail=validation_result)
 
-        # Step 2: Preprocess
-        preprocessor = DataPreprocessor()
-        processed = preprocessor.preprocess(data)
+        # Repeated payloads are served from the cache for the same model version
+        scorer = pipeline.scorer
+        cache_key = None
+        if pipeline.cache is not None:
+            cache_key = pipeline.cache.make_key(data, scorer.model_version)
+            cached = pipeline.cache.get(cache_key)
+            timer.mark("cache_lookup")
+            if cached is not None:
+                response = score_response(cached, cache_hit=True)
+                return response
 
-        # Step 3: Feature Engineering
-        engineer = FeatureEngineer()
-        engineered = engineer.calculate_features(processed, data)
+        # Steps 2-3 run on the bounded executor so the event loop never blocks on the model
+        batcher = request.app.state.batcher
+        try:
+            if batcher is None:
+                engineered, risk_result = await executor.run(score_payload, scorer, data, timer,
+                                                             timeout=request_deadline(request))
+            else:
+                # Features are cheap; only the model call is coalesced with concurrent requests
+                engineered = scorer.feature_plan.compute(data)
+                timer.mark("feature_engineering")
+                risk_result = await batcher.predict(scorer, engineered, timeout=request_deadline(request))
+                timer.mark("batch_predict")
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+        except DeadlineExceededError as e:
+            raise HTTPException(status_code=504, detail=str(e))
 
-        # Step 4: Risk Scoring
-        scorer = AIRiskScorer()
-        risk_result = scorer.calculate_risk(engineered)
+        encoded = encode_result(risk_result)
+        if cache_key is not None:
+            pipeline.cache.put(cache_key, encoded)
+        response = score_response(encoded, cache_hit=False)
+        if pipeline.shadow is not None:
+            # Shadow scorers reuse these features on their own thread; this only enqueues them
+            request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+            pipeline.shadow.submit(request_id, engineered, risk_result, scorer.model_version)
+            response.headers["X-Request-Id"] = request_id
+        return response
 
-        return risk_result
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    except RequestValidationError:
+        status_code = 422
+        raise
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        timer.record()
+        REQUESTS_TOTAL.inc(METRICS_APP, "/score", str(status_code))
+        if response is not None and timing_requested(request.headers):
+            response.headers["Server-Timing"] = timer.server_timing()
 
+@app.post("/score/batch")
+def score_batch(data: BatchInput, pipeline: ScoringPipeline = Depends(get_pipeline)):
+    if len(data.applications) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds limit of {MAX_BATCH_SIZE}")
+    timer = StageTimer(METRICS_APP)
+    try:
+        applications = [normalize_sections(a) if isinstance(a, dict) else a for a in data.applications]
+        results = pipeline.score_batch(applications)
+        timer.mark("batch")
     except Exception as e:
+        REQUESTS_TOTAL.inc(METRICS_APP, "/score/batch", "500")
         raise HTTPException(status_code=500, detail=str(e))
+    timer.record()
+    REQUESTS_TOTAL.inc(METRICS_APP, "/score/batch", "200")
+    for result in results:
+        if result["status"] != "success":
+            observe_validation_errors(METRICS_APP, result)
+
+    failed = sum(1 for r in results if r["status"] != "success")
+    return {
+        "count": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
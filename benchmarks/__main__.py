@@ -0,0 +1,87 @@
+import argparse
+import sys
+
+from benchmarks.harness import BenchmarkSuite, compare_reports, load_report, save_report
+from benchmarks.pipeline import bench_api, bench_stages
+from modules.ml_risk_scoring import ENGINES
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Offline benchmarks for every pipeline stage, both scoring engines and the /score API."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(p):
+        p.add_argument("--rows", type=int, default=1000, help="Rows per batch and per-call sample size (default: 1000)")
+        p.add_argument("--repeat", type=int, default=20, help="Timed repetitions of each batched case (default: 20)")
+        p.add_argument("--api-requests", type=int, default=500, help="Requests per /score case (default: 500)")
+        p.add_argument("--engine", choices=ENGINES, action="append", help="Engine(s) to benchmark (default: all)")
+        p.add_argument("--only", action="append", help="Run only cases whose name contains this text (repeatable)")
+        p.add_argument("--store", help="Feature store of loan_risk_dataset.csv for the batched stage cases")
+
+    run = sub.add_parser("run", help="Run the suite and write a JSON report")
+    add_run_options(run)
+    run.add_argument("-o", "--output", default="benchmark_results.json",
+                     help="Report path (default: benchmark_results.json)")
+
+    compare = sub.add_parser("compare", help="Flag slowdowns against a stored baseline report")
+    compare.add_argument("baseline", help="Baseline report from `run`")
+    compare.add_argument("current", nargs="?", help="Report to compare; runs the suite when omitted")
+    compare.add_argument("--metric", default="p50_us", choices=["p50_us", "p95_us", "p99_us", "mean_us"],
+                         help="Latency metric to compare (default: p50_us)")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="Relative slowdown that counts as a regression (default: 0.10)")
+    add_run_options(compare)
+    compare.add_argument("-o", "--output", help="Also save the fresh report here")
+    return parser.parse_args(argv)
+
+
+def run_suite(args) -> dict:
+    engines = args.engine or ENGINES
+    suite = BenchmarkSuite(only=args.only)
+    bench_stages(suite, rows=args.rows, repeat=args.repeat, engines=engines, store=args.store)
+    bench_api(suite, requests=args.api_requests, engines=engines)
+    return suite.report({"rows": args.rows, "repeat": args.repeat, "api_requests": args.api_requests,
+                         "engines": list(engines), "store": args.store})
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.command == "run":
+        report = run_suite(args)
+        save_report(report, args.output)
+        print(f"✅ Wrote {len(report['results'])} results to {args.output}")
+        return 0
+
+    baseline = load_report(args.baseline)
+    if args.current:
+        current = load_report(args.current)
+    else:
+        current = run_suite(args)
+        if args.output:
+            save_report(current, args.output)
+
+    rows = compare_reports(baseline, current, metric=args.metric, threshold=args.threshold)
+    # Cases filtered out with --only are not missing
+    selected = BenchmarkSuite(only=args.only)
+    rows = [row for row in rows if row["status"] != "missing" or selected.wanted(row["case"])]
+    print(f"\n{'case':<45} {'baseline':>12} {'current':>12} {'ratio':>7}  status ({args.metric})")
+    for row in rows:
+        before = f"{row['baseline']:,.1f}" if row["baseline"] is not None else "-"
+        now = f"{row['current']:,.1f}" if row["current"] is not None else "-"
+        ratio = f"{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+        print(f"{row['case']:<45} {before:>12} {now:>12} {ratio:>7}  {row['status']}")
+
+    slower = [row["case"] for row in rows if row["status"] == "slower"]
+    if slower:
+        print(f"\n❌ {len(slower)} case(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(slower)}")
+        return 1
+    print(f"\n✅ No case slower than baseline by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
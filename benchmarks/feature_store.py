@@ -0,0 +1,131 @@
+"""Load time and resident memory: pd.read_csv versus the memory-mapped feature store.
+
+    python -m benchmarks.feature_store --rows 10000 1000000 10000000 --workdir /tmp/store-bench
+
+For each size a synthetic CSV is drawn (rows sampled with replacement from
+loan_risk_dataset.csv) and converted to a store. Each loader then runs in a fresh
+process, which reports open time and RSS, followed by the time and RSS of one
+full pass over every column.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.pipeline import LOAN_DATASET
+from modules.dataset import DATASET_DTYPES, csv_dtypes
+from modules.feature_store import FeatureStore, write_store
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.feature_store",
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000, 10000000],
+                        help="Dataset sizes (default: 10000 1000000 10000000)")
+    parser.add_argument("--workdir", default="store_bench", help="Where generated files go (default: store_bench)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def synthesize(path: str, n_rows: int, seed: int, block: int = 500000) -> None:
+    source = pd.read_csv(LOAN_DATASET, dtype=csv_dtypes(DATASET_DTYPES))
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, block):
+        sample = source.iloc[rng.integers(0, len(source), min(block, n_rows - start))]
+        sample.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _scan(df: pd.DataFrame) -> None:
+    # Touch every value once, as a scoring pass would
+    for name in df.columns:
+        values = df[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            np.bincount(values.array.codes + 1)
+        elif values.dtype.kind in "fiub":
+            np.asarray(values).sum()
+        else:
+            values.isna().sum()
+
+
+def measure(kind: str, path: str) -> dict:
+    """Runs inside the child process"""
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    if kind == "csv":
+        header = pd.read_csv(path, nrows=0).columns
+        df = pd.read_csv(path, dtype=csv_dtypes(header))
+    else:
+        df = FeatureStore(path).frame()
+    opened = time.perf_counter()
+    rss_open = _rss_mb()
+    _scan(df)
+    scanned = time.perf_counter()
+    return {
+        "open_seconds": round(opened - started, 4),
+        "open_rss_mb": round(rss_open - baseline, 1),
+        "scan_seconds": round(scanned - opened, 4),
+        "scan_rss_mb": round(_rss_mb() - baseline, 1),
+    }
+
+
+def run_child(kind: str, path: str) -> dict:
+    result = subprocess.run([sys.executable, "-m", "benchmarks.feature_store", "--measure", kind, path],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": f"exit code {result.returncode}" + (" (killed, likely out of memory)"
+                                                              if result.returncode < 0 else "")}
+    return json.loads(result.stdout)
+
+
+def main(argv=None) -> int:
+    if argv is None and len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+        return 0
+
+    args = parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for n_rows in args.rows:
+        csv_path = os.path.join(args.workdir, f"loans_{n_rows}.csv")
+        store_path = os.path.join(args.workdir, f"loans_{n_rows}.store")
+        if not os.path.exists(csv_path):
+            synthesize(csv_path, n_rows, args.seed)
+        started = time.perf_counter()
+        write_store(csv_path, store_path)
+        convert_seconds = time.perf_counter() - started
+
+        store_bytes = sum(os.path.getsize(os.path.join(store_path, f)) for f in os.listdir(store_path))
+        row = {"rows": n_rows, "csv_mb": round(os.path.getsize(csv_path) / 2**20, 1),
+               "store_mb": round(store_bytes / 2**20, 1), "convert_seconds": round(convert_seconds, 2),
+               "csv": run_child("csv", csv_path), "store": run_child("store", store_path)}
+        results.append(row)
+
+        print(f"{n_rows:>11,} rows: CSV {row['csv_mb']:,.1f} MB, store {row['store_mb']:,.1f} MB "
+              f"(converted in {row['convert_seconds']:.1f}s)")
+        for kind in ("csv", "store"):
+            r = row[kind]
+            if "error" in r:
+                print(f"    {kind:<6} {r['error']}")
+                continue
+            print(f"    {kind:<6} open {r['open_seconds']:>8.3f}s  RSS +{r['open_rss_mb']:>8,.1f} MB   "
+                  f"full scan {r['scan_seconds']:>7.3f}s  RSS +{r['scan_rss_mb']:>8,.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
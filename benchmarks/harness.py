@@ -0,0 +1,117 @@
+import gc
+import json
+import platform
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Percentiles reported for every case
+PERCENTILES = (50, 95, 99)
+
+
+def _summary(samples: List[float], items_per_call: int) -> Dict[str, Any]:
+    seconds = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(seconds, PERCENTILES)
+    return {
+        "calls": len(seconds),
+        "items_per_call": items_per_call,
+        "p50_us": round(p50 * 1e6, 3),
+        "p95_us": round(p95 * 1e6, 3),
+        "p99_us": round(p99 * 1e6, 3),
+        "mean_us": round(seconds.mean() * 1e6, 3),
+        "items_per_sec": round(items_per_call / p50, 1) if p50 > 0 else None,
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], inputs: List[Any], repeat: int = 1, warmup: int = 20,
+               items_per_call: int = 1) -> Dict[str, Any]:
+    """Time fn(x) once per input (per repeat), after a few untimed warm-up calls.
+
+    Garbage collection is paused while timing so collector pauses land between
+    cases rather than inside a random sample.
+    """
+    for x in inputs[:warmup]:
+        fn(x)
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        clock = time.perf_counter
+        for _ in range(repeat):
+            for x in inputs:
+                started = clock()
+                fn(x)
+                samples.append(clock() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return _summary(samples, items_per_call)
+
+
+class BenchmarkSuite:
+    """Collects named cases and their timings into one JSON-friendly report"""
+
+    def __init__(self, only: Optional[List[str]] = None, verbose: bool = True):
+        self.only = only
+        self.verbose = verbose
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def wanted(self, name: str) -> bool:
+        return not self.only or any(pattern in name for pattern in self.only)
+
+    def run(self, name: str, fn: Callable[[Any], Any], inputs: List[Any], **kwargs) -> None:
+        if not self.wanted(name):
+            return
+        result = time_calls(fn, inputs, **kwargs)
+        self.results[name] = result
+        if self.verbose:
+            print(f"{name:<45} p50 {result['p50_us']:>12,.1f}us  p95 {result['p95_us']:>12,.1f}us  "
+                  f"p99 {result['p99_us']:>12,.1f}us  {result['items_per_sec']:>12,.0f} items/s")
+
+    def report(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "config": config,
+            "results": self.results,
+        }
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], metric: str = "p50_us",
+                    threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """Per-case ratio current/baseline on a latency metric; above 1 + threshold is a regression"""
+    rows = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before.get(metric):
+            rows.append({"case": name, "baseline": None, "current": now[metric], "ratio": None, "status": "new"})
+            continue
+        ratio = now[metric] / before[metric]
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"case": name, "baseline": before[metric], "current": now[metric],
+                     "ratio": round(ratio, 3), "status": status})
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            rows.append({"case": name, "baseline": baseline["results"][name][metric], "current": None,
+                         "ratio": None, "status": "missing"})
+    return rows
@@ -0,0 +1,91 @@
+"""Burst load test for a running scoring service.
+
+    uvicorn api_service:app --port 10000 &
+    python -m benchmarks.loadtest --url http://127.0.0.1:10000 --concurrency 200 --requests 4000
+
+Sends --requests /score calls with at most --concurrency outstanding at once and
+prints latency percentiles per HTTP status, so the effect of SCORING_CONCURRENCY,
+SCORING_QUEUE_SIZE and SCORING_DEADLINE_MS on tail latency and shedding is visible.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from benchmarks.harness import PERCENTILES
+from benchmarks.pipeline import LOAN_DATASET, api_payload, load_applications
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:10000", help="Service base URL")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests (default: 2000)")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests outstanding at once (default: 100)")
+    parser.add_argument("--distinct", type=int, default=1000,
+                        help="Distinct payloads cycled through, from loan_risk_dataset.csv (default: 1000)")
+    parser.add_argument("--deadline-ms", type=float, help="Send X-Deadline-Ms with every request")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client-side timeout in seconds (default: 30)")
+    parser.add_argument("-o", "--output", help="Also write the summary as JSON")
+    return parser.parse_args(argv)
+
+
+async def run_load(url: str, payloads: list, n_requests: int, concurrency: int, headers: dict,
+                   timeout: float) -> dict:
+    import httpx
+
+    latencies = defaultdict(list)
+    next_index = 0
+
+    async def worker(client):
+        nonlocal next_index
+        while next_index < n_requests:
+            payload = payloads[next_index % len(payloads)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post("/score", json=payload, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[status].append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summary = {"requests": n_requests, "concurrency": concurrency, "seconds": round(elapsed, 3),
+               "requests_per_sec": round(n_requests / elapsed, 1), "by_status": {}}
+    for status, samples in sorted(latencies.items()):
+        p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, PERCENTILES)
+        summary["by_status"][status] = {"count": len(samples), "p50_ms": round(p50, 2),
+                                        "p95_ms": round(p95, 2), "p99_ms": round(p99, 2),
+                                        "max_ms": round(max(samples) * 1000, 2)}
+    return summary
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    payloads = [api_payload(row) for row in load_applications(LOAN_DATASET, args.distinct).to_dict("records")]
+    headers = {"X-Deadline-Ms": str(args.deadline_ms)} if args.deadline_ms else {}
+
+    summary = asyncio.run(run_load(args.url, payloads, args.requests, args.concurrency, headers, args.timeout))
+
+    print(f"{summary['requests']:,} requests, concurrency {summary['concurrency']}, "
+          f"{summary['seconds']:.2f}s ({summary['requests_per_sec']:,.0f} req/s)")
+    for status, row in summary["by_status"].items():
+        print(f"  {status:>6}: {row['count']:>7,}  p50 {row['p50_ms']:>8.1f}ms  p95 {row['p95_ms']:>8.1f}ms  "
+              f"p99 {row['p99_ms']:>8.1f}ms  max {row['max_ms']:>8.1f}ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
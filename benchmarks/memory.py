@@ -0,0 +1,134 @@
+"""Per-worker memory of the scoring service under uvicorn --workers (Linux).
+
+    python -m benchmarks.memory --workers 1 4 16
+    MODEL_PATH=modules/model_forest.npz python -m benchmarks.memory --workers 1 4 16
+
+Starts `uvicorn api_service:app --workers N` for each N, waits until every worker has
+loaded and warmed its model, sends a few /score requests, then reads each worker's
+/proc/<pid>/smaps_rollup. RSS counts every resident page a worker touches, shared or
+not; PSS splits shared pages between the processes mapping them, so PSS x workers is
+what the host actually spends; private is what each extra worker adds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+# smaps_rollup fields reported, in kB
+MEMORY_FIELDS = {"rss": "Rss", "pss": "Pss", "private": ("Private_Clean", "Private_Dirty")}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory", description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16], help="Worker counts (default: 1 4 16)")
+    parser.add_argument("--port", type=int, default=10080, help="Port the service listens on (default: 10080)")
+    parser.add_argument("--requests", type=int, default=200, help="/score calls before measuring (default: 200)")
+    parser.add_argument("--startup-timeout", type=float, default=300.0,
+                        help="Seconds to wait for every worker to start (default: 300)")
+    parser.add_argument("-o", "--output", help="Also write the summary as JSON")
+    return parser.parse_args(argv)
+
+
+def read_memory(pid: int) -> dict:
+    """RSS, PSS and private memory of one process, in MiB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    memory = {}
+    for name, keys in MEMORY_FIELDS.items():
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        memory[name] = sum(fields.get(k, 0) for k in keys) / 1024
+    return memory
+
+
+def worker_pids(master: int) -> list:
+    """Scoring processes: uvicorn's spawned workers, or the master itself when it runs alone"""
+    pids = []
+    for task in os.listdir(f"/proc/{master}/task"):
+        with open(f"/proc/{master}/task/{task}/children") as f:
+            pids += [int(pid) for pid in f.read().split()]
+    workers = []
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except FileNotFoundError:
+            continue
+        if b"resource_tracker" not in cmdline:
+            workers.append(pid)
+    return workers or [master]
+
+
+def measure(n_workers: int, port: int, n_requests: int, startup_timeout: float) -> dict:
+    import httpx
+    from main import SAMPLE_INPUT
+
+    command = [sys.executable, "-m", "uvicorn", "api_service:app", "--port", str(port), "--workers", str(n_workers),
+               "--no-access-log"]
+    env = {**os.environ, "SHADOW_SCORERS": ""}
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+    started_workers = []
+
+    def watch_log():
+        for line in process.stderr:
+            if "Application startup complete" in line:
+                started_workers.append(time.monotonic())
+
+    threading.Thread(target=watch_log, daemon=True).start()
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while len(started_workers) < n_workers:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{len(started_workers)} of {n_workers} workers started")
+            time.sleep(0.2)
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            for _ in range(n_requests):
+                client.post("/score", json=SAMPLE_INPUT).raise_for_status()
+        # Let lazy work settle before reading the counters
+        time.sleep(1.0)
+
+        per_worker = [read_memory(pid) for pid in worker_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    summary = {"workers": n_workers, "measured": len(per_worker)}
+    for name in MEMORY_FIELDS:
+        values = np.asarray([m[name] for m in per_worker])
+        summary[f"{name}_mib"] = round(float(values.mean()), 1)
+    summary["host_pss_mib"] = round(sum(m["pss"] for m in per_worker), 1)
+    return summary
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    engine = os.getenv("SCORING_ENGINE", "compiled")
+    model_path = os.getenv("MODEL_PATH", "modules/model.pkl")
+    print(f"SCORING_ENGINE={engine} MODEL_PATH={model_path}")
+
+    summaries = []
+    for n_workers in args.workers:
+        summary = measure(n_workers, args.port, args.requests, args.startup_timeout)
+        summaries.append(summary)
+        print(f"  {n_workers:>3} workers: per worker RSS {summary['rss_mib']:>7.1f} MiB  "
+              f"PSS {summary['pss_mib']:>7.1f} MiB  private {summary['private_mib']:>7.1f} MiB  "
+              f"host PSS {summary['host_pss_mib']:>8.1f} MiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"engine": engine, "model_path": model_path, "results": summaries}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
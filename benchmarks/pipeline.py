@@ -0,0 +1,182 @@
+import os
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from benchmarks.harness import BenchmarkSuite
+from modules.data_input import DataInputValidator
+from modules.dataset import csv_dtypes, row_to_payload
+from modules.feature_engineering import FeatureEngineer
+from modules.feature_store import FeatureStore
+from modules.ml_risk_scoring import ENGINES, AIRiskScorer
+from modules.preprocessing import DataPreprocessor
+from modules.risk_scoring import RiskScorer
+
+LOAN_DATASET = "loan_risk_dataset.csv"
+SYNTHETIC_DATASET = "synthetic_loan_data.csv"
+
+# The pickled forest costs milliseconds per single-row call; cap its per-call samples
+SLOW_CALL_LIMIT = 200
+# income_sources and anomaly_patterns entries in the .large /score payloads
+LARGE_PAYLOAD_ENTRIES = 500
+
+
+def load_applications(path: str, n_rows: int) -> pd.DataFrame:
+    """First n_rows of a loan_risk_dataset.csv-layout file, read with the portfolio dtypes"""
+    header = pd.read_csv(path, nrows=0).columns
+    return pd.read_csv(path, nrows=n_rows, dtype=csv_dtypes(header))
+
+
+def load_model_features(path: str, n_rows: int) -> pd.DataFrame:
+    """Scorer inputs built from synthetic_loan_data.csv, the data the model was trained on.
+
+    The synthetic data has no document or identity signals, so the fraud and
+    falling-price flags are taken straight from fraud_flag and price_trend.
+    """
+    data = pd.read_csv(path, nrows=n_rows)
+    return pd.DataFrame({
+        "credit_score_normalized": data["credit_score"] / 850.0,
+        "dti_ratio": data["dti_ratio"],
+        "ltv_ratio": data["ltv_ratio"],
+        "flag_fraud": data["fraud_flag"].astype(int),
+        "flag_falling_property": (data["price_trend"] == "falling").astype(int),
+    })
+
+
+def api_payload(row: Dict[str, Any]) -> Dict[str, Any]:
+    """A dataset row as a complete /score payload.
+
+    The dataset has no income_sources or bank_transactions, which the API schema
+    requires, so a single income source is derived from annual income.
+    """
+    payload = row_to_payload(row)
+    monthly_income = float(row["income"]) / 12
+    payload["borrower_profile"]["income_sources"] = [{
+        "source": str(row["employment_type"]),
+        "monthly_average_income": monthly_income,
+        "income_stability_score": 0.7
+    }]
+    payload["borrower_profile"]["bank_transactions"] = {
+        "average_monthly_balance": monthly_income / 3,
+        "transaction_variance": 0.3
+    }
+    return payload
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [{k: (v.item() if hasattr(v, "item") else v) for k, v in row.items()}
+            for row in frame.to_dict("records")]
+
+
+def bench_stages(suite: BenchmarkSuite, rows: int, repeat: int, engines=ENGINES, store: str = None) -> None:
+    """Per-call and batched timings for every pipeline stage.
+
+    With store, the batched cases read a feature store (python -m modules.feature_store)
+    of loan_risk_dataset.csv instead of the parsed CSV.
+    """
+    applications = load_applications(LOAN_DATASET, rows)
+    payloads = [api_payload(row) for row in applications.to_dict("records")]
+    if store:
+        applications = FeatureStore(store).frame(stop=rows)
+    batch = len(payloads)
+    batch_kwargs = {"repeat": repeat, "warmup": 2, "items_per_call": batch}
+
+    # ---------------- Validation ----------------
+    validator = DataInputValidator()
+    suite.run("validator.single", validator.validate_input, payloads)
+    suite.run("validator.batch", validator.validate_batch, [payloads], **batch_kwargs)
+    suite.run("validator.frame", validator.validate_frame, [applications], **batch_kwargs)
+
+    # ---------------- Preprocessing ----------------
+    preprocessor = DataPreprocessor()
+    suite.run("preprocessor.single", preprocessor.preprocess, payloads)
+
+    # ---------------- Feature engineering ----------------
+    engineer = FeatureEngineer()
+    processed = [(preprocessor.preprocess(p), p) for p in payloads]
+    suite.run("features.single", lambda args: engineer.calculate_features(*args), processed)
+    # Only the subgraph the model reads, as /score computes it
+    suite.run("features.model", engineer.plan(AIRiskScorer.input_features).compute, payloads)
+    suite.run("features.frame", engineer.calculate_features_frame, [applications], **batch_kwargs)
+
+    # ---------------- Scoring ----------------
+    model_frame = load_model_features(SYNTHETIC_DATASET, rows)
+    model_inputs = _records(model_frame)
+    scoring_kwargs = {"repeat": repeat, "warmup": 2, "items_per_call": len(model_inputs)}
+
+    rules = RiskScorer()
+    suite.run("rules.single", rules.calculate_risk, model_inputs)
+    suite.run("rules.loop", lambda rows_: [rules.calculate_risk(f) for f in rows_], [model_inputs],
+              **scoring_kwargs)
+    suite.run("rules.batch", rules.calculate_risk_batch, [model_inputs], **scoring_kwargs)
+    suite.run("rules.frame", rules.calculate_risk_frame, [model_frame], **scoring_kwargs)
+
+    for engine in engines:
+        if not any(suite.wanted(f"ml.{engine}.{mode}") for mode in ("single", "batch", "frame")):
+            continue
+        scorer = AIRiskScorer(engine=engine)
+        single_inputs = model_inputs if engine == "compiled" else model_inputs[:SLOW_CALL_LIMIT]
+        suite.run(f"ml.{engine}.single", scorer.calculate_risk, single_inputs)
+        suite.run(f"ml.{engine}.batch", scorer.calculate_risk_batch, [model_inputs], **scoring_kwargs)
+        suite.run(f"ml.{engine}.frame", scorer.calculate_risk_frame, [model_frame], **scoring_kwargs)
+
+    # TreeSHAP reasons over the compiled node arrays
+    if any(suite.wanted(f"ml.compiled.explain.{mode}") for mode in ("single", "frame")):
+        explainer = AIRiskScorer(engine="compiled", reason_source="attributions")
+        suite.run("ml.compiled.explain.single", explainer.calculate_risk, model_inputs)
+        suite.run("ml.compiled.explain.frame", explainer.calculate_risk_frame, [model_frame], **scoring_kwargs)
+
+
+def large_payload(payload: Dict[str, Any], entries: int = LARGE_PAYLOAD_ENTRIES) -> Dict[str, Any]:
+    """payload with `entries` income sources and anomaly patterns"""
+    borrower = payload["borrower_profile"]
+    source = borrower["income_sources"][0]
+    return {
+        **payload,
+        "borrower_profile": {**borrower, "income_sources": [
+            {**source, "source": f"{source['source']}_{i}", "monthly_average_income": source["monthly_average_income"] / entries}
+            for i in range(entries)
+        ]},
+        "fraud_risk_signals": {**payload["fraud_risk_signals"],
+                               "anomaly_patterns": [f"pattern_{i}" for i in range(entries)]},
+    }
+
+
+def bench_api(suite: BenchmarkSuite, requests: int, engines=ENGINES) -> None:
+    """End-to-end /score latency through FastAPI's in-process ASGI client.
+
+    .sample posts main.py's example payload, .large payloads with LARGE_PAYLOAD_ENTRIES
+    income sources and anomaly patterns; both with the result cache off.
+    """
+    from fastapi.testclient import TestClient
+    import api_service
+    from main import SAMPLE_INPUT
+
+    rows = load_applications(LOAN_DATASET, requests).to_dict("records")
+    payloads = [api_payload(row) for row in rows]
+    variant_payloads = {".sample": [SAMPLE_INPUT] * len(payloads), ".large": [large_payload(p) for p in payloads]}
+    for engine in engines:
+        for variant in ("", ".cached", ".shadow", ".sample", ".large"):
+            name = f"api.{engine}.score{variant}"
+            if not suite.wanted(name):
+                continue
+            cached = variant == ".cached"
+            api_service.SCORING_ENGINE = engine
+            api_service.MODEL_RELOAD_INTERVAL = 0
+            api_service.RESULT_CACHE_SIZE = len(payloads) if cached else 0
+            # Shadow-score every request with the rule table and the other engine
+            other = "sklearn" if engine == "compiled" else "compiled"
+            api_service.SHADOW_SCORERS = f"rules,{other}" if variant == ".shadow" else ""
+            api_service.SHADOW_LOG_PATH = os.devnull
+            inputs = variant_payloads.get(variant, payloads)
+            inputs = inputs if engine == "compiled" else inputs[:SLOW_CALL_LIMIT]
+            with TestClient(api_service.app) as client:
+                def post(payload):
+                    response = client.post("/score", json=payload)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"/score returned {response.status_code}: {response.text}")
+                if cached:
+                    # Fill the cache so every timed request is a hit
+                    for payload in inputs:
+                        post(payload)
+                suite.run(name, post, inputs)
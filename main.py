@@ -5,9 +5,8 @@ from modules.ml_risk_scoring import AIRiskScorer
 import json
 import pandas as pd
 
-if __name__ == "__main__":
-    # Example input
-    sample_input = {
+# Example input, also posted by the /score benchmarks
+SAMPLE_INPUT = {
             "borrower_profile": {
             "employment_type": "gig_worker",
             "income_sources": [
@@ -119,6 +118,10 @@ if __name__ == "__main__":
                             "portfolio_concentration_risk": "high"
                             }
         }
+
+
+if __name__ == "__main__":
+    sample_input = SAMPLE_INPUT
      
 
     # Step 1: Validate input
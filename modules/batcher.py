@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from modules.executor import BoundedExecutor, DeadlineExceededError
+from modules.metrics import BATCH_QUEUE_WAIT_SECONDS, BATCH_SIZE
+
+
+def _score_batch(scorer, features_list: List[Dict[str, Any]]):
+    """(start time, one result per member); if the batch call fails, every member is scored
+    alone and a failing member's slot holds its exception instead of a result"""
+    started = time.monotonic()
+    try:
+        return started, scorer.calculate_risk_batch(features_list)
+    except Exception:
+        if len(features_list) == 1:
+            raise
+    results = []
+    for features in features_list:
+        try:
+            results.append(scorer.calculate_risk_batch([features])[0])
+        except Exception as e:
+            results.append(e)
+    return started, results
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-applicant predictions into one model call
+    - Requests arriving within max_wait_ms of the first share a batch
+    - While every executor worker is busy, partial batches keep filling instead of queueing
+    - A batch is sent as soon as it reaches max_batch_size
+    - Batches run on the bounded executor, so a full queue sheds the whole batch
+    - Only requests scored by the same model are batched together
+    - A member the model call fails on fails alone; the rest of its batch is still answered
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, executor: BoundedExecutor, max_batch_size: int = 32, max_wait_ms: float = 2.0,
+                 app: str = "ml"):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.app = app
+        # (features, future, enqueued_at, deadline)
+        self._pending: List[tuple] = []
+        self._scorer = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running = set()
+        self._busy = 0
+
+    async def predict(self, scorer, features: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Score one applicant's features as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        if self._pending and scorer is not self._scorer:
+            self._flush(force=True)
+
+        now = time.monotonic()
+        future = loop.create_future()
+        self._pending.append((features, future, now, now + timeout))
+        self._scorer = scorer
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"Scoring did not finish within {timeout * 1000:.0f}ms")
+
+    def _flush(self, force: bool = False) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        if not force and self._busy >= self.executor.max_workers and len(self._pending) < self.max_batch_size:
+            # Sent when a running batch finishes; a full batch goes out regardless
+            return
+        batch, self._pending = self._pending, []
+        self._busy += 1
+        BATCH_SIZE.observe(len(batch), self.app)
+        task = asyncio.get_running_loop().create_task(self._run(self._scorer, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, scorer, batch: List[tuple]) -> None:
+        # The batch is only worth running while some member is still waiting for it
+        timeout = max(max(item[3] for item in batch) - time.monotonic(), 0.001)
+        try:
+            started, results = await self.executor.run(_score_batch, scorer, [item[0] for item in batch],
+                                                       timeout=timeout)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._busy -= 1
+            if self._pending and self._timer is None:
+                self._flush()
+
+        BATCH_QUEUE_WAIT_SECONDS.observe_many([(started - item[2], (self.app,)) for item in batch])
+        for (_, future, _, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
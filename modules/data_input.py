@@ -1,76 +1,327 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, NamedTuple
 import json
+from functools import lru_cache
+
+# Field specs: a type (or tuple of types), a dict of nested fields,
+# or a one-item list holding the schema of every element of a non-empty list
+NUMBER = (int, float)
+
+
+class OptionalField(NamedTuple):
+    """Spec of a field callers may leave out (features fall back to a default); when sent it must match type"""
+    type: Any
+
+
+INPUT_SCHEMA = {
+    "borrower_profile": {
+        "employment_type": str,
+        "income_sources": [{
+            "source": str,
+            "monthly_average_income": NUMBER,
+            "income_stability_score": NUMBER
+        }],
+        "bank_transactions": {
+            "average_monthly_balance": NUMBER,
+            "transaction_variance": NUMBER
+        },
+        "credit_score": OptionalField(NUMBER)
+    },
+    "loan_details": {
+        "loan_amount": NUMBER,
+        "interest_rate": NUMBER,
+        "tenure_years": NUMBER,
+        "loan_to_value_ratio": OptionalField(NUMBER),
+        "debt_to_income_ratio": OptionalField(NUMBER)
+    },
+    "property_details": {
+        "declared_value": NUMBER,
+        "market_value": NUMBER
+    },
+    "fraud_risk_signals": {
+        "document_consistency_check": str
+    },
+    "external_data": {
+        "industry": str,
+        "industry_growth_rate": NUMBER
+    }
+}
+
+# How each section is named in error messages
+SECTION_LABELS = {
+    "borrower_profile": "borrower",
+    "loan_details": "loan",
+    "property_details": "property",
+    "fraud_risk_signals": "fraud",
+    "external_data": "external"
+}
+
+# Section names accepted from older clients -> current name
+LEGACY_SECTIONS = {
+    "borrower_details": "borrower_profile"
+}
+
+_MISSING = object()
+
+# Every field the scoring pipeline reads: the schema above, plus what feature
+# engineering and reference data lookups use. Same spec layout as INPUT_SCHEMA;
+# None marks a field read as a whole.
+SCORING_FIELDS = {
+    "borrower_profile": {
+        **INPUT_SCHEMA["borrower_profile"],
+        "income": None, "age": None, "past_repayment_history": None,
+        "transaction_behaviour": None, "cash_flow_volatility": None,
+        "alternate_credit_indicators": {"rent_payment_on_time": None, "utility_bills_on_time": None}
+    },
+    "loan_details": {
+        **INPUT_SCHEMA["loan_details"],
+        "loan_to_income_ratio": None, "cross_loan_exposure": None
+    },
+    "property_details": {
+        **INPUT_SCHEMA["property_details"],
+        "overvaluation_detected": None, "price_trend": None, "postcode": None,
+        "location_risk": {"crime_index": None, "natural_disaster_risk": None, "unemployment_rate": None}
+    },
+    "fraud_risk_signals": {
+        **INPUT_SCHEMA["fraud_risk_signals"],
+        "synthetic_identity_detected": None, "anomaly_patterns": None
+    },
+    "external_data": {
+        **INPUT_SCHEMA["external_data"],
+        "region": None, "regional_unemployment": None, "regional_inflation": None,
+        "recession_indicator": None, "portfolio_concentration_risk": None
+    }
+}
+
+
+def _extract(value: Any, spec: Any) -> Any:
+    if not isinstance(spec, dict) or not isinstance(value, dict):
+        return value
+    return {name: _extract(value[name], field) for name, field in spec.items() if name in value}
+
+
+def extract_scoring_fields(data: Any) -> Any:
+    """Payload reduced to the objects and fields in SCORING_FIELDS.
+
+    Only objects are rebuilt: lists (income_sources, anomaly_patterns) and scalars are
+    shared with the input, and values of the wrong type are kept as sent, so
+    validation reports the same errors as on the full payload.
+    """
+    return _extract(data, SCORING_FIELDS)
+
+
+def normalize_sections(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Payload with legacy section names renamed and unset (None) sections dropped"""
+    normalized = {key: value for key, value in data.items() if value is not None and key not in LEGACY_SECTIONS}
+    for legacy, current in LEGACY_SECTIONS.items():
+        # The current name wins when a client sends both
+        if data.get(legacy) is not None and current not in normalized:
+            normalized[current] = data[legacy]
+    return normalized
+
+
+def _type_name(types: Any) -> str:
+    if isinstance(types, OptionalField):
+        return _type_name(types.type)
+    return "number" if types == NUMBER else {str: "string", bool: "boolean"}.get(types, str(types))
+
+
+def _type_set(spec: Any) -> frozenset:
+    if isinstance(spec, OptionalField):
+        # A left-out field reads as _MISSING, whose type no JSON value has
+        return _type_set(spec.type) | {type(_MISSING)}
+    return frozenset(spec if isinstance(spec, tuple) else (spec,))
+
+
+def _at(message: str, index: Any) -> str:
+    """Message for the current list item: "{i}" becomes its index"""
+    return message if index is None else message.replace("{i}", str(index))
+
+
+def _compile_fields(fields: Dict[str, Any], where: str, title: str):
+    """Checker for one object's fields: check(obj, errors, index) appends every error found.
+
+    Each field becomes a (name, kind, spec, messages) tuple built once; index is the
+    position of the enclosing list item, if any, used in its messages. An optional
+    field has no missing message.
+    """
+    checks = []
+    for name, spec in fields.items():
+        missing = f"Missing {where}: {name}"
+        if isinstance(spec, dict):
+            checks.append((name, dict, _compile_fields(spec, f"field in {name}", name),
+                           (missing, f"Invalid type for {where}: {name} (expected object)")))
+        elif isinstance(spec, list):
+            checks.append((name, list, _compile_fields(spec[0], f"field in {name}[{{i}}]", name),
+                           (missing, f"{title} {name} must be a non-empty list",
+                            f"Invalid type for {name}[{{i}}] (expected object)")))
+        else:
+            checks.append((name, type, _type_set(spec),
+                           (None if isinstance(spec, OptionalField) else missing, f"Invalid type for {where}: {name} (expected {_type_name(spec)})")))
+
+    # An object of plain fields is checked with one pass of exact type tests; errors are spelled out only if it fails
+    plain = tuple((name, spec) for name, kind, spec, _ in checks if kind is type)
+    if len(plain) < len(checks):
+        plain = ()
+
+    def check(obj: Dict[str, Any], errors: List[str], index: Any = None) -> None:
+        if plain:
+            for name, types in plain:
+                if type(obj.get(name, _MISSING)) not in types:
+                    break
+            else:
+                return
+
+        for name, kind, spec, messages in checks:
+            value = obj.get(name, _MISSING)
+            if value is _MISSING:
+                if messages[0] is not None:
+                    errors.append(_at(messages[0], index))
+            elif kind is type:
+                # Exact type checks: fast, and keep bools out of numeric fields
+                if type(value) not in spec:
+                    errors.append(_at(messages[1], index))
+            elif kind is dict:
+                if not isinstance(value, dict):
+                    errors.append(_at(messages[1], index))
+                else:
+                    spec(value, errors)
+            elif not isinstance(value, list) or not value:
+                errors.append(_at(messages[1], index))
+            else:
+                for i, item in enumerate(value):
+                    if not isinstance(item, dict):
+                        errors.append(_at(messages[2], i))
+                    else:
+                        spec(item, errors, i)
+
+    return check
+
+
+def compile_schema(schema: Dict[str, Any]):
+    """Compile a payload schema once into a validation function.
+
+    The function takes a payload and returns the list of every error found,
+    in one pass over the fields the schema declares.
+    """
+    sections = tuple(schema)
+    required = frozenset(sections)
+    checks = tuple(
+        (section, _compile_fields(fields, f"{SECTION_LABELS.get(section, section)} field",
+                                  SECTION_LABELS.get(section, section).capitalize()))
+        for section, fields in schema.items()
+    )
+
+    def validate(data: Any) -> List[str]:
+        if not isinstance(data, dict):
+            return ["Application must be a JSON object"]
+        errors = []
+        if not data.keys() >= required:
+            missing = [section for section in sections if section not in data]
+            errors.append("Missing sections: " + ", ".join(missing))
+        for section, check in checks:
+            value = data.get(section, _MISSING)
+            if value is _MISSING:
+                continue
+            if not isinstance(value, dict):
+                errors.append(f"Section {section} must be an object")
+            else:
+                check(value, errors)
+        return errors
+
+    return validate
+
+
+COMPILED_SCHEMA = compile_schema(INPUT_SCHEMA)
+
+
+@lru_cache(maxsize=None)
+def _frame_columns() -> Dict[str, tuple]:
+    """Flat dataset columns validate_frame checks: column -> (field, label, expected type, required).
+
+    Top-level schema fields are checked as the schema types them; every other
+    numeric column must hold a number when it is filled in.
+    """
+    from modules.dataset import DATASET_FIELDS, NUMERIC_COLUMNS
+
+    columns = {}
+    for column, (section, field, *nested) in DATASET_FIELDS.items():
+        where = f"{SECTION_LABELS[section]} field"
+        spec = None if nested else INPUT_SCHEMA.get(section, {}).get(field)
+        if spec is not None:
+            optional = isinstance(spec, OptionalField)
+            columns[column] = (field, where, spec.type if optional else spec, not optional)
+        elif column in NUMERIC_COLUMNS:
+            columns[column] = ((nested or [field])[-1], where, NUMBER, False)
+    return columns
+
 
 class DataInputValidator:
-    def __init__(self):
-        pass
+    def __init__(self, schema: Dict[str, Any] = None):
+        self.collect_errors = COMPILED_SCHEMA if schema is None else compile_schema(schema)
 
     def validate_input(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate the JSON input against required fields"""
+        """Validate the JSON input against the schema, reporting all errors at once"""
+        errors = self.collect_errors(data)
+        if errors:
+            return {"status": "error", "message": "; ".join(errors), "errors": errors}
+        return {"status": "success", "message": "Input validation passed"}
 
-        required_sections = [
-            "borrower_profile", "loan_details",
-            "property_details", "fraud_risk_signals",
-            "external_data"
+    def validate_batch(self, applications) -> List[Dict[str, Any]]:
+        """Validate a list of payloads, or a DataFrame in the flat dataset layout, one result per item"""
+        if not hasattr(applications, "columns"):
+            return [self.validate_input(data) for data in applications]
+
+        frame_result = self.validate_frame(applications)
+        if "valid" not in frame_result:
+            return [{"status": "error", "message": frame_result["message"], "errors": [frame_result["message"]]}
+                    for _ in range(len(applications))]
+        return [
+            {"status": "success", "message": "Input validation passed"} if message is None
+            else {"status": "error", "message": message, "errors": message.split("; ")}
+            for message in frame_result["errors"]
         ]
 
-        missing_sections = [s for s in required_sections if s not in data]
-        if missing_sections:
+
+    def validate_frame(self, df) -> Dict[str, Any]:
+        """Validate a DataFrame in the flat dataset layout.
+
+        Missing required columns fail the whole frame; missing required values and
+        non-numeric values (in any numeric column) fail only their row. Optional
+        columns may be absent or empty.
+        Returns per-row error messages (None for valid rows) and a validity mask.
+        """
+        import pandas as pd
+
+        frame_columns = _frame_columns()
+        missing_columns = [c for c, (*_, required) in frame_columns.items() if required and c not in df.columns]
+        if missing_columns:
             return {
                 "status": "error",
-                "message": f"Missing sections: {', '.join(missing_sections)}"
+                "message": f"Missing columns: {', '.join(missing_columns)}"
             }
 
-        borrower = data["borrower_profile"]
-        loan = data["loan_details"]
-        property_data = data["property_details"]
-        fraud = data["fraud_risk_signals"]
-        external = data["external_data"]
-
-        # ---------------- Borrower Profile ----------------
-        borrower_fields = ["employment_type", "income_sources", "bank_transactions"]
-        for f in borrower_fields:
-            if f not in borrower:
-                return {"status": "error", "message": f"Missing borrower field: {f}"}
-
-        # Validate income sources list
-        if not isinstance(borrower["income_sources"], list) or len(borrower["income_sources"]) == 0:
-            return {"status": "error", "message": "Borrower income_sources must be a non-empty list"}
-
-        for source in borrower["income_sources"]:
-            for f in ["source", "monthly_average_income", "income_stability_score"]:
-                if f not in source:
-                    return {"status": "error", "message": f"Missing field in income_sources: {f}"}
-
-        # Bank transactions
-        bank_txn_fields = ["average_monthly_balance", "transaction_variance"]
-        for f in bank_txn_fields:
-            if f not in borrower["bank_transactions"]:
-                return {"status": "error", "message": f"Missing field in bank_transactions: {f}"}
-
-        # ---------------- Loan ----------------
-        loan_fields = ["loan_amount", "interest_rate", "tenure_years"]
-        for f in loan_fields:
-            if f not in loan:
-                return {"status": "error", "message": f"Missing loan field: {f}"}
-
-        # ---------------- Property ----------------
-        property_fields = ["declared_value", "market_value"]
-        for f in property_fields:
-            if f not in property_data:
-                return {"status": "error", "message": f"Missing property field: {f}"}
-
-        # ---------------- Fraud ----------------
-        if "document_consistency_check" not in fraud:
-            return {"status": "error", "message": "Missing fraud field: document_consistency_check"}
-
-        # ---------------- External ----------------
-        external_fields = ["industry", "industry_growth_rate"]
-        for f in external_fields:
-            if f not in external:
-                return {"status": "error", "message": f"Missing external field: {f}"}
+        row_errors: List[List[str]] = [[] for _ in range(len(df))]
+        for column, (field, where, expected, required) in frame_columns.items():
+            if column not in df.columns:
+                continue
+            values = df[column]
+            missing = values.isna().to_numpy()
+            if required:
+                for i in missing.nonzero()[0]:
+                    row_errors[i].append(f"Missing {where}: {field}")
+            if expected == NUMBER and not pd.api.types.is_numeric_dtype(values):
+                bad = pd.to_numeric(values, errors="coerce").isna().to_numpy() & ~missing
+                for i in bad.nonzero()[0]:
+                    row_errors[i].append(f"Invalid type for {where}: {field} (expected number)")
 
-        return {"status": "success", "message": "Input validation passed"}
+        messages = ["; ".join(e) if e else None for e in row_errors]
+        valid = [m is None for m in messages]
+        return {
+            "status": "success" if all(valid) else "partial",
+            "message": f"{len(valid) - sum(valid)} of {len(valid)} rows failed validation",
+            "valid": valid,
+            "errors": messages
+        }
 
 
 
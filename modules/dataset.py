@@ -0,0 +1,137 @@
+from typing import Dict, Any, List, Tuple
+
+# Where each column of loan_risk_dataset.csv lives in the nested /score payload
+DATASET_FIELDS: Dict[str, Tuple[str, ...]] = {
+    # ---------------- Borrower ----------------
+    "income": ("borrower_profile", "income"),
+    "age": ("borrower_profile", "age"),
+    "employment_type": ("borrower_profile", "employment_type"),
+    "credit_score": ("borrower_profile", "credit_score"),
+    "past_repayment_history": ("borrower_profile", "past_repayment_history"),
+    "transaction_behaviour": ("borrower_profile", "transaction_behaviour"),
+    "cash_flow_volatility": ("borrower_profile", "cash_flow_volatility"),
+    "rent_payment_on_time": ("borrower_profile", "alternate_credit_indicators", "rent_payment_on_time"),
+    "utility_bills_on_time": ("borrower_profile", "alternate_credit_indicators", "utility_bills_on_time"),
+    # ---------------- Loan ----------------
+    "loan_amount": ("loan_details", "loan_amount"),
+    "interest_rate": ("loan_details", "interest_rate"),
+    "tenure_years": ("loan_details", "tenure_years"),
+    "loan_to_value_ratio": ("loan_details", "loan_to_value_ratio"),
+    "debt_to_income_ratio": ("loan_details", "debt_to_income_ratio"),
+    "loan_to_income_ratio": ("loan_details", "loan_to_income_ratio"),
+    "cross_loan_exposure": ("loan_details", "cross_loan_exposure"),
+    # ---------------- Property ----------------
+    "declared_value": ("property_details", "declared_value"),
+    "market_value": ("property_details", "market_value"),
+    "price_trend": ("property_details", "price_trend"),
+    "crime_index": ("property_details", "location_risk", "crime_index"),
+    "natural_disaster_risk": ("property_details", "location_risk", "natural_disaster_risk"),
+    "unemployment_rate": ("property_details", "location_risk", "unemployment_rate"),
+    "overvaluation_detected": ("property_details", "overvaluation_detected"),
+    # ---------------- Fraud ----------------
+    "document_consistency_check": ("fraud_risk_signals", "document_consistency_check"),
+    "synthetic_identity_detected": ("fraud_risk_signals", "synthetic_identity_detected"),
+    "anomaly_patterns": ("fraud_risk_signals", "anomaly_patterns"),
+    # ---------------- External ----------------
+    "industry": ("external_data", "industry"),
+    "industry_growth_rate": ("external_data", "industry_growth_rate"),
+    "regional_unemployment": ("external_data", "regional_unemployment"),
+    "regional_inflation": ("external_data", "regional_inflation"),
+    "recession_indicator": ("external_data", "recession_indicator"),
+    "portfolio_concentration_risk": ("external_data", "portfolio_concentration_risk"),
+}
+
+# Type of every dataset column: float64 numbers, nullable boolean flags, object text
+DATASET_DTYPES: Dict[str, str] = {
+    "income": "float64",
+    "age": "float64",
+    "employment_type": "object",
+    "credit_score": "float64",
+    "past_repayment_history": "object",
+    "transaction_behaviour": "object",
+    "cash_flow_volatility": "object",
+    "rent_payment_on_time": "boolean",
+    "utility_bills_on_time": "boolean",
+    "loan_amount": "float64",
+    "interest_rate": "float64",
+    "tenure_years": "float64",
+    "loan_to_value_ratio": "float64",
+    "debt_to_income_ratio": "float64",
+    "loan_to_income_ratio": "float64",
+    "cross_loan_exposure": "float64",
+    "declared_value": "float64",
+    "market_value": "float64",
+    "price_trend": "object",
+    "crime_index": "object",
+    "natural_disaster_risk": "object",
+    "unemployment_rate": "float64",
+    "overvaluation_detected": "boolean",
+    "document_consistency_check": "object",
+    "synthetic_identity_detected": "boolean",
+    "anomaly_patterns": "object",
+    "industry": "object",
+    "industry_growth_rate": "float64",
+    "regional_unemployment": "float64",
+    "regional_inflation": "float64",
+    "recession_indicator": "boolean",
+    "portfolio_concentration_risk": "object",
+}
+
+NUMERIC_COLUMNS = [c for c, t in DATASET_DTYPES.items() if t == "float64"]
+
+PAYLOAD_SECTIONS = [
+    "borrower_profile", "loan_details",
+    "property_details", "fraud_risk_signals",
+    "external_data"
+]
+
+
+def csv_dtypes(columns) -> Dict[str, str]:
+    """read_csv dtypes for the dataset columns among columns.
+
+    Numeric columns are left to the parser: one unparseable cell reads its chunk's
+    column as text, which validate_frame fails row by row instead of the read
+    failing the file. Flags are nullable, so a blank cell is <NA>, not an error.
+    """
+    return {c: t for c, t in DATASET_DTYPES.items() if c in columns and t != "float64"}
+
+
+def parse_numeric_columns(frame):
+    """frame with every numeric column read as text parsed to float64 (unparseable cells become NaN)"""
+    import pandas as pd
+
+    text = [c for c in NUMERIC_COLUMNS if c in frame.columns and not pd.api.types.is_numeric_dtype(frame[c])]
+    if not text:
+        return frame
+    return frame.assign(**{c: pd.to_numeric(frame[c], errors="coerce") for c in text})
+
+
+def split_anomaly_patterns(value: Any) -> List[str]:
+    """anomaly_patterns is stored comma-joined in the CSV and as a list in payloads"""
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, str) or not value:
+        return []
+    return [p for p in value.split(",") if p]
+
+
+def _to_python(value: Any) -> Any:
+    # NumPy scalars -> plain Python values so payloads stay JSON-friendly
+    return value.item() if hasattr(value, "item") else value
+
+
+def row_to_payload(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one flat dataset row into the nested /score payload layout"""
+    payload: Dict[str, Any] = {section: {} for section in PAYLOAD_SECTIONS}
+    for column, path in DATASET_FIELDS.items():
+        if column not in row:
+            continue
+        value = _to_python(row[column])
+        if column == "anomaly_patterns":
+            value = split_anomaly_patterns(value)
+
+        node = payload
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return payload
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when the executor already holds as much work as it may queue"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a job does not finish before its deadline"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for CPU-bound scoring with admission control
+    - At most max_workers jobs run at once, and at most max_queue more wait
+    - Submitting beyond that fails fast with QueueFullError instead of queueing
+    - A job whose deadline passes while it is still queued is dropped unrun
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._admitted -= 1
+
+    def _run_before(self, deadline: Optional[float], fn: Callable, args: tuple) -> Any:
+        if deadline is not None and time.monotonic() >= deadline:
+            with self._lock:
+                self.expired += 1
+            raise DeadlineExceededError("Deadline passed while queued")
+        return fn(*args)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) on the pool and await it, giving up after timeout seconds"""
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                raise QueueFullError(f"Scoring queue is full ({self.capacity} requests in flight)")
+            self._admitted += 1
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            future = self._pool.submit(self._run_before, deadline, fn, args)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is held until the job finishes, even if the caller has stopped waiting
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"Scoring did not finish within {timeout * 1000:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._admitted,
+                "rejected": self.rejected,
+                "expired": self.expired
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,78 +1,276 @@
 import numpy as np
-from typing import Dict, Any
+from operator import methodcaller
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Sequence
+
+from modules.feature_graph import RAW_INPUT, FeatureGraph, FeatureNode, FeaturePlan
+
+# Categorical encodings shared by the scalar and columnar paths: (mapping, default)
+HISTORY_MAP = {"good": 0, "late_payments": 1, "defaulted": 2}
+TXN_MAP = {"saving": 0, "balanced": 1, "spending_heavy": 2}
+VOLATILITY_MAP = {"low": 0, "medium": 1, "high": 2}
+RISK_MAP = {"low": 0, "medium": 1, "high": 2}
+PORTFOLIO_MAP = {"low": 0, "medium": 1, "high": 2}
+
+# Features copied straight from a dataset column: feature -> (column, default)
+PASSTHROUGH_COLUMNS = {
+    "income": ("income", 0),
+    "age": ("age", 0),
+    "loan_amount": ("loan_amount", 0),
+    "interest_rate": ("interest_rate", 0),
+    "tenure_years": ("tenure_years", 0),
+    "ltv_ratio": ("loan_to_value_ratio", 0),
+    "dti_ratio": ("debt_to_income_ratio", 0),
+    "loan_to_income_ratio": ("loan_to_income_ratio", 0),
+    "cross_loan_exposure": ("cross_loan_exposure", 0),
+    "declared_value": ("declared_value", 0),
+    "market_value": ("market_value", 0),
+    "unemployment_rate": ("unemployment_rate", 0),
+    "industry_growth_rate": ("industry_growth_rate", 0),
+    "regional_unemployment": ("regional_unemployment", 0),
+    "regional_inflation": ("regional_inflation", 0),
+}
+
+# Features encoded from a categorical column: feature -> (column, missing value, mapping, unknown value)
+ENCODED_COLUMNS = {
+    "repayment_history_score": ("past_repayment_history", "good", HISTORY_MAP, 0),
+    "transaction_behavior_score": ("transaction_behaviour", "balanced", TXN_MAP, 1),
+    "cash_flow_volatility_score": ("cash_flow_volatility", "medium", VOLATILITY_MAP, 1),
+    "crime_index_score": ("crime_index", "medium", RISK_MAP, 1),
+    "disaster_risk_score": ("natural_disaster_risk", "medium", RISK_MAP, 1),
+    "portfolio_concentration_score": ("portfolio_concentration_risk", "medium", PORTFOLIO_MAP, 1),
+}
+
+
+def _encode(values: np.ndarray, mapping: Dict[str, int], default: int) -> np.ndarray:
+    if hasattr(values, "codes"):
+        # Categorical (feature store): encode each category once, then gather by code (-1 = missing)
+        lookup = _encode(np.asarray(values.categories, dtype=object), mapping, default)
+        return np.append(lookup, default)[values.codes]
+    conditions = [values == key for key in mapping]
+    return np.select(conditions, list(mapping.values()), default=default).astype(np.int64)
+
+
+def _as_flag(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == "b":
+        return values.astype(np.int64)
+    if values.dtype.kind in "iuf":
+        return np.nan_to_num(values.astype(np.float64)).astype(bool).astype(np.int64)
+    return np.isin(values, [True, 1, "True", "true"]).astype(np.int64)
+
+
+def _count_patterns(values: np.ndarray) -> np.ndarray:
+    """Count anomaly patterns given lists, comma-joined strings or feature-store bitmasks"""
+    if values.dtype.kind == "u":
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(values).astype(np.int64)
+        bits = np.unpackbits(np.ascontiguousarray(values).view(np.uint8).reshape(len(values), -1), axis=1)
+        return bits.sum(axis=1, dtype=np.int64)
+    counts = np.zeros(len(values), dtype=np.int64)
+    if values.dtype.kind != "O":
+        return counts
+    is_str = np.array([isinstance(v, str) for v in values], dtype=bool)
+    if is_str.any():
+        text = values[is_str].astype(str)
+        non_empty = np.char.str_len(text) > 0
+        counts[is_str] = np.where(non_empty, np.char.count(text, ",") + 1, 0)
+    is_list = np.array([isinstance(v, list) for v in values], dtype=bool)
+    if is_list.any():
+        counts[is_list] = [len(v) for v in values[is_list]]
+    return counts
+
+
+# Read-only stand-in for a missing section
+_EMPTY = MappingProxyType({})
+
+
+# Plain field reads are methodcallers: the cheapest callable a plan step can make
+def _section(name: str, parent: str = RAW_INPUT) -> FeatureNode:
+    return FeatureNode(name, (parent,), methodcaller("get", name, _EMPTY))
+
+
+def _field(feature: str, section: str, key: str, default: Any) -> FeatureNode:
+    return FeatureNode(feature, (section,), methodcaller("get", key, default))
+
+
+def _flag(feature: str, section: str, key: str) -> FeatureNode:
+    return FeatureNode(feature, (section,), lambda values: int(values.get(key, False)))
+
+
+def _encoded(feature: str, section: str, key: str) -> FeatureNode:
+    _, missing, mapping, unknown = ENCODED_COLUMNS[feature]
+    return FeatureNode(feature, (section,), lambda values: mapping.get(values.get(key, missing), unknown))
+
+
+# Scalar features for one payload; calculate_features_frame is the columnar twin
+FEATURE_NODES = [
+    # ---------------- Payload sections ----------------
+    *(_section(name) for name in ("borrower_profile", "loan_details", "property_details",
+                                  "fraud_risk_signals", "external_data")),
+    _section("alternate_credit_indicators", "borrower_profile"),
+    _section("location_risk", "property_details"),
+
+    # ---------------- Borrower Features ----------------
+    _field("income", "borrower_profile", "income", 0),
+    _field("age", "borrower_profile", "age", 0),
+    FeatureNode("credit_score_normalized", ("borrower_profile",),
+                lambda borrower: borrower.get("credit_score", 600) / 850.0),
+    _encoded("repayment_history_score", "borrower_profile", "past_repayment_history"),
+    _encoded("transaction_behavior_score", "borrower_profile", "transaction_behaviour"),
+    _encoded("cash_flow_volatility_score", "borrower_profile", "cash_flow_volatility"),
+    FeatureNode("alt_credit_score", ("alternate_credit_indicators",),
+                lambda alt: int(alt.get("rent_payment_on_time", False)) + int(alt.get("utility_bills_on_time", False))),
+
+    # ---------------- Loan Features ----------------
+    _field("loan_amount", "loan_details", "loan_amount", 0),
+    _field("interest_rate", "loan_details", "interest_rate", 0),
+    _field("tenure_years", "loan_details", "tenure_years", 0),
+    _field("ltv_ratio", "loan_details", "loan_to_value_ratio", 0),
+    _field("dti_ratio", "loan_details", "debt_to_income_ratio", 0),
+    _field("loan_to_income_ratio", "loan_details", "loan_to_income_ratio", 0),
+    _field("cross_loan_exposure", "loan_details", "cross_loan_exposure", 0),
+
+    # ---------------- Property Features ----------------
+    _field("declared_value", "property_details", "declared_value", 0),
+    _field("market_value", "property_details", "market_value", 0),
+    _flag("overvaluation_flag", "property_details", "overvaluation_detected"),
+    FeatureNode("flag_falling_property", ("property_details",),
+                lambda prop: int(prop.get("price_trend", "stable") == "falling")),
+    _encoded("crime_index_score", "location_risk", "crime_index"),
+    _encoded("disaster_risk_score", "location_risk", "natural_disaster_risk"),
+    _field("unemployment_rate", "location_risk", "unemployment_rate", 0),
+
+    # ---------------- Fraud Features ----------------
+    FeatureNode("doc_check_failed", ("fraud_risk_signals",),
+                lambda fraud: int(fraud.get("document_consistency_check", "passed") == "failed")),
+    _flag("synthetic_identity_flag", "fraud_risk_signals", "synthetic_identity_detected"),
+    FeatureNode("anomaly_count", ("fraud_risk_signals",), lambda fraud: len(fraud.get("anomaly_patterns", []))),
+    # Any hard fraud signal; read by the rule table (the model's fraud_flag input is held at MODEL_FRAUD_FLAG)
+    FeatureNode("flag_fraud", ("doc_check_failed", "synthetic_identity_flag"),
+                lambda doc_check_failed, synthetic_identity: int(doc_check_failed or synthetic_identity)),
+
+    # ---------------- External Data ----------------
+    _field("industry_growth_rate", "external_data", "industry_growth_rate", 0),
+    _field("regional_unemployment", "external_data", "regional_unemployment", 0),
+    _field("regional_inflation", "external_data", "regional_inflation", 0),
+    _flag("recession_indicator", "external_data", "recession_indicator"),
+    _encoded("portfolio_concentration_score", "external_data", "portfolio_concentration_risk"),
+]
+
+FEATURE_GRAPH = FeatureGraph(FEATURE_NODES)
+
+# Every feature calculate_features returns, in its order
+FEATURE_NAMES = [
+    "income", "age", "credit_score_normalized", "repayment_history_score", "transaction_behavior_score",
+    "cash_flow_volatility_score", "alt_credit_score",
+    "loan_amount", "interest_rate", "tenure_years", "ltv_ratio", "dti_ratio", "loan_to_income_ratio",
+    "cross_loan_exposure",
+    "declared_value", "market_value", "overvaluation_flag", "flag_falling_property", "crime_index_score",
+    "disaster_risk_score", "unemployment_rate",
+    "doc_check_failed", "synthetic_identity_flag", "anomaly_count", "flag_fraud",
+    "industry_growth_rate", "regional_unemployment", "regional_inflation", "recession_indicator",
+    "portfolio_concentration_score",
+]
+
 
 class FeatureEngineer:
-    def __init__(self):
-        pass
+    """
+    Module 3: Feature Engineering
+    - Features are FEATURE_GRAPH nodes computed from the raw payload
+    - plan() picks out what one scorer reads; calculate_features() computes everything
+    """
+
+    def __init__(self, graph: FeatureGraph = FEATURE_GRAPH):
+        self.graph = graph
+
+    def plan(self, features: Optional[Sequence[str]] = None, requester: str = "scorer") -> FeaturePlan:
+        """Plan for the given features (all of FEATURE_NAMES by default); raises UnknownFeatureError"""
+        return self.graph.plan(FEATURE_NAMES if features is None else features, requester)
+
+    def calculate(self, raw_input: Dict[str, Any], features: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Only the given features of one payload"""
+        return self.plan(features).compute(raw_input)
 
     def calculate_features(self, processed: Dict[str, Any], raw_input: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate risk-related features from borrower, loan, property, fraud, and external data"""
+        """Generate risk-related features from borrower, loan, property, fraud, and external data.
 
-        features = {}
+        processed (DataPreprocessor output) is accepted for older callers; no feature reads it.
+        """
+        return self.plan().compute(raw_input)
 
-        # ---------------- Borrower Features ----------------
-        borrower = raw_input.get("borrower_profile", {})
-        features["income"] = borrower.get("income", 0)
-        features["age"] = borrower.get("age", 0)
-        features["credit_score_normalized"] = borrower.get("credit_score", 600) / 850.0
+    def calculate_features_frame(self, data):
+        """Columnar version of calculate_features.
 
-        # Encode repayment history
-        history_map = {"good": 0, "late_payments": 1, "defaulted": 2}
-        features["repayment_history_score"] = history_map.get(borrower.get("past_repayment_history", "good"), 0)
+        Takes a DataFrame (or dict of NumPy arrays) in the loan_risk_dataset.csv
+        column layout and returns the same feature columns, one row per applicant.
+        Blank cells get the defaults calculate_features uses for absent fields.
+        A DataFrame in gives a DataFrame out with the same index; a dict gives a dict.
+        """
+        is_frame = hasattr(data, "columns")
+        n_rows = len(data) if is_frame else len(next(iter(data.values()), []))
 
-        # Encode transaction behaviour
-        txn_map = {"saving": 0, "balanced": 1, "spending_heavy": 2}
-        features["transaction_behavior_score"] = txn_map.get(borrower.get("transaction_behaviour", "balanced"), 1)
+        def column(name, default):
+            if name in data:
+                values = data[name]
+                dtype = str(getattr(values, "dtype", ""))
+                # Dictionary-encoded columns keep their codes; see _encode
+                if dtype == "category":
+                    return values.array
+                # Nullable flags (CSV reads): a blank cell counts as the field being absent
+                if dtype == "boolean":
+                    return values.to_numpy(dtype=np.bool_, na_value=bool(default))
+                values = np.asarray(values)
+                # Blank numeric cells take the default the scalar path uses for an absent field
+                if values.dtype.kind == "f" and not isinstance(default, (str, bool)):
+                    missing = np.isnan(values)
+                    if missing.any():
+                        values = np.where(missing, default, values)
+                return values
+            return np.full(n_rows, default, dtype=object if isinstance(default, str) else None)
 
-        # Cash flow volatility
-        volatility_map = {"low": 0, "medium": 1, "high": 2}
-        features["cash_flow_volatility_score"] = volatility_map.get(borrower.get("cash_flow_volatility", "medium"), 1)
+        features = {}
 
-        # Alternate credit indicators
-        alt_credit = borrower.get("alternate_credit_indicators", {})
-        features["alt_credit_score"] = int(alt_credit.get("rent_payment_on_time", False)) + \
-                                       int(alt_credit.get("utility_bills_on_time", False))
+        # ---------------- Borrower Features ----------------
+        features["income"] = column("income", 0)
+        features["age"] = column("age", 0)
+        features["credit_score_normalized"] = column("credit_score", 600) / 850.0
+        for name in ("repayment_history_score", "transaction_behavior_score", "cash_flow_volatility_score"):
+            source, missing, mapping, unknown = ENCODED_COLUMNS[name]
+            features[name] = _encode(column(source, missing), mapping, unknown)
+        features["alt_credit_score"] = _as_flag(column("rent_payment_on_time", False)) + \
+                                       _as_flag(column("utility_bills_on_time", False))
 
         # ---------------- Loan Features ----------------
-        loan = raw_input.get("loan_details", {})
-        features["loan_amount"] = loan.get("loan_amount", 0)
-        features["interest_rate"] = loan.get("interest_rate", 0)
-        features["tenure_years"] = loan.get("tenure_years", 0)
-        features["ltv_ratio"] = loan.get("loan_to_value_ratio", 0)
-        features["dti_ratio"] = loan.get("debt_to_income_ratio", 0)
-        features["loan_to_income_ratio"] = loan.get("loan_to_income_ratio", 0)
-        features["cross_loan_exposure"] = loan.get("cross_loan_exposure", 0)
+        for name in ("loan_amount", "interest_rate", "tenure_years", "ltv_ratio", "dti_ratio",
+                     "loan_to_income_ratio", "cross_loan_exposure"):
+            features[name] = column(*PASSTHROUGH_COLUMNS[name])
 
         # ---------------- Property Features ----------------
-        prop = raw_input.get("property_details", {})
-        features["declared_value"] = prop.get("declared_value", 0)
-        features["market_value"] = prop.get("market_value", 0)
-        features["overvaluation_flag"] = int(prop.get("overvaluation_detected", False))
-
-        # Location risk
-        location = prop.get("location_risk", {})
-        risk_map = {"low": 0, "medium": 1, "high": 2}
-        features["crime_index_score"] = risk_map.get(location.get("crime_index", "medium"), 1)
-        features["disaster_risk_score"] = risk_map.get(location.get("natural_disaster_risk", "medium"), 1)
-        features["unemployment_rate"] = location.get("unemployment_rate", 0)
+        features["declared_value"] = column("declared_value", 0)
+        features["market_value"] = column("market_value", 0)
+        features["overvaluation_flag"] = _as_flag(column("overvaluation_detected", False))
+        features["flag_falling_property"] = (column("price_trend", "stable") == "falling").astype(np.int64)
+        for name in ("crime_index_score", "disaster_risk_score"):
+            source, missing, mapping, unknown = ENCODED_COLUMNS[name]
+            features[name] = _encode(column(source, missing), mapping, unknown)
+        features["unemployment_rate"] = column("unemployment_rate", 0)
 
         # ---------------- Fraud Features ----------------
-        fraud = raw_input.get("fraud_risk_signals", {})
-        features["doc_check_failed"] = int(fraud.get("document_consistency_check", "passed") == "failed")
-        features["synthetic_identity_flag"] = int(fraud.get("synthetic_identity_detected", False))
-        features["anomaly_count"] = len(fraud.get("anomaly_patterns", []))
+        features["doc_check_failed"] = (column("document_consistency_check", "passed") == "failed").astype(np.int64)
+        features["synthetic_identity_flag"] = _as_flag(column("synthetic_identity_detected", False))
+        features["anomaly_count"] = _count_patterns(column("anomaly_patterns", ""))
+        features["flag_fraud"] = features["doc_check_failed"] | features["synthetic_identity_flag"]
 
         # ---------------- External Data ----------------
-        ext = raw_input.get("external_data", {})
-        features["industry_growth_rate"] = ext.get("industry_growth_rate", 0)
-        features["regional_unemployment"] = ext.get("regional_unemployment", 0)
-        features["regional_inflation"] = ext.get("regional_inflation", 0)
-        features["recession_indicator"] = int(ext.get("recession_indicator", False))
-
-        # Portfolio concentration risk
-        portfolio_map = {"low": 0, "medium": 1, "high": 2}
-        features["portfolio_concentration_score"] = portfolio_map.get(ext.get("portfolio_concentration_risk", "medium"), 1)
+        for name in ("industry_growth_rate", "regional_unemployment", "regional_inflation"):
+            features[name] = column(*PASSTHROUGH_COLUMNS[name])
+        features["recession_indicator"] = _as_flag(column("recession_indicator", False))
+        source, missing, mapping, unknown = ENCODED_COLUMNS["portfolio_concentration_score"]
+        features["portfolio_concentration_score"] = _encode(column(source, missing), mapping, unknown)
 
+        if is_frame:
+            import pandas as pd
+            return pd.DataFrame(features, index=data.index)
         return features
 
 
@@ -86,10 +284,7 @@ if __name__ == "__main__":
         "external_data": { "industry": "tourism", "industry_growth_rate": -4.2 }
     }
 
-    from preprocessing import DataPreprocessor
-    preprocessor = DataPreprocessor()
-    processed = preprocessor.preprocess(sample_input)
-
+    # python -m modules.feature_engineering
     engineer = FeatureEngineer()
-    engineered = engineer.calculate_features(processed, sample_input)
-    print(engineered)
+    print(engineer.calculate_features({}, sample_input))
+    print(engineer.calculate(sample_input, ["dti_ratio", "ltv_ratio", "credit_score_normalized", "flag_fraud"]))
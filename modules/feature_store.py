@@ -0,0 +1,274 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from modules.dataset import DATASET_DTYPES, csv_dtypes, split_anomaly_patterns
+
+STORE_FORMAT = "loan-feature-store"
+STORE_VERSION = 2
+# Version 1 stores are the same layout without text columns
+READABLE_VERSIONS = (1, STORE_VERSION)
+META_FILE = "meta.json"
+
+# Distinct values a dictionary-encoded column may hold; past this it is stored as raw text
+MAX_CATEGORIES = int(np.iinfo(np.int16).max)
+
+# Columns holding comma-joined pattern lists, stored as one bit per distinct pattern
+BITMASK_COLUMNS = ("anomaly_patterns",)
+MAX_PATTERNS = 64
+
+
+def is_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def _column_kind(name: str, values) -> str:
+    if name in BITMASK_COLUMNS:
+        return "bitmask"
+    dtype = DATASET_DTYPES.get(name) or str(values.dtype)
+    if dtype in ("bool", "boolean"):
+        return "bool"
+    if dtype.startswith(("float", "int", "uint")):
+        return "numeric"
+    return "category"
+
+
+class _ColumnWriter:
+    """Appends one column, chunk by chunk, to a raw binary file.
+
+    A category column whose dictionary outgrows MAX_CATEGORIES (loan ids, say) is
+    rewritten as text: int32 byte lengths (-1 = missing) plus a file of UTF-8 bytes.
+    """
+
+    def __init__(self, directory: str, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.file = f"{name}.bin"
+        self.path = os.path.join(directory, self.file)
+        self.text_path = os.path.join(directory, f"{name}.text")
+        self.vocabulary: Dict[str, int] = {}
+        self.dtype = {"numeric": np.float64, "bool": np.bool_, "category": np.int16, "bitmask": np.uint64}[kind]
+        self._fh = open(self.path, "wb")
+        self._text_fh = None
+
+    def _vocabulary_codes(self, uniques, limit: int) -> np.ndarray:
+        # Codes are assigned in order of first appearance, so earlier chunks stay valid
+        mapped = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            code = self.vocabulary.get(value)
+            if code is None:
+                if len(self.vocabulary) >= limit:
+                    raise ValueError(f"Column {self.name} has more than {limit} distinct values")
+                code = self.vocabulary[value] = len(self.vocabulary)
+            mapped[i] = code
+        return mapped
+
+    def _to_text(self) -> None:
+        """Rewrite the codes written so far as text and keep appending text"""
+        self._fh.close()
+        words = np.asarray(sorted(self.vocabulary, key=self.vocabulary.get) + [None], dtype=object)
+        written = words[np.fromfile(self.path, dtype=np.int16)]
+        self.kind, self.dtype, self.vocabulary = "text", np.int32, {}
+        self._fh = open(self.path, "wb")
+        self._text_fh = open(self.text_path, "wb")
+        self._write_text(written)
+
+    def _write_text(self, values: np.ndarray) -> None:
+        import pandas as pd
+
+        present = ~pd.isna(values)
+        encoded = [str(v).encode() for v in values[present]]
+        lengths = np.full(len(values), -1, dtype=np.int32)
+        lengths[present] = [len(b) for b in encoded]
+        self._text_fh.write(b"".join(encoded))
+        self._fh.write(lengths.tobytes())
+
+    def write(self, values) -> None:
+        """Append one chunk (a pandas Series)"""
+        import pandas as pd
+
+        if self.kind == "category":
+            codes, uniques = pd.factorize(values)
+            uniques = [str(u) for u in uniques]
+            if len(self.vocabulary) + sum(u not in self.vocabulary for u in uniques) > MAX_CATEGORIES:
+                self._to_text()
+            else:
+                mapped = self._vocabulary_codes(uniques, MAX_CATEGORIES)
+                self._fh.write(np.append(mapped, -1)[codes].astype(np.int16).tobytes())
+                return
+        if self.kind == "text":
+            self._write_text(values.to_numpy(dtype=object))
+            return
+        if self.kind == "bitmask":
+            codes, uniques = pd.factorize(values)
+            masks = np.zeros(len(uniques) + 1, dtype=np.uint64)
+            for i, value in enumerate(uniques):
+                bits = self._vocabulary_codes(split_anomaly_patterns(value), MAX_PATTERNS)
+                for bit in bits:
+                    masks[i] |= np.uint64(1) << np.uint64(bit)
+            data = masks[codes]
+        elif self.kind == "bool":
+            data = values.to_numpy(dtype=np.bool_, na_value=False)
+        else:
+            data = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        self._fh.write(np.ascontiguousarray(data).tobytes())
+
+    def close_files(self) -> None:
+        self._fh.close()
+        if self._text_fh is not None:
+            self._text_fh.close()
+
+    def close(self, n_rows: int) -> Dict[str, Any]:
+        self.close_files()
+        meta = {"kind": self.kind, "file": self.file, "dtype": np.dtype(self.dtype).name}
+        if self.kind == "category":
+            # Shrink codes to int8 when they fit, which is also what pandas uses for small categoricals
+            if len(self.vocabulary) < np.iinfo(np.int8).max and n_rows:
+                codes = np.fromfile(self.path, dtype=np.int16).astype(np.int8)
+                codes.tofile(self.path)
+                meta["dtype"] = "int8"
+        if self.kind in ("category", "bitmask"):
+            meta["categories"] = sorted(self.vocabulary, key=self.vocabulary.get)
+        if self.kind == "text":
+            meta["text_file"] = os.path.basename(self.text_path)
+        return meta
+
+
+def write_store(csv_path: str, store_path: str, chunksize: int = 100000) -> int:
+    """Convert a CSV (loan_risk_dataset.csv layout or any flat loan file) into a feature store.
+
+    The CSV is streamed in chunks; numeric columns become float64 (NaN for blank or
+    unparseable cells), booleans bool (blank is False), strings int8/int16 dictionary
+    codes (-1 for missing), or text past MAX_CATEGORIES distinct values, and
+    anomaly_patterns a uint64 bitmask. Returns the number of rows written.
+    """
+    import pandas as pd
+
+    os.makedirs(store_path, exist_ok=True)
+    header = pd.read_csv(csv_path, nrows=0).columns
+
+    writers: List[_ColumnWriter] = []
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=csv_dtypes(header)):
+            if not writers:
+                for name in chunk.columns:
+                    writers.append(_ColumnWriter(store_path, name, _column_kind(name, chunk[name])))
+            for writer in writers:
+                writer.write(chunk[writer.name])
+            n_rows += len(chunk)
+        columns = {w.name: w.close(n_rows) for w in writers}
+    finally:
+        for writer in writers:
+            writer.close_files()
+
+    meta = {
+        "format": STORE_FORMAT,
+        "version": STORE_VERSION,
+        "rows": n_rows,
+        "source": os.path.basename(csv_path),
+        "columns": columns,
+    }
+    with open(os.path.join(store_path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+        f.write("\n")
+    return n_rows
+
+
+class FeatureStore:
+    """
+    Read-only view of a feature store directory
+    - Every column is a memory-mapped array; nothing is parsed or copied on open
+    - Categorical columns come back as pandas Categoricals over the stored codes
+    - Text columns (more distinct values than a dictionary holds) are decoded per read
+    - Bitmask columns stay uint64; decode_patterns turns them back into lists
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT or meta.get("version") not in READABLE_VERSIONS:
+            raise ValueError(f"{path} is not a version {STORE_VERSION} {STORE_FORMAT}")
+        self.path = path
+        self.n_rows = meta["rows"]
+        self.meta = meta["columns"]
+        self.columns = list(self.meta)
+        self._arrays: Dict[str, np.ndarray] = {}
+        # Text columns: (byte offsets of every row, mapped UTF-8 bytes)
+        self._text: Dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def array(self, name: str) -> np.ndarray:
+        """Raw stored values: numbers, bools, dictionary codes or bitmasks"""
+        if name not in self._arrays:
+            column = self.meta[name]
+            dtype = np.dtype(column["dtype"])
+            if self.n_rows == 0:
+                self._arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                self._arrays[name] = np.memmap(os.path.join(self.path, column["file"]), dtype=dtype,
+                                               mode="r", shape=(self.n_rows,))
+        return self._arrays[name]
+
+    def text(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Rows [start, stop) of a text column as an object array of str (None = missing)"""
+        if name not in self._text:
+            lengths = self.array(name)
+            offsets = np.concatenate([[0], np.cumsum(np.maximum(lengths, 0), dtype=np.int64)])
+            path = os.path.join(self.path, self.meta[name]["text_file"])
+            data = np.memmap(path, dtype=np.uint8, mode="r") if offsets[-1] else np.empty(0, dtype=np.uint8)
+            self._text[name] = (offsets, data)
+        offsets, data = self._text[name]
+        lengths = self.array(name)[start:stop]
+        first = min(start, self.n_rows)
+        blob = data[offsets[first]:offsets[first + len(lengths)]].tobytes()
+        ends = offsets[first + 1:first + len(lengths) + 1] - offsets[first]
+        out = np.empty(len(lengths), dtype=object)
+        for i, (end, length) in enumerate(zip(ends.tolist(), lengths.tolist())):
+            out[i] = None if length < 0 else blob[end - length:end].decode()
+        return out
+
+    def categories(self, name: str) -> List[str]:
+        return self.meta[name]["categories"]
+
+    def decode_patterns(self, name: str = "anomaly_patterns", start: int = 0, stop: Optional[int] = None) -> List[List[str]]:
+        """Bitmask rows back to pattern lists (in dictionary order)"""
+        names = self.categories(name)
+        masks = self.array(name)[start:stop]
+        uniques, inverse = np.unique(masks, return_inverse=True)
+        decoded = [[p for bit, p in enumerate(names) if int(mask) >> bit & 1] for mask in uniques]
+        return [decoded[i] for i in inverse]
+
+    def frame(self, columns: Optional[List[str]] = None, start: int = 0, stop: Optional[int] = None):
+        """DataFrame over rows [start, stop) that shares memory with the mapped files"""
+        import pandas as pd
+
+        data = {}
+        for name in columns or self.columns:
+            values = self.array(name)[start:stop]
+            if self.meta[name]["kind"] == "category":
+                values = pd.Categorical.from_codes(values, categories=self.categories(name), validate=False)
+            elif self.meta[name]["kind"] == "text":
+                values = self.text(name, start, stop)
+            data[name] = pd.Series(values, copy=False)
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        return pd.DataFrame(data, copy=False).set_axis(pd.RangeIndex(start, max(stop, start)), copy=False)
+
+    def iter_frames(self, chunksize: int, columns: Optional[List[str]] = None) -> Iterator:
+        for start in range(0, self.n_rows, chunksize):
+            yield self.frame(columns, start, start + chunksize)
+
+
+if __name__ == "__main__":
+    # Convert a CSV: python -m modules.feature_store loan_risk_dataset.csv loan_risk_dataset.store
+    import sys
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "loan_risk_dataset.csv"
+    store_path = sys.argv[2] if len(sys.argv) > 2 else csv_path.rsplit(".", 1)[0] + ".store"
+
+    rows = write_store(csv_path, store_path)
+    print(f"✅ Stored {rows:,} rows ({len(FeatureStore(store_path).columns)} columns) in {store_path}")
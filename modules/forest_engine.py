@@ -0,0 +1,468 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from itertools import combinations
+from math import factorial
+from typing import List, Optional
+
+# Largest leaf-bitmask table (bytes) built at load time before falling back to node walking
+MAX_BITMASK_BYTES = 64 * 1024 * 1024
+# Rows evaluated together, bounding the (rows x trees) working set
+BLOCK_ROWS = 8192
+# Largest per-coalition lookup table (cells) built for attributions before evaluating leaves per row
+MAX_COALITION_CELLS = 1 << 20
+# Rows explained together when a coalition is evaluated leaf by leaf, bounding the (rows x leaves) working set
+ATTRIBUTION_BLOCK_ROWS = 256
+# Manifest of a memory-mapped forest directory (save_mapped); every other file is one .npy array
+MAPPED_MANIFEST = "forest.json"
+MAPPED_FORMAT = 1
+
+
+def _as_input(X) -> np.ndarray:
+    """Rows rounded to float32 as sklearn compares them, held as float64; NaN raises ValueError"""
+    X = np.asarray(X, dtype=np.float32).astype(np.float64)
+    if np.isnan(X).any():
+        raise ValueError("Forest inputs must not be NaN: missing values are not routed like scikit-learn's")
+    return X
+
+
+class CompiledForest:
+    """
+    Array-backed random forest for inference without scikit-learn
+    - All trees are flattened into shared node arrays (feature, threshold, children, leaf probability)
+    - Small forests are evaluated with per-feature leaf bitmasks (QuickScorer-style):
+      a sorted-threshold lookup per feature instead of walking every tree
+    - Larger forests walk the node arrays level by level; leaves point back to themselves
+    - Positive-class probabilities match RandomForestClassifier.predict_proba bit for bit; NaN inputs raise
+      ValueError, since sklearn's side for missing values is not part of the node arrays
+    - With node cover (training samples per node), attributions() gives exact TreeSHAP values
+    - save_mapped() writes node arrays and bitmask tables as .npy files; load() maps such a
+      directory read-only, so every process on a host shares one copy through the page cache
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, feature_names: List[str],
+                 cover: Optional[np.ndarray] = None, bitmasks: Optional[dict] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names)
+        self.cover = cover
+        self.n_estimators = len(roots)
+        self.n_features = len(self.feature_names)
+        self._bitmasks = bitmasks if bitmasks is not None else self._build_bitmasks()
+        # Built on the first attributions() call
+        self._explainer: Optional[dict] = None
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted binary RandomForestClassifier"""
+        features, thresholds, lefts, rights, values, covers, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            counts = tree.value[:, 0, :]
+            values.append(counts[:, 1] / counts.sum(axis=1))
+            # Bootstrap-weighted samples per node, the cover TreeSHAP weighs unknown splits by
+            covers.append(tree.weighted_n_node_samples)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        if feature_names is None:
+            feature_names = [f"x{i}" for i in range(model.n_features_in_)]
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            feature_names=list(feature_names),
+            cover=np.concatenate(covers).astype(np.float64)
+        )
+
+    def save(self, path: str) -> None:
+        extra = {} if self.cover is None else {"cover": self.cover}
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold,
+            left=self.left, right=self.right, value=self.value, roots=self.roots,
+            max_depth=np.int64(self.max_depth),
+            feature_names=np.asarray(self.feature_names, dtype=str),
+            **extra
+        )
+
+    def save_mapped(self, path: str) -> None:
+        """Write a directory of .npy files that load() memory-maps, bitmask tables included.
+
+        The directory is built next to path and swapped in with renames: a file that
+        workers already have mapped is never rewritten, it is only unlinked.
+        """
+        arrays = {"feature": self.feature, "threshold": self.threshold, "left": self.left, "right": self.right,
+                  "value": self.value, "roots": self.roots}
+        if self.cover is not None:
+            arrays["cover"] = self.cover
+        bm = self._bitmasks
+        if bm is not None:
+            arrays["leaf_value"] = bm["leaf_value"]
+            for j in range(self.n_features):
+                arrays[f"bitmask_thresholds_{j}"] = bm["thresholds"][j]
+                arrays[f"bitmask_table_{j}"] = bm["tables"][j]
+
+        path = path.rstrip(os.sep)
+        staging = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        digest = hashlib.sha256()
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(staging, name + ".npy"), array, allow_pickle=False)
+            digest.update(name.encode())
+            digest.update(array.tobytes())
+        manifest = {
+            "format": MAPPED_FORMAT,
+            "version": digest.hexdigest()[:12],
+            "max_depth": self.max_depth,
+            "feature_names": self.feature_names,
+            "arrays": list(arrays),
+            "bitmask_words": bm["words"] if bm is not None else None,
+        }
+        with open(os.path.join(staging, MAPPED_MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+
+        retired = None
+        if os.path.exists(path):
+            retired = f"{path}.old-{os.getpid()}"
+            os.rename(path, retired)
+        os.rename(staging, path)
+        if retired is not None:
+            shutil.rmtree(retired)
+
+    @classmethod
+    def _load_mapped(cls, path: str) -> "CompiledForest":
+        with open(os.path.join(path, MAPPED_MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != MAPPED_FORMAT:
+            raise ValueError(f"{path}: unsupported forest format {manifest.get('format')!r}")
+        # Read-only maps; viewed as plain arrays so results of arithmetic are not memmaps
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r", allow_pickle=False).view(np.ndarray)
+                  for name in manifest["arrays"]}
+        n_features = len(manifest["feature_names"])
+        bitmasks = None
+        if manifest["bitmask_words"] is not None:
+            bitmasks = {"thresholds": [arrays[f"bitmask_thresholds_{j}"] for j in range(n_features)],
+                        "tables": [arrays[f"bitmask_table_{j}"] for j in range(n_features)],
+                        "leaf_value": arrays["leaf_value"], "words": manifest["bitmask_words"]}
+        return cls(
+            feature=arrays["feature"], threshold=arrays["threshold"],
+            left=arrays["left"], right=arrays["right"], value=arrays["value"], roots=arrays["roots"],
+            max_depth=manifest["max_depth"], feature_names=manifest["feature_names"],
+            cover=arrays.get("cover"), bitmasks=bitmasks
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        """Load a save() .npz, or memory-map a save_mapped() directory"""
+        if os.path.isdir(path):
+            return cls._load_mapped(path)
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                feature=data["feature"], threshold=data["threshold"],
+                left=data["left"], right=data["right"], value=data["value"], roots=data["roots"],
+                max_depth=int(data["max_depth"]), feature_names=data["feature_names"].tolist(),
+                # Artifacts exported before attributions existed have no cover
+                cover=data["cover"] if "cover" in data.files else None
+            )
+
+    # ---------------- Leaf bitmasks ----------------
+    def _build_bitmasks(self) -> Optional[dict]:
+        """Per feature, the AND of leaf masks of every split whose threshold is below a value.
+
+        A split x <= t is false exactly when t < x, and a false split rules out every
+        leaf of its left subtree. Sorting each feature's thresholds turns "which splits
+        are false" into a prefix, so the surviving leaves of every tree are one table
+        row per feature; the exit leaf is the lowest surviving bit.
+        """
+        n_trees = self.n_estimators
+        is_leaf = self.left == np.arange(len(self.value))
+        leaves_per_tree = np.add.reduceat(is_leaf.astype(np.int64), self.roots)
+        words = int(-(-leaves_per_tree.max() // 64))
+        n_splits = int((~is_leaf).sum())
+        if (n_splits + self.n_features) * n_trees * words * 8 > MAX_BITMASK_BYTES:
+            return None
+
+        leaf_value = np.zeros((n_trees, words * 64))
+        split_tree, split_mask = [], []
+        split_nodes = []
+        for t in range(n_trees):
+            # In-order leaf numbering, and the leaf range covered by each left subtree
+            first_leaf = {}
+            n_leaves = 0
+            stack = [(int(self.roots[t]), False)]
+            ranges = {}
+            while stack:
+                node, expanded = stack.pop()
+                if is_leaf[node]:
+                    first_leaf[node] = n_leaves
+                    leaf_value[t, n_leaves] = self.value[node]
+                    n_leaves += 1
+                elif not expanded:
+                    stack.append((node, True))
+                    stack.append((int(self.right[node]), False))
+                    stack.append((int(self.left[node]), False))
+                    ranges[node] = n_leaves
+                else:
+                    split_nodes.append(node)
+                    split_tree.append(t)
+                    lo = ranges[node]
+                    # Left subtree leaves are [lo, first leaf of right subtree)
+                    hi = self._leftmost_leaf(int(self.right[node]), first_leaf)
+                    mask = np.full(words, np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+                    for bit in range(lo, hi):
+                        mask[bit // 64] &= ~np.uint64(1 << (bit % 64))
+                    split_mask.append(mask)
+
+        split_nodes = np.asarray(split_nodes, dtype=np.int64)
+        split_tree = np.asarray(split_tree, dtype=np.int64)
+        split_mask = np.asarray(split_mask, dtype=np.uint64).reshape(len(split_nodes), words)
+
+        thresholds, tables = [], []
+        for j in range(self.n_features):
+            on_feature = np.nonzero(self.feature[split_nodes] == j)[0]
+            order = on_feature[np.argsort(self.threshold[split_nodes[on_feature]], kind="stable")]
+            table = np.full((len(order) + 1, n_trees, words), np.uint64(0xFFFFFFFFFFFFFFFF), dtype=np.uint64)
+            for k, s in enumerate(order, start=1):
+                table[k] = table[k - 1]
+                table[k, split_tree[s]] &= split_mask[s]
+            thresholds.append(self.threshold[split_nodes[order]])
+            tables.append(table)
+
+        return {"thresholds": thresholds, "tables": tables, "leaf_value": leaf_value, "words": words}
+
+    def _leftmost_leaf(self, node: int, first_leaf: dict) -> int:
+        while self.left[node] != node:
+            node = int(self.left[node])
+        return first_leaf[node]
+
+    def _exit_leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Leaf probability reached in every tree via the bitmask tables, shape (n_rows, n_trees)"""
+        bm = self._bitmasks
+        alive = None
+        for j in range(self.n_features):
+            k = np.searchsorted(bm["thresholds"][j], X[:, j], side="left")
+            rows = bm["tables"][j][k]
+            alive = rows if alive is None else alive & rows
+
+        if bm["words"] == 1:
+            word_index = 0
+            word = alive[:, :, 0]
+        else:
+            word_index = np.argmax(alive != 0, axis=2)
+            word = np.take_along_axis(alive, word_index[:, :, None], axis=2)[:, :, 0]
+        lowest = word & (~word + np.uint64(1))
+        bit = np.log2(lowest.astype(np.float64)).astype(np.int64) + 64 * word_index
+        return bm["leaf_value"][np.arange(self.n_estimators), bit]
+
+    # ---------------- Node walking ----------------
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node id reached in every tree, shape (n_rows, n_estimators)"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = _as_input(X)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    # ---------------- Prediction ----------------
+    def predict_one(self, x: np.ndarray) -> float:
+        """Probability of the positive class for a single feature vector"""
+        x = _as_input(x)
+        if self._bitmasks is not None:
+            leaf_values = self._exit_leaf_values(x[None, :])[0]
+        else:
+            # Resolve every split once, then hop through the trees
+            next_node = np.where(x[self.feature] <= self.threshold, self.left, self.right)
+            node = self.roots
+            for _ in range(self.max_depth):
+                node = next_node[node]
+            leaf_values = self.value[node]
+        # Sequential sum in tree order, as sklearn accumulates it
+        return float(np.cumsum(leaf_values)[-1] / self.n_estimators)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Same layout as RandomForestClassifier.predict_proba: (n_rows, 2)"""
+        X = _as_input(X)
+        positive = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            block = X[start:start + BLOCK_ROWS]
+            if self._bitmasks is not None:
+                leaf_values = self._exit_leaf_values(block)
+            else:
+                leaf_values = self.value[self.apply(block)]
+            positive[start:start + len(block)] = np.cumsum(leaf_values, axis=1)[:, -1] / self.n_estimators
+        return np.column_stack([1.0 - positive, positive])
+
+    # ---------------- Attributions ----------------
+    def _build_explainer(self) -> dict:
+        """Leaf boxes and per-coalition leaf weights for path-dependent TreeSHAP.
+
+        The value of a coalition S for a row is the forest output when only the
+        features in S are known: each tree follows x on splits over S and, on any
+        other split, takes both children weighted by their share of the node's
+        cover. Per leaf that is its value times, for every feature outside S, the
+        product of cover ratios along its path, provided x lies in the leaf's box
+        on every feature in S. Feature values are bucketed by the forest's
+        thresholds, so small coalitions become lookup tables over bucket grids;
+        the rest are summed over leaves per row.
+        """
+        if self.cover is None:
+            raise ValueError("Attributions need node cover; re-export the forest with python -m modules.forest_engine")
+        n_features = self.n_features
+        is_leaf = self.left == np.arange(len(self.value))
+        edges = [np.unique(self.threshold[~is_leaf & (self.feature == j)]) for j in range(n_features)]
+
+        boxes, ratios, leaf_values = [], [], []
+        for root in self.roots:
+            stack = [(int(root), np.zeros(n_features, dtype=np.int64),
+                      np.asarray([len(e) + 1 for e in edges], dtype=np.int64), np.ones(n_features))]
+            while stack:
+                node, lo, hi, ratio = stack.pop()
+                if is_leaf[node]:
+                    boxes.append((lo, hi))
+                    ratios.append(ratio)
+                    leaf_values.append(self.value[node])
+                    continue
+                j = int(self.feature[node])
+                # x <= threshold exactly when x's bucket is at or below the threshold's position
+                k = int(np.searchsorted(edges[j], self.threshold[node]))
+                for child, child_lo, child_hi in ((int(self.left[node]), lo[j], min(hi[j], k + 1)),
+                                                  (int(self.right[node]), max(lo[j], k + 1), hi[j])):
+                    box_lo, box_hi, child_ratio = lo.copy(), hi.copy(), ratio.copy()
+                    box_lo[j], box_hi[j] = child_lo, child_hi
+                    child_ratio[j] *= self.cover[child] / self.cover[node]
+                    stack.append((child, box_lo, box_hi, child_ratio))
+
+        lo = np.asarray([b[0] for b in boxes])
+        hi = np.asarray([b[1] for b in boxes])
+        ratios = np.asarray(ratios)
+        leaf_values = np.asarray(leaf_values) / self.n_estimators
+        # indicators[j][b, l]: leaf l's box admits bucket b of feature j
+        indicators = [(lo[None, :, j] <= np.arange(len(edges[j]) + 1)[:, None]) &
+                      (np.arange(len(edges[j]) + 1)[:, None] < hi[None, :, j]) for j in range(n_features)]
+
+        coalitions = {}
+        for size in range(n_features + 1):
+            for members in combinations(range(n_features), size):
+                outside = [j for j in range(n_features) if j not in members]
+                weights = leaf_values * np.prod(ratios[:, outside], axis=1)
+                # Smallest features first, so the largest is contracted by one matrix product
+                members = sorted(members, key=lambda j: len(edges[j]))
+                shape = [len(edges[j]) + 1 for j in members]
+                cells = int(np.prod(shape))
+                if cells <= MAX_COALITION_CELLS and cells // max(shape[-1:] or [1]) * len(weights) * 8 <= MAX_BITMASK_BYTES:
+                    partial = weights[None, :]
+                    for j in members[:-1]:
+                        partial = (partial[:, None, :] * indicators[j][None, :, :]).reshape(-1, len(weights))
+                    table = partial @ indicators[members[-1]].T if members else partial.sum(axis=1)
+                    coalitions[frozenset(members)] = ("table", members, np.asarray(shape), table.reshape(-1))
+                else:
+                    coalitions[frozenset(members)] = ("leaves", members, None, weights)
+
+        shapley_weights = [factorial(k) * factorial(n_features - k - 1) / factorial(n_features)
+                           for k in range(n_features)]
+        # The empty coalition admits every leaf: a one-cell table, or per-leaf weights for a forest too large for one
+        kind, _, _, empty = coalitions[frozenset()]
+        expected_value = float(empty[0] if kind == "table" else empty.sum())
+        return {"edges": edges, "indicators": indicators, "coalitions": coalitions,
+                "shapley_weights": shapley_weights, "expected_value": expected_value}
+
+    @property
+    def expected_value(self) -> float:
+        """Cover-weighted mean prediction: the baseline attributions are measured from"""
+        if self._explainer is None:
+            self._explainer = self._build_explainer()
+        return self._explainer["expected_value"]
+
+    def attributions(self, X: np.ndarray) -> np.ndarray:
+        """Exact path-dependent TreeSHAP values of the positive-class probability, shape (n_rows, n_features).
+
+        Each row's values sum to its predicted probability minus expected_value.
+        """
+        if self._explainer is None:
+            self._explainer = self._build_explainer()
+        ex = self._explainer
+        X = _as_input(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.empty((X.shape[0], self.n_features))
+        for start in range(0, X.shape[0], ATTRIBUTION_BLOCK_ROWS):
+            block = X[start:start + ATTRIBUTION_BLOCK_ROWS]
+            out[start:start + len(block)] = self._block_attributions(block, ex)
+        return out
+
+    def _block_attributions(self, X: np.ndarray, ex: dict) -> np.ndarray:
+        buckets = [np.searchsorted(ex["edges"][j], X[:, j], side="left") for j in range(self.n_features)]
+        values = {}
+        reached = {}
+        for members_key, (kind, members, shape, data) in ex["coalitions"].items():
+            if kind == "table":
+                flat = np.zeros(len(X), dtype=np.int64)
+                for j, size in zip(members, shape):
+                    flat = flat * size + buckets[j]
+                values[members_key] = data[flat]
+                continue
+            # Leaves whose box admits the row on every known feature, extending the largest subset already done
+            known = max((key for key in reached if key < members_key), key=len, default=frozenset())
+            mask = reached[known].copy() if known else np.ones((len(X), len(data)), dtype=bool)
+            for j in members_key - known:
+                mask &= ex["indicators"][j][buckets[j]]
+            reached[members_key] = mask
+            values[members_key] = mask @ data
+
+        phi = np.zeros((len(X), self.n_features))
+        for members_key, value in values.items():
+            weight = ex["shapley_weights"][len(members_key)] if len(members_key) < self.n_features else 0.0
+            for j in range(self.n_features):
+                if j not in members_key:
+                    phi[:, j] += weight * (values[members_key | {j}] - value)
+        return phi
+
+
+if __name__ == "__main__":
+    # Convert an existing pickled model: python -m modules.forest_engine [model.pkl] [output.npz | output_dir]
+    # An output path not ending in .npz is written as a memory-mapped directory
+    import sys
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "modules/model.pkl"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else model_path.rsplit(".", 1)[0] + "_forest.npz"
+
+    forest = CompiledForest.from_sklearn(joblib.load(model_path))
+    if output_path.endswith(".npz"):
+        forest.save(output_path)
+    else:
+        forest.save_mapped(output_path)
+    print(f"✅ Compiled {forest.n_estimators} trees ({len(forest.value)} nodes) to {output_path}")
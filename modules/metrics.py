@@ -0,0 +1,195 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# Latency buckets in seconds: 50us .. 10s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *label_values: str, value: float) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        self.observe_many([(value, label_values)])
+
+    def observe_many(self, observations: List[Tuple[float, Tuple[str, ...]]]) -> None:
+        """Record several (value, label values) pairs under a single lock acquisition"""
+        buckets = self.buckets
+        with self._lock:
+            for value, label_values in observations:
+                series = self._series.get(label_values)
+                if series is None:
+                    series = self._series[label_values] = [[0] * (len(buckets) + 1), 0.0, 0]
+                series[0][bisect_left(buckets, value)] += 1
+                series[1] += value
+                series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total:.9g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "scoring_stage_seconds", "Latency of each scoring pipeline stage", ("app", "stage")))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "scoring_requests_total", "Scoring requests by endpoint and HTTP status", ("app", "endpoint", "status")))
+VALIDATION_ERRORS_TOTAL = REGISTRY.register(Counter(
+    "scoring_validation_errors_total", "Validation errors by message", ("app", "message")))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    "scoring_model_load_seconds", "Duration of the most recent model load", ("engine",)))
+MODEL_LOADS_TOTAL = REGISTRY.register(Counter(
+    "scoring_model_loads_total", "Model loads, including hot reloads", ("engine",)))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "scoring_batch_size", "Applicants per coalesced model call", ("app",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)))
+BATCH_QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "scoring_batch_queue_wait_seconds", "Time from joining a batch to its model call starting", ("app",)))
+SHADOW_SECONDS = REGISTRY.register(Histogram(
+    "scoring_shadow_seconds", "Duration of one shadow scorer call over a batch", ("app", "scorer")))
+SHADOW_RESULTS_TOTAL = REGISTRY.register(Counter(
+    "scoring_shadow_results_total", "Applicants scored by each shadow scorer", ("app", "scorer", "status")))
+SHADOW_DROPPED_TOTAL = REGISTRY.register(Counter(
+    "scoring_shadow_dropped_total", "Applicants not shadow-scored because the shadow queue was full", ("app",)))
+
+_INDEX = re.compile(r"\[\d+\]")
+
+
+def normalize_error(message: str) -> str:
+    """Drop list indices so validation messages stay low-cardinality labels"""
+    return _INDEX.sub("[]", message)
+
+
+class StageTimer:
+    """
+    Per-request stage timings
+    - mark(stage) closes the stage that started at the previous mark
+    - record() adds a "total" stage and feeds everything into STAGE_SECONDS
+    """
+
+    def __init__(self, app: str):
+        self.app = app
+        self.started = self._last = time.perf_counter()
+        self.timings: List[Tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.timings.append((stage, now - self._last))
+        self._last = now
+
+    def record(self) -> None:
+        self.timings.append(("total", time.perf_counter() - self.started))
+        STAGE_SECONDS.observe_many([(seconds, (self.app, stage)) for stage, seconds in self.timings])
+
+    def server_timing(self) -> str:
+        """Value for a Server-Timing response header, durations in milliseconds"""
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.timings)
+
+
+def timing_requested(headers, name: str = "x-debug-timing") -> bool:
+    return headers.get(name, "").lower() in ("1", "true", "yes")
+
+
+def observe_validation_errors(app: str, result: Dict) -> None:
+    for message in result.get("errors") or [result.get("message", "unknown")]:
+        VALIDATION_ERRORS_TOTAL.inc(app, normalize_error(message))
+
+
+def render_cache_stats(stats: Dict) -> str:
+    """Result cache counters in the same exposition format"""
+    lines = []
+    for key, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                      ("expirations", "counter"), ("size", "gauge")):
+        name = f"scoring_cache_{key}" + ("_total" if kind == "counter" else "")
+        lines += [f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+    return "\n".join(lines) + "\n"
+
+
+def render_executor_stats(stats: Dict) -> str:
+    """Scoring executor occupancy and admission counters"""
+    lines = []
+    for key, kind in (("in_flight", "gauge"), ("max_workers", "gauge"), ("max_queue", "gauge"),
+                      ("rejected", "counter"), ("expired", "counter")):
+        name = f"scoring_executor_{key}" + ("_total" if kind == "counter" else "")
+        lines += [f"# TYPE {name} {kind}", f"{name} {stats[key]}"]
+    return "\n".join(lines) + "\n"
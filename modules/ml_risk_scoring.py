@@ -1,26 +1,128 @@
-
-import pandas as pd
-import joblib
-from typing import Dict, Any
+import numpy as np
+from numbers import Real
+from typing import Dict, Any, List, TYPE_CHECKING
 import os
 
+from modules.forest_engine import CompiledForest
+
+# pandas, joblib and scikit-learn are imported only by the sklearn engine and the
+# frame API, so the service's hot path loads with NumPy alone
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns the model was trained on, in training order
+MODEL_FEATURES = ["dti_ratio", "ltv_ratio", "credit_score", "fraud_flag"]
+
+# Engineered features a prediction depends on (model inputs and reasons)
+INPUT_FEATURES = ["dti_ratio", "ltv_ratio", "credit_score_normalized"]
+
+# Value of the model's fraud_flag input. No engineered feature has ever reached it in production,
+# so it is held at 0; feeding it flag_fraud changes PDs and needs a retrained, versioned model
+MODEL_FRAUD_FLAG = 0
+
+# "sklearn" unpickles the RandomForestClassifier; "compiled" evaluates the exported node arrays,
+# memory-mapped from the *_forest directory when there is one
+ENGINES = ("sklearn", "compiled")
+
+# "thresholds" explains with fixed cut-offs; "attributions" with the forest's own TreeSHAP values
+REASON_SOURCES = ("thresholds", "attributions")
+
+# Reason given when a model feature is among the largest contributors to a higher PD.
+# fraud_flag has none: it is the constant MODEL_FRAUD_FLAG, so its attribution says nothing about the applicant
+ATTRIBUTION_REASONS = {
+    "dti_ratio": "Debt-to-Income ratio raises default risk",
+    "ltv_ratio": "Loan-to-Value ratio raises default risk",
+    "credit_score": "Credit score raises default risk",
+}
+
+# Model inputs that can be given as reasons, in MODEL_FEATURES order
+_EXPLAINED = np.asarray([name in ATTRIBUTION_REASONS for name in MODEL_FEATURES])
+
+
+def model_artifact_path(model_path: str, engine: str = "sklearn") -> str:
+    """File an engine loads: the pickle itself, or the *_forest directory (else *_forest.npz) exported next to it"""
+    if engine == "compiled" and not model_path.endswith(".npz") and not os.path.isdir(model_path):
+        mapped = os.path.splitext(model_path)[0] + "_forest"
+        return mapped if os.path.isdir(mapped) else mapped + ".npz"
+    return model_path
+
+
 class AIRiskScorer:
-    def __init__(self, model_path="modules/model.pkl"):
-        if os.path.exists(model_path):
-            self.model = joblib.load(model_path)
-        else:
+    input_features = INPUT_FEATURES
+
+    def __init__(self, model_path="modules/model.pkl", engine="sklearn", reason_source="thresholds", top_k=3):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}")
+        if reason_source not in REASON_SOURCES:
+            raise ValueError(f"Unknown reason source '{reason_source}', expected one of: {', '.join(REASON_SOURCES)}")
+        self.engine = engine
+        self.reason_source = reason_source
+        self.top_k = top_k
+        self.artifact_path = model_artifact_path(model_path, engine)
+
+        if not os.path.exists(self.artifact_path):
             raise FileNotFoundError("Trained model not found. Please run train_model.py first.")
+        if engine == "compiled":
+            self.model = CompiledForest.load(self.artifact_path)
+        else:
+            import joblib
+            self.model = joblib.load(self.artifact_path)
 
-    def calculate_risk(self, features: Dict[str, Any]) -> Dict[str, Any]:
-        input_df = pd.DataFrame([{
+        self.explainer = None
+        if reason_source == "attributions":
+            self.explainer = self.model if engine == "compiled" else CompiledForest.from_sklearn(self.model)
+            # Builds the attribution tables now, and fails here for a forest exported without node cover
+            self.expected_value = self.explainer.expected_value
+
+    @staticmethod
+    def _model_row(features: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             "dti_ratio": features.get("dti_ratio", 0),
             "ltv_ratio": features.get("ltv_ratio", 0),
             "credit_score": features.get("credit_score_normalized", 0) * 850,
-            "fraud_flag": features.get("flag_fraud", 0)
-        }])
+            "fraud_flag": MODEL_FRAUD_FLAG
+        }
+
+    @staticmethod
+    def _check_row(row: Dict[str, Any]) -> None:
+        for name, value in row.items():
+            if not isinstance(value, Real) or isinstance(value, bool):
+                raise ValueError(f"Model input {name} must be a number, got {type(value).__name__}")
+            if value != value:
+                raise ValueError(f"Model input {name} must not be NaN")
+
+    @classmethod
+    def check_features(cls, features: Dict[str, Any]) -> None:
+        """Raise ValueError if one of the applicant's model inputs is null, NaN or not a number"""
+        cls._check_row(cls._model_row(features))
 
-        prob_default = self.model.predict_proba(input_df)[0][1]
+    def _predict(self, X: np.ndarray) -> np.ndarray:
+        """Probability of default for a (n_rows, 4) matrix in MODEL_FEATURES order.
 
+        NaN raises ValueError with either engine: sklearn would route it down its own
+        missing-value branches, which the compiled engine cannot reproduce.
+        """
+        if np.isnan(X).any():
+            raise ValueError("Model inputs must not be NaN")
+        if self.engine == "compiled":
+            return self.model.predict_proba(X)[:, 1]
+        import pandas as pd
+        return self.model.predict_proba(pd.DataFrame(X, columns=MODEL_FEATURES))[:, 1]
+
+    def _attribution_reasons(self, phi: np.ndarray) -> List[str]:
+        """Reasons for the top_k features that raised this applicant's PD the most"""
+        phi = np.where(_EXPLAINED, phi, -np.inf)
+        order = np.argsort(-phi, kind="stable")[:self.top_k]
+        return [ATTRIBUTION_REASONS[MODEL_FEATURES[j]] for j in order if phi[j] > 0]
+
+    def _explained_result(self, prob_default: float, features: Dict[str, Any], phi: np.ndarray) -> Dict[str, Any]:
+        result = self._build_result(prob_default, features)
+        result["reasons"] = self._attribution_reasons(phi)
+        result["attributions"] = {name: round(float(value), 4) for name, value in zip(MODEL_FEATURES, phi)}
+        return result
+
+    @staticmethod
+    def _build_result(prob_default: float, features: Dict[str, Any]) -> Dict[str, Any]:
         # Risk Level
         if prob_default < 0.3:
             risk_level = "Low Risk"
@@ -37,11 +139,104 @@ class AIRiskScorer:
             reasons.append("High Loan-to-Value ratio")
         if (features.get("credit_score_normalized", 1) * 850) < 650:
             reasons.append("Low credit score")
-        if features.get("flag_fraud", 0) == 1:
-            reasons.append("Fraud signals detected")
 
         return {
             "probability_of_default": round(float(prob_default), 2),
             "risk_level": risk_level,
             "reasons": reasons
         }
+
+    def calculate_risk(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        row = self._model_row(features)
+        self._check_row(row)
+        if self.engine == "compiled":
+            prob_default = self.model.predict_one(np.array([row[name] for name in MODEL_FEATURES], dtype=np.float64))
+        else:
+            import pandas as pd
+            input_df = pd.DataFrame([row])
+            prob_default = self.model.predict_proba(input_df)[0][1]
+
+        if self.explainer is not None:
+            phi = self.explainer.attributions(np.array([row[name] for name in MODEL_FEATURES], dtype=np.float64))[0]
+            return self._explained_result(prob_default, features, phi)
+        return self._build_result(prob_default, features)
+
+    def calculate_risk_batch(self, features_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score many applicants with a single predict_proba call"""
+        if not features_list:
+            return []
+
+        # Build the feature matrix column by column instead of row by row
+        rows = [self._model_row(f) for f in features_list]
+        X = np.column_stack([
+            np.asarray([row[name] for row in rows], dtype=np.float64) for name in MODEL_FEATURES
+        ])
+
+        prob_default = self._predict(X)
+
+        if self.explainer is not None:
+            phi = self.explainer.attributions(X)
+            return [self._explained_result(p, f, v) for p, f, v in zip(prob_default, features_list, phi)]
+        return [self._build_result(p, f) for p, f in zip(prob_default, features_list)]
+
+    def calculate_risk_frame(self, features, reasons: bool = True) -> "pd.DataFrame":
+        """Columnar scoring for the output of FeatureEngineer.calculate_features_frame.
+
+        Probabilities are returned unrounded and reasons are joined with "; ";
+        reasons=False leaves the reasons column out. With attribution reasons, each
+        model feature's TreeSHAP value is added as an attribution_<feature> column.
+        """
+        n_rows = len(features)
+
+        def column(name, default):
+            if name in features:
+                return np.asarray(features[name], dtype=np.float64)
+            return np.full(n_rows, default, dtype=np.float64)
+
+        dti = column("dti_ratio", 0)
+        ltv = column("ltv_ratio", 0)
+        X = np.column_stack([dti, ltv, column("credit_score_normalized", 0) * 850,
+                             np.full(n_rows, MODEL_FRAUD_FLAG, dtype=np.float64)])
+
+        prob_default = self._predict(X)
+
+        risk_level = np.select(
+            [prob_default < 0.3, prob_default < 0.6], ["Low Risk", "Medium Risk"], default="High Risk"
+        )
+
+        import pandas as pd
+        index = features.index if hasattr(features, "index") else None
+        if not reasons:
+            return pd.DataFrame({"probability_of_default": prob_default, "risk_level": risk_level}, index=index)
+
+        if self.explainer is not None:
+            phi = self.explainer.attributions(X)
+            # Rows share few distinct top-k orderings: join each ordering's reasons once
+            ranked = np.where(_EXPLAINED, phi, -np.inf)
+            order = np.argsort(-ranked, axis=1, kind="stable")[:, :self.top_k]
+            positive = np.take_along_axis(ranked, order, axis=1) > 0
+            n_model = len(MODEL_FEATURES)
+            codes = np.where(positive, order, n_model) @ (n_model + 1) ** np.arange(order.shape[1])
+            unique_codes, inverse = np.unique(codes, return_inverse=True)
+            joined = np.asarray(["; ".join(ATTRIBUTION_REASONS[MODEL_FEATURES[j]]
+                                           for j in (code // (n_model + 1) ** np.arange(order.shape[1])) % (n_model + 1)
+                                           if j < n_model) for code in unique_codes], dtype=object)
+            frame = {"probability_of_default": prob_default, "risk_level": risk_level,
+                     "reasons": joined[inverse.reshape(-1)]}
+            frame.update({f"attribution_{name}": phi[:, j] for j, name in enumerate(MODEL_FEATURES)})
+            return pd.DataFrame(frame, index=index)
+
+        reasons = np.full(n_rows, "", dtype=object)
+        for mask, text in (
+            (dti > 0.4, "High Debt-to-Income ratio"),
+            (ltv > 0.8, "High Loan-to-Value ratio"),
+            (column("credit_score_normalized", 1) * 850 < 650, "Low credit score"),
+        ):
+            reasons = np.where(mask, reasons + text + "; ", reasons)
+        reasons = np.array([r[:-2] for r in reasons], dtype=object)
+
+        return pd.DataFrame({
+            "probability_of_default": prob_default,
+            "risk_level": risk_level,
+            "reasons": reasons
+        }, index=index)
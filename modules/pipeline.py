@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from modules.data_input import DataInputValidator
+from modules.feature_engineering import FeatureEngineer
+from modules.feature_graph import FeaturePlan
+from modules.forest_engine import MAPPED_MANIFEST
+from modules.ml_risk_scoring import AIRiskScorer, model_artifact_path
+from modules.cache import ResultCache
+from modules.reference_data import ReferenceData
+from modules.shadow import ShadowRunner
+from modules.metrics import MODEL_LOAD_SECONDS, MODEL_LOADS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Neutral applicant used to warm the model after every (re)load
+WARMUP_FEATURES = {
+    "dti_ratio": 0.3,
+    "ltv_ratio": 0.7,
+    "credit_score_normalized": 0.8
+}
+
+
+def file_fingerprint(path: str) -> str:
+    """Short content hash of a model file, used as the model version"""
+    if os.path.isdir(path):
+        # Memory-mapped forest: its manifest carries a digest of every array
+        path = os.path.join(path, MAPPED_MANIFEST)
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ScoringPipeline:
+    """
+    Process-wide scoring pipeline
+    - Builds validator, feature engineer and scorer once
+    - Computes only the features the scorer and shadow scorers read; a scorer asking for a
+      feature nothing provides fails its load
+    - Warms the model so the first request does not pay for it
+    - Hot-reloads the model atomically when the file on disk changes
+    - Optionally caches results; the cache is cleared whenever the model changes
+    - Optionally hands every scored applicant's features to shadow scorers
+    - Optionally completes payloads from local reference data before validation
+    """
+
+    def __init__(self, model_path: str = "modules/model.pkl", engine: str = "sklearn",
+                 cache: Optional[ResultCache] = None, shadow: Optional[ShadowRunner] = None,
+                 reference: Optional[ReferenceData] = None, reason_source: str = "thresholds"):
+        self.model_path = model_path
+        self.engine = engine
+        self.reason_source = reason_source
+        self.artifact_path = model_artifact_path(model_path, engine)
+        self.validator = DataInputValidator()
+        self.engineer = FeatureEngineer()
+        self.cache = cache
+        self.shadow = shadow
+        self.reference = reference
+
+        self._scorer: Optional[AIRiskScorer] = None
+        self._reload_lock = threading.Lock()
+        self.model_version: Optional[str] = None
+        self.model_mtime: Optional[float] = None
+        self.model_loaded_at: Optional[float] = None
+        self.warmed = False
+
+    @property
+    def scorer(self) -> AIRiskScorer:
+        scorer = self._scorer
+        if scorer is None:
+            raise RuntimeError("Model is not loaded yet")
+        return scorer
+
+    def is_ready(self) -> bool:
+        return self._scorer is not None and self.warmed
+
+    def load(self) -> None:
+        """Load and warm a new scorer, then swap it in with a single assignment.
+
+        In-flight requests keep the scorer they already picked up, so a reload
+        never interrupts them; a failed load leaves the current model in place.
+        """
+        with self._reload_lock:
+            started = time.perf_counter()
+            mtime = os.path.getmtime(self.artifact_path)
+            version = file_fingerprint(self.artifact_path)
+            scorer = AIRiskScorer(model_path=self.model_path, engine=self.engine, reason_source=self.reason_source)
+            # Travel with the scorer so a request never pairs one model with another's version or features
+            scorer.feature_plan = self.plan_features(scorer)
+            scorer.calculate_risk(WARMUP_FEATURES)
+            scorer.model_version = version
+
+            self._scorer = scorer
+            if self.cache is not None:
+                self.cache.clear()
+            self.model_version = version
+            self.model_mtime = mtime
+            self.model_loaded_at = time.time()
+            self.warmed = True
+
+            elapsed = time.perf_counter() - started
+            MODEL_LOAD_SECONDS.set(self.engine, value=elapsed)
+            MODEL_LOADS_TOTAL.inc(self.engine)
+            logger.info("Loaded model %s from %s in %.3fs", version, self.artifact_path, elapsed)
+
+    def reload_if_changed(self) -> bool:
+        """Reload the model if the file on disk has changed since the last load"""
+        try:
+            mtime = os.path.getmtime(self.artifact_path)
+        except OSError:
+            return False
+        if mtime == self.model_mtime:
+            return False
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Model reload failed, keeping version %s", self.model_version)
+            return False
+        return True
+
+    def plan_features(self, scorer) -> FeaturePlan:
+        """Plan for the features scorer and every shadow scorer read; raises UnknownFeatureError"""
+        features = list(scorer.input_features)
+        if self.shadow is not None:
+            features += self.shadow.input_features
+        return self.engineer.plan(list(dict.fromkeys(features)), requester=f"{self.engine} scorer")
+
+    def resolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill external and location fields the caller left to the reference data"""
+        if self.reference is None or not isinstance(data, dict):
+            return data
+        return self.reference.resolve(data)
+
+    def score_batch(self, applications: List[Any]) -> List[Dict[str, Any]]:
+        """Score a list of applications with one model call.
+
+        Invalid items are reported inline and do not fail the rest of the batch.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(applications)
+        valid_index = []
+        valid_features = []
+
+        scorer = self.scorer
+        applications = [self.resolve(data) for data in applications]
+        validation_results = self.validator.validate_batch(applications)
+        for i, (data, validation_result) in enumerate(zip(applications, validation_results)):
+            if validation_result["status"] != "success":
+                results[i] = {"index": i, **validation_result}
+                continue
+
+            try:
+                engineered = scorer.feature_plan.compute(data)
+                # A null or non-numeric model input fails this item, not the whole model call
+                scorer.check_features(engineered)
+            except Exception as e:
+                results[i] = {"index": i, "status": "error", "message": str(e)}
+                continue
+
+            valid_index.append(i)
+            valid_features.append(engineered)
+
+        risk_results = scorer.calculate_risk_batch(valid_features)
+        for i, risk_result in zip(valid_index, risk_results):
+            results[i] = {"index": i, "status": "success", **risk_result}
+
+        if self.shadow is not None and valid_features:
+            batch_id = uuid.uuid4().hex
+            self.shadow.submit_many([f"{batch_id}:{i}" for i in valid_index], valid_features, risk_results,
+                                    scorer.model_version)
+
+        return results
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "model_loaded": self._scorer is not None,
+            "warmed": self.warmed,
+            "model_path": self.artifact_path,
+            "engine": self.engine,
+            "reason_source": self.reason_source,
+            "model_version": self.model_version,
+            "features": list(self._scorer.feature_plan.outputs) if self._scorer is not None else [],
+            "model_loaded_at": self.model_loaded_at,
+            "shadow_scorers": list(self.shadow.scorers) if self.shadow is not None else [],
+            "reference_data_version": self.reference.version if self.reference is not None else None
+        }
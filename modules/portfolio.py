@@ -0,0 +1,251 @@
+import hashlib
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.data_input import DataInputValidator
+from modules.feature_engineering import FeatureEngineer
+from modules.ml_risk_scoring import AIRiskScorer, MODEL_FEATURES, model_artifact_path
+from modules.dataset import csv_dtypes, parse_numeric_columns
+from modules.feature_store import FeatureStore, is_store
+from modules.reference_data import ReferenceData
+from modules.score_index import ScoreIndex, merge_chunk, split_chunk
+
+# Bump when validation, features or result layout change in a way result_version cannot see
+RESULT_FORMAT = 3
+
+
+def result_columns(reason_source: str = "thresholds") -> List[str]:
+    columns = ["probability_of_default", "risk_level", "reasons"]
+    if reason_source == "attributions":
+        columns += [f"attribution_{name}" for name in MODEL_FEATURES]
+    return columns
+
+
+def result_version(model_path: str = "modules/model.pkl", engine: str = "sklearn",
+                   reference_path: Optional[str] = None, reason_source: str = "thresholds") -> str:
+    """Short hash of everything besides a loan's own inputs that its result depends on"""
+    from modules.pipeline import file_fingerprint
+
+    parts = {
+        "format": RESULT_FORMAT,
+        "engine": engine,
+        "model": file_fingerprint(model_artifact_path(model_path, engine)),
+        "reference_data": ReferenceData(reference_path).version if reference_path else None,
+        "columns": result_columns(reason_source),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Stream a CSV in the loan_risk_dataset.csv layout, or a feature store directory, in bounded chunks"""
+    if is_store(path):
+        yield from FeatureStore(path).iter_frames(chunksize)
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    yield from pd.read_csv(path, chunksize=chunksize, dtype=csv_dtypes(header))
+
+
+class PortfolioScorer:
+    """
+    Portfolio scoring over flat dataset rows
+    - Validates, engineers features and scores one chunk at a time
+    - Keeps memory proportional to the chunk size, not the file size
+    - With reference data, missing external and location columns are looked up from
+      the industry, region and postcode columns
+    - With attribution reasons, each model feature's TreeSHAP value is written as well
+    - With a ScoreIndex, only new or changed loans are scored; the rest reuse their stored results
+    """
+
+    def __init__(self, model_path: str = "modules/model.pkl", id_column: Optional[str] = None,
+                 engine: str = "sklearn", reference_path: Optional[str] = None, reason_source: str = "thresholds"):
+        self.validator = DataInputValidator()
+        self.engineer = FeatureEngineer()
+        self.scorer = AIRiskScorer(model_path=model_path, engine=engine, reason_source=reason_source)
+        self.result_columns = result_columns(reason_source)
+        self.id_column = id_column
+        self.reference = ReferenceData(reference_path) if reference_path else None
+
+    def score_chunk(self, chunk: pd.DataFrame, row_offset: int = 0) -> pd.DataFrame:
+        n_rows = len(chunk)
+        out = pd.DataFrame({"row_id": np.arange(row_offset, row_offset + n_rows)})
+        if self.id_column:
+            out.insert(0, self.id_column, chunk[self.id_column].to_numpy())
+        out["status"] = "success"
+        out["message"] = None
+        out["probability_of_default"] = np.nan
+        out["risk_level"] = None
+        out["reasons"] = None
+        for column in self.result_columns[3:]:
+            out[column] = np.nan
+
+        if self.reference is not None:
+            filled = self.reference.resolve_columns(chunk)
+            if filled:
+                chunk = chunk.assign(**filled)
+
+        # Step 1: Validate input
+        validation_result = self.validator.validate_frame(chunk)
+        if "valid" not in validation_result:
+            raise ValueError(validation_result["message"])
+        valid = np.asarray(validation_result["valid"], dtype=bool)
+        out.loc[~valid, "status"] = "error"
+        out.loc[~valid, "message"] = np.asarray(validation_result["errors"], dtype=object)[~valid]
+        if not valid.any():
+            return out
+
+        rows = parse_numeric_columns(chunk[valid] if not valid.all() else chunk)
+
+        # Step 2: Feature Engineering
+        engineered = self.engineer.calculate_features_frame(rows)
+
+        # Step 3: Risk Scoring
+        risk_result = self.scorer.calculate_risk_frame(engineered)
+
+        for column in self.result_columns:
+            out.loc[valid, column] = risk_result[column].to_numpy()
+        return out
+
+    def score_file(self, input_path: str, writer, chunksize: int = 50000,
+                   progress: Optional[Callable[[int, float], None]] = None,
+                   index: Optional[ScoreIndex] = None) -> int:
+        """Score a CSV chunk by chunk, handing each scored chunk to writer.write"""
+        if index is not None and not self.id_column:
+            raise ValueError("Incremental scoring needs an id column to key loans by")
+        rows_done = 0
+        started = time.perf_counter()
+        for chunk in read_chunks(input_path, chunksize):
+            if index is None:
+                writer.write(self.score_chunk(chunk, row_offset=rows_done))
+            else:
+                split = split_chunk(index, chunk, self.id_column)
+                scored, seconds = None, 0.0
+                if split.to_score.any():
+                    scored, seconds = _timed(self.score_chunk, chunk[split.to_score], rows_done)
+                writer.write(merge_chunk(index, split, scored, seconds, rows_done, self.id_column))
+            rows_done += len(chunk)
+            if progress is not None:
+                progress(rows_done, time.perf_counter() - started)
+        return rows_done
+
+
+# Per-process scorer, loaded once by the pool initializer
+_worker_scorer: Optional[PortfolioScorer] = None
+
+
+def _init_worker(model_path: str, id_column: Optional[str], engine: str, reference_path: Optional[str],
+                 reason_source: str) -> None:
+    global _worker_scorer
+    _worker_scorer = PortfolioScorer(model_path=model_path, id_column=id_column, engine=engine,
+                                     reference_path=reference_path, reason_source=reason_source)
+
+
+def _timed(score: Callable[[pd.DataFrame, int], pd.DataFrame], chunk: pd.DataFrame, row_offset: int) -> tuple:
+    started = time.perf_counter()
+    return score(chunk, row_offset), time.perf_counter() - started
+
+
+def _score_in_worker(chunk: pd.DataFrame, row_offset: int) -> tuple:
+    return _timed(_worker_scorer.score_chunk, chunk, row_offset)
+
+
+def score_file_parallel(input_path: str, writer, workers: int, chunksize: int = 50000,
+                        model_path: str = "modules/model.pkl", id_column: Optional[str] = None,
+                        engine: str = "sklearn", progress: Optional[Callable[[int, float], None]] = None,
+                        reference_path: Optional[str] = None, reason_source: str = "thresholds",
+                        index: Optional[ScoreIndex] = None) -> int:
+    """Score a CSV across a process pool, writing chunks in input order.
+
+    Each worker loads the model once. At most two chunks per worker are in
+    flight, so memory stays bounded by the chunk size and worker count. With an
+    index, the index is consulted here and only new or changed loans go to the pool.
+    """
+    if index is not None and not id_column:
+        raise ValueError("Incremental scoring needs an id column to key loans by")
+    rows_done = 0
+    rows_read = 0
+    pending = deque()
+    started = time.perf_counter()
+
+    def drain_one():
+        nonlocal rows_done
+        future, n_rows, row_offset, split = pending.popleft()
+        if split is None:
+            writer.write(future.result()[0])
+        else:
+            scored, seconds = future.result() if future is not None else (None, 0.0)
+            writer.write(merge_chunk(index, split, scored, seconds, row_offset, id_column))
+        rows_done += n_rows
+        if progress is not None:
+            progress(rows_done, time.perf_counter() - started)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, id_column, engine, reference_path, reason_source)) as pool:
+        for chunk in read_chunks(input_path, chunksize):
+            n_rows = len(chunk)
+            split = split_chunk(index, chunk, id_column) if index is not None else None
+            if split is not None:
+                chunk = chunk[split.to_score] if split.to_score.any() else None
+            future = pool.submit(_score_in_worker, chunk, rows_read) if chunk is not None else None
+            pending.append((future, n_rows, rows_read, split))
+            rows_read += n_rows
+            if len(pending) >= 2 * workers:
+                drain_one()
+        while pending:
+            drain_one()
+    return rows_done
+
+
+class CSVResultWriter:
+    def __init__(self, path: str):
+        self.path = path
+        self._header_written = False
+
+    def write(self, frame: pd.DataFrame) -> None:
+        frame.to_csv(self.path, mode="a" if self._header_written else "w",
+                     header=not self._header_written, index=False)
+        self._header_written = True
+
+    def close(self) -> None:
+        pass
+
+
+class ParquetResultWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow. Install it with: pip install pyarrow")
+        self.path = path
+        self._writer = None
+
+    def write(self, frame: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            schema = pa.schema([
+                (c, pa.from_numpy_dtype(frame[c].dtype)) if pd.api.types.is_numeric_dtype(frame[c])
+                else (c, pa.string())
+                for c in frame.columns
+            ])
+            self._writer = pq.ParquetWriter(self.path, schema)
+        self._writer.write_table(pa.Table.from_pandas(frame, schema=self._writer.schema, preserve_index=False))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_writer(path: str, fmt: Optional[str] = None):
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    if fmt == "parquet":
+        return ParquetResultWriter(path)
+    if fmt == "csv":
+        return CSVResultWriter(path)
+    raise ValueError(f"Unsupported output format: {fmt}")
@@ -0,0 +1,271 @@
+from typing import Any, Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+# Columns aggregated by default; risk_level is the scorer's risk band
+DIMENSIONS = ("industry", "employment_type", "price_trend", "risk_level")
+
+# Share of market_value assumed lost in a forced sale
+DEFAULT_RECOVERY_HAIRCUT = 0.2
+
+# Additive per-loan measures, in column order of the sums arrays
+MEASURES = ("loans", "exposure", "expected_loss", "pd_sum")
+
+MISSING_LABEL = "(missing)"
+
+
+def expected_loss(probability_of_default, loan_amount, market_value,
+                  haircut: float = DEFAULT_RECOVERY_HAIRCUT) -> np.ndarray:
+    """PD x exposure x loss given default, with recovery from the collateral's market value.
+
+    Recovery is market_value x (1 - haircut) capped at the loan amount, so
+    LGD = 1 - min(recoverable / loan_amount, 1).
+    """
+    pd_ = np.asarray(probability_of_default, dtype=np.float64)
+    exposure = np.asarray(loan_amount, dtype=np.float64)
+    recoverable = np.nan_to_num(np.asarray(market_value, dtype=np.float64) * (1 - haircut))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recovery = np.where(exposure > 0, np.clip(recoverable / exposure, 0, 1), 1.0)
+    return pd_ * exposure * (1 - recovery)
+
+
+def hhi(exposure: np.ndarray) -> float:
+    """Herfindahl-Hirschman index of exposure shares (1/n for an even split, 1 for a single group)"""
+    exposure = np.asarray(exposure, dtype=np.float64)
+    total = exposure.sum()
+    return float(np.square(exposure / total).sum()) if total > 0 else 0.0
+
+
+class PortfolioAnalytics:
+    """
+    Exposure, expected loss and concentration across a scored loan book
+    - Loans need probability_of_default, loan_amount, market_value and the dimension columns
+      (a book without one raises ValueError); the frame's index identifies each loan
+    - Every dimension keeps per-group sums of additive measures, built with np.bincount
+    - update() of re-scored loans subtracts their old contribution and adds the new one,
+      so only the changed loans are touched, never the whole book
+    - summary() turns the sums into shares, EL rates and HHI concentration indices
+    """
+
+    def __init__(self, dimensions: Iterable[str] = DIMENSIONS, haircut: float = DEFAULT_RECOVERY_HAIRCUT):
+        self.dimensions = list(dimensions)
+        self.haircut = haircut
+        self._reset()
+
+    def _reset(self) -> None:
+        self.loan_ids = pd.Index([])
+        # Per loan: the group code in every dimension and its measures
+        self._codes = {name: np.empty(0, dtype=np.int32) for name in self.dimensions}
+        self._values = np.empty((0, len(MEASURES)), dtype=np.float64)
+        # Per dimension: group labels (code order) and one row of measure sums per group
+        self._labels = {name: pd.Index([], dtype=object) for name in self.dimensions}
+        self._sums = {name: np.zeros((0, len(MEASURES)), dtype=np.float64) for name in self.dimensions}
+        self._total = np.zeros(len(MEASURES), dtype=np.float64)
+        self._exposure_sq = 0.0
+
+    def __len__(self) -> int:
+        return len(self.loan_ids)
+
+    def _measures(self, book: pd.DataFrame) -> np.ndarray:
+        exposure = book["loan_amount"].to_numpy(dtype=np.float64)
+        pd_ = book["probability_of_default"].to_numpy(dtype=np.float64)
+        return np.column_stack([
+            np.ones(len(book)),
+            exposure,
+            expected_loss(pd_, exposure, book["market_value"].to_numpy(dtype=np.float64), self.haircut),
+            pd_,
+        ])
+
+    def _encode(self, name: str, values) -> np.ndarray:
+        """Group codes for a dimension column, adding groups not seen before"""
+        if str(getattr(values, "dtype", "")) == "category":
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+        uniques = pd.Index(np.asarray(uniques, dtype=object).tolist() + [MISSING_LABEL], dtype=object)
+        codes = np.where(codes < 0, len(uniques) - 1, codes)
+
+        labels = self._labels[name]
+        mapped = labels.get_indexer(uniques)
+        unseen = (mapped < 0) & (np.bincount(codes, minlength=len(uniques)) > 0)
+        if unseen.any():
+            new_labels = uniques[unseen]
+            self._labels[name] = labels.append(new_labels)
+            self._sums[name] = np.vstack([self._sums[name], np.zeros((len(new_labels), len(MEASURES)))])
+            mapped[unseen] = np.arange(len(labels), len(labels) + len(new_labels))
+        return mapped[codes].astype(np.int32)
+
+    def _apply(self, codes: Dict[str, np.ndarray], values: np.ndarray, sign: int) -> None:
+        for name in self.dimensions:
+            n_groups = len(self._labels[name])
+            for j in range(len(MEASURES)):
+                self._sums[name][:, j] += sign * np.bincount(codes[name], weights=values[:, j], minlength=n_groups)
+        self._total += sign * values.sum(axis=0)
+        self._exposure_sq += sign * float(np.square(values[:, 1]).sum())
+
+    def fit(self, book: pd.DataFrame) -> "PortfolioAnalytics":
+        """Aggregate a whole book from scratch"""
+        self._reset()
+        self.update(book)
+        return self
+
+    def update(self, book: pd.DataFrame) -> None:
+        """Apply re-scored or new loans (indexed by loan id), touching only those loans"""
+        if not book.index.is_unique:
+            raise ValueError("Loan identifiers (the book's index) must be unique")
+        absent = [name for name in self.dimensions if name not in book.columns]
+        if absent:
+            raise ValueError(f"Book has no {', '.join(absent)} column; leave it out of the dimensions")
+        values = self._measures(book)
+        codes = {name: self._encode(name, book[name]) for name in self.dimensions}
+
+        position = self.loan_ids.get_indexer(book.index) if len(self.loan_ids) else np.full(len(book), -1)
+        known = position >= 0
+        if known.any():
+            rows = position[known]
+            self._apply({name: self._codes[name][rows] for name in self.dimensions}, self._values[rows], -1)
+            for name in self.dimensions:
+                self._codes[name][rows] = codes[name][known]
+            self._values[rows] = values[known]
+        self._apply(codes, values, 1)
+
+        if not known.all():
+            added = ~known
+            new_ids = book.index[added]
+            self.loan_ids = self.loan_ids.append(new_ids) if len(self.loan_ids) else new_ids
+            for name in self.dimensions:
+                self._codes[name] = np.concatenate([self._codes[name], codes[name][added]])
+            self._values = np.concatenate([self._values, values[added]])
+
+    def remove(self, loan_ids) -> None:
+        """Drop loans from the book (repaid, sold, written off); unknown ids are ignored"""
+        position = self.loan_ids.get_indexer(pd.Index(loan_ids))
+        rows = position[position >= 0]
+        if not len(rows):
+            return
+        self._apply({name: self._codes[name][rows] for name in self.dimensions}, self._values[rows], -1)
+        keep = np.ones(len(self.loan_ids), dtype=bool)
+        keep[rows] = False
+        self.loan_ids = self.loan_ids[keep]
+        for name in self.dimensions:
+            self._codes[name] = self._codes[name][keep]
+        self._values = self._values[keep]
+
+    def totals(self) -> Dict[str, float]:
+        loans, exposure, loss, pd_sum = self._total.tolist()
+        return {
+            "loans": int(round(loans)),
+            "exposure": exposure,
+            "expected_loss": loss,
+            "expected_loss_rate": loss / exposure if exposure else 0.0,
+            "mean_pd": pd_sum / loans if loans else 0.0,
+            # Loan-level concentration: sum of squared exposure shares
+            "loan_hhi": self._exposure_sq / exposure ** 2 if exposure else 0.0,
+        }
+
+    def breakdown(self, name: str) -> pd.DataFrame:
+        """One dimension's groups with exposure share, EL, EL rate and mean PD, largest exposure first"""
+        sums = self._sums[name]
+        # Groups whose last loan left are dropped (sums may keep float dust)
+        present = sums[:, 0] > 0.5
+        loans, exposure, loss, pd_sum = (sums[present, j] for j in range(len(MEASURES)))
+        total = exposure.sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table = pd.DataFrame({
+                "loans": np.rint(loans).astype(np.int64),
+                "exposure": exposure,
+                "exposure_share": exposure / total if total else np.zeros_like(exposure),
+                "expected_loss": loss,
+                "expected_loss_rate": np.where(exposure > 0, loss / exposure, np.nan),
+                "mean_pd": pd_sum / loans,
+            }, index=pd.Index(self._labels[name][present], name=name))
+        return table.sort_values("exposure", ascending=False)
+
+    def concentration(self) -> Dict[str, float]:
+        """HHI of exposure across each dimension's groups"""
+        return {name: hhi(self._sums[name][self._sums[name][:, 0] > 0.5, 1]) for name in self.dimensions}
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals, HHI per dimension and per-dimension breakdowns as JSON-ready values"""
+        return {
+            "totals": self.totals(),
+            "concentration": self.concentration(),
+            "breakdowns": {
+                name: {str(group): {k: float(v) for k, v in row.items()}
+                       for group, row in self.breakdown(name).to_dict("index").items()}
+                for name in self.dimensions
+            },
+        }
+
+
+def scored_book(chunk: pd.DataFrame, scored: pd.DataFrame, dimensions: Iterable[str] = DIMENSIONS) -> pd.DataFrame:
+    """Join a PortfolioScorer.score_chunk result to the input columns analytics needs.
+
+    Rows that failed validation are left out; the index is the scorer's row_id, or
+    its id column when one was given.
+    """
+    ok = (scored["status"] == "success").to_numpy()
+    id_column = scored.columns[0] if scored.columns[0] != "row_id" else "row_id"
+    columns = ["loan_amount", "market_value"] + [d for d in dimensions if d in chunk.columns]
+    book = pd.DataFrame({c: chunk[c].to_numpy()[ok] for c in columns},
+                        index=pd.Index(scored[id_column].to_numpy()[ok], name=id_column))
+    book["probability_of_default"] = scored["probability_of_default"].to_numpy(dtype=np.float64)[ok]
+    book["risk_level"] = scored["risk_level"].to_numpy()[ok]
+    return book
+
+
+def analyze_file(input_path: str, model_path: str = "modules/model.pkl", engine: str = "sklearn",
+                 chunksize: int = 50000, id_column=None, dimensions: Iterable[str] = DIMENSIONS,
+                 haircut: float = DEFAULT_RECOVERY_HAIRCUT) -> PortfolioAnalytics:
+    """Score a book chunk by chunk and fold every chunk into one PortfolioAnalytics.
+
+    Dimensions the input has no column for (other than the scorer's risk_level) are left out.
+    """
+    from modules.portfolio import PortfolioScorer, read_chunks
+
+    scorer = PortfolioScorer(model_path=model_path, id_column=id_column, engine=engine)
+    analytics = PortfolioAnalytics(dimensions, haircut)
+    rows_done = 0
+    for chunk in read_chunks(input_path, chunksize):
+        if not rows_done:
+            analytics = PortfolioAnalytics([d for d in dimensions if d in chunk.columns or d == "risk_level"], haircut)
+        analytics.update(scored_book(chunk, scorer.score_chunk(chunk, row_offset=rows_done), dimensions))
+        rows_done += len(chunk)
+    return analytics
+
+
+if __name__ == "__main__":
+    # python -m modules.portfolio_analytics loan_risk_dataset.csv --engine compiled -o portfolio_report.json
+    import argparse
+    import json
+    import sys
+
+    from modules.ml_risk_scoring import ENGINES
+
+    parser = argparse.ArgumentParser(prog="python -m modules.portfolio_analytics",
+                                     description="Expected loss and concentration of a scored loan book.")
+    parser.add_argument("input", help="CSV in the loan_risk_dataset.csv layout, or a feature store directory")
+    parser.add_argument("--model", default="modules/model.pkl", help="Model file (default: modules/model.pkl)")
+    parser.add_argument("--engine", choices=ENGINES, default="sklearn", help="Model engine (default: sklearn)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("--id-column", help="Input column identifying loans (default: row number)")
+    parser.add_argument("--haircut", type=float, default=DEFAULT_RECOVERY_HAIRCUT,
+                        help=f"Forced-sale discount on market_value (default: {DEFAULT_RECOVERY_HAIRCUT})")
+    parser.add_argument("-o", "--output", help="Also write the full summary as JSON")
+    args = parser.parse_args()
+
+    result = analyze_file(args.input, model_path=args.model, engine=args.engine, chunksize=args.chunksize,
+                          id_column=args.id_column, haircut=args.haircut)
+    totals = result.totals()
+    print(f"{totals['loans']:,} loans, exposure {totals['exposure']:,.0f}, expected loss "
+          f"{totals['expected_loss']:,.0f} ({totals['expected_loss_rate']:.2%}), mean PD {totals['mean_pd']:.3f}")
+    with pd.option_context("display.float_format", "{:,.4f}".format, "display.width", 120):
+        for name, index in result.concentration().items():
+            print(f"\n{name} (HHI {index:.4f})")
+            print(result.breakdown(name).to_string())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result.summary(), f, indent=2)
+            f.write("\n")
+    sys.exit(0)
@@ -1,4 +1,3 @@
-import pandas as pd
 from typing import Dict, Any
 
 class DataPreprocessor:
@@ -63,6 +62,8 @@ class DataPreprocessor:
 
 
 if __name__ == "__main__":
+    import pandas as pd
+
     sample_input = {
         "borrower_profile": { "income": 45000, "employment_type": "self-employed", "credit_score": 610 },
         "loan_details": { "loan_amount": 250000, "interest_rate": 7.5, "tenure_years": 15 },
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Fields each table may supply, and where they land in the /score payload
+INDUSTRY_FIELDS = ("industry_growth_rate", "portfolio_concentration_risk")       # external_data
+REGION_FIELDS = ("regional_unemployment", "regional_inflation", "recession_indicator")  # external_data
+POSTCODE_FIELDS = ("region", "crime_index", "natural_disaster_risk", "unemployment_rate")  # location_risk
+TABLE_FIELDS = {"industries": INDUSTRY_FIELDS, "regions": REGION_FIELDS, "postcodes": POSTCODE_FIELDS}
+
+
+def _load_tables(path: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    with open(path) as f:
+        raw = json.load(f)
+    unknown_tables = set(raw) - set(TABLE_FIELDS) - {"version"}
+    if unknown_tables:
+        raise ValueError(f"Unknown reference tables: {', '.join(sorted(unknown_tables))}")
+    tables = {}
+    for table, fields in TABLE_FIELDS.items():
+        entries = raw.get(table, {})
+        for key, values in entries.items():
+            unknown = set(values) - set(fields)
+            if unknown:
+                raise ValueError(f"{table}[{key!r}] has unknown fields: {', '.join(sorted(unknown))}")
+        tables[table] = {str(key): dict(values) for key, values in entries.items()}
+    # Postcode rows carry their region for routing, not as a location_risk field
+    tables["locations"] = {key: {f: v for f, v in values.items() if f != "region"}
+                           for key, values in tables["postcodes"].items()}
+    return tables
+
+
+def _lookup_column(keys, table: Dict[str, Dict[str, Any]], field: str):
+    """Per-row table[key][field] for an array of keys; NaN / None where the key or field is unknown"""
+    if str(getattr(keys, "dtype", "")) == "category":
+        keys = keys.array
+    if hasattr(keys, "codes"):
+        # Categorical (feature store): look each category up once, then gather by code (-1 = missing)
+        categories, codes = np.asarray(keys.categories, dtype=object), np.asarray(keys.codes)
+    else:
+        keys = np.asarray(keys, dtype=object)
+        categories, codes = np.unique(keys.astype(str), return_inverse=True)
+        codes = codes.reshape(-1)
+    values = [table.get(str(key), {}).get(field) for key in categories] + [None]
+    if all(v is None or isinstance(v, (int, float)) for v in values):
+        lookup = np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    else:
+        lookup = np.asarray(values, dtype=object)
+    return lookup[codes]
+
+
+class ReferenceData:
+    """
+    Local reference-data index for external and location risk inputs
+    - Loaded from a JSON file of industries, regions and postcodes
+    - resolve() fills a payload's missing fields with dict lookups; values sent inline always win
+    - refresh() reloads the file when it changes; lookups in flight keep the tables they started with
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime: Optional[float] = None
+        self.version: Optional[str] = None
+        self._tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.load()
+
+    def load(self) -> None:
+        mtime = os.path.getmtime(self.path)
+        tables = _load_tables(self.path)
+        with open(self.path, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        # One assignment swaps every table at once
+        self._tables = tables
+        self.mtime = mtime
+        self.version = version
+        logger.info("Loaded reference data %s from %s (%d industries, %d regions, %d postcodes)", version,
+                    self.path, len(tables["industries"]), len(tables["regions"]), len(tables["postcodes"]))
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed on disk; a broken file keeps the current tables"""
+        try:
+            if os.path.getmtime(self.path) == self.mtime:
+                return False
+            self.load()
+        except Exception:
+            logger.exception("Could not reload reference data from %s, keeping version %s", self.path, self.version)
+            return False
+        return True
+
+    def industry(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._tables["industries"].get(name)
+
+    def region(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._tables["regions"].get(name)
+
+    def postcode(self, code: str) -> Optional[Dict[str, Any]]:
+        return self._tables["postcodes"].get(code)
+
+    def resolve(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Payload with external_data and location_risk completed from the reference tables.
+
+        Keys are external_data.industry, external_data.region and property_details.postcode
+        (which also implies its region). The input is not modified; sections are copied
+        only when something is filled in.
+        """
+        tables = self._tables
+        ext = payload.get("external_data")
+        prop = payload.get("property_details")
+        ext = ext if isinstance(ext, dict) else {}
+        prop = prop if isinstance(prop, dict) else {}
+
+        postcode = prop.get("postcode")
+        postcode_row = tables["postcodes"].get(postcode) if isinstance(postcode, str) else None
+        region_key = ext.get("region")
+        if region_key is None and postcode_row is not None:
+            region_key = postcode_row.get("region")
+        industry_key = ext.get("industry")
+        industry = tables["industries"].get(industry_key) if isinstance(industry_key, str) else None
+        region = tables["regions"].get(region_key) if isinstance(region_key, str) else None
+        if industry is None and region is None and postcode_row is None:
+            return payload
+
+        resolved = dict(payload)
+        if industry is not None or region is not None:
+            resolved["external_data"] = {**(industry or {}), **(region or {}), **ext}
+        if postcode_row is not None:
+            location = prop.get("location_risk")
+            location = location if isinstance(location, dict) else {}
+            resolved["property_details"] = {**prop, "location_risk": {**tables["locations"][postcode], **location}}
+        return resolved
+
+    def resolve_columns(self, data) -> Dict[str, np.ndarray]:
+        """Columns (flat dataset layout) missing from data, looked up from its industry, region or postcode columns"""
+        tables = self._tables
+        filled = {}
+        if "industry" in data:
+            for field in INDUSTRY_FIELDS:
+                if field not in data:
+                    filled[field] = _lookup_column(data["industry"], tables["industries"], field)
+        region_keys = None
+        if "region" in data:
+            region_keys = data["region"]
+        elif "postcode" in data:
+            region_keys = _lookup_column(data["postcode"], tables["postcodes"], "region")
+        if region_keys is not None:
+            for field in REGION_FIELDS:
+                if field not in data:
+                    filled[field] = _lookup_column(region_keys, tables["regions"], field)
+        if "postcode" in data:
+            for field in POSTCODE_FIELDS[1:]:
+                if field not in data:
+                    filled[field] = _lookup_column(data["postcode"], tables["locations"], field)
+        return filled
+
+    def stats(self) -> Dict[str, Any]:
+        tables = self._tables
+        return {"path": self.path, "version": self.version,
+                **{table: len(tables[table]) for table in TABLE_FIELDS}}
+
+
+def build_industry_table(csv_path: str) -> Dict[str, Dict[str, Any]]:
+    """Industries table from a dataset in the loan_risk_dataset.csv layout: median growth rate, most common concentration risk"""
+    import pandas as pd
+
+    data = pd.read_csv(csv_path, usecols=["industry", *INDUSTRY_FIELDS])
+    grouped = data.groupby("industry")
+    growth = grouped["industry_growth_rate"].median()
+    concentration = grouped["portfolio_concentration_risk"].agg(lambda values: values.mode().iloc[0])
+    return {str(industry): {"industry_growth_rate": round(float(growth[industry]), 4),
+                            "portfolio_concentration_risk": str(concentration[industry])}
+            for industry in growth.index}
+
+
+if __name__ == "__main__":
+    # Seed a reference file from a dataset: python -m modules.reference_data loan_risk_dataset.csv reference_data.json
+    import sys
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "loan_risk_dataset.csv"
+    out_path = sys.argv[2] if len(sys.argv) > 2 else "reference_data.json"
+    industries = build_industry_table(csv_path)
+    with open(out_path, "w") as f:
+        json.dump({"industries": industries, "regions": {}, "postcodes": {}}, f, indent=2)
+        f.write("\n")
+    print(f"✅ Wrote {len(industries)} industries to {out_path}")
@@ -1,59 +1,242 @@
 # modules/risk_scoring.py
-from typing import Dict, Any
+import copy
+import json
+import logging
+import operator
+import os
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Comparison operators a rule may use
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# The rule table: a rule fires when `feature op threshold`, costing `penalty` points
+DEFAULT_RULE_SET = {
+    "base_score": 100,
+    "levels": [
+        {"min_score": 75, "label": "Low Risk"},
+        {"min_score": 50, "label": "Medium Risk"},
+    ],
+    "default_level": "High Risk",
+    "rules": [
+        {"feature": "credit_score_normalized", "op": "<", "threshold": 0.65, "penalty": 20,
+         "reason": "Credit score is below 650"},  # credit score < ~650
+        {"feature": "dti_ratio", "op": ">", "threshold": 0.4, "penalty": 15,
+         "reason": "High Debt-to-Income ratio increases repayment risk"},
+        {"feature": "ltv_ratio", "op": ">", "threshold": 0.8, "penalty": 15,
+         "reason": "High Loan-to-Value ratio indicates low property equity"},
+        {"feature": "flag_fraud", "op": "==", "threshold": 1, "penalty": 25,
+         "reason": "Potential fraud signals detected in documents"},
+        {"feature": "flag_falling_property", "op": "==", "threshold": 1, "penalty": 10,
+         "reason": "Property value trend is falling"},
+    ],
+}
+
+
+class RuleSet:
+    """
+    Declarative scoring rules
+    - Each rule is (feature, op, threshold, penalty, reason)
+    - Score = base_score minus the penalties of every rule that fires, clamped to 0-100
+    - Risk level is the first level whose min_score the score reaches; levels default to
+      DEFAULT_RULE_SET's
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], base_score: float = 100,
+                 levels: Optional[List[Dict[str, Any]]] = None, default_level: str = "High Risk"):
+        for rule in rules:
+            missing = {"feature", "op", "threshold", "penalty", "reason"} - set(rule)
+            if missing:
+                raise ValueError(f"Rule {rule} is missing {', '.join(sorted(missing))}")
+            if rule["op"] not in OPERATORS:
+                raise ValueError(f"Unknown operator {rule['op']!r}; expected one of {', '.join(OPERATORS)}")
+        if levels is None:
+            levels = DEFAULT_RULE_SET["levels"]
+        if not levels:
+            # With no levels every score, even 100, would fall through to default_level
+            raise ValueError("A rule set needs at least one risk level")
+        for level in levels:
+            missing = {"min_score", "label"} - set(level)
+            if missing:
+                raise ValueError(f"Level {level} is missing {', '.join(sorted(missing))}")
+        self.rules = rules
+        self.base_score = base_score
+        self.levels = sorted(levels, key=lambda level: level["min_score"], reverse=True)
+        self.default_level = default_level
+
+        self._compiled = [(r["feature"], OPERATORS[r["op"]], r["threshold"], r["penalty"], r["reason"])
+                          for r in rules]
+        self._penalties = np.asarray([r["penalty"] for r in rules], dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "RuleSet":
+        return cls(rules=config["rules"], base_score=config.get("base_score", 100),
+                   levels=config.get("levels", DEFAULT_RULE_SET["levels"]), default_level=config.get("default_level", "High Risk"))
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        """Read a rule set from a JSON file in the DEFAULT_RULE_SET layout"""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @property
+    def features(self) -> List[str]:
+        return list(dict.fromkeys(r["feature"] for r in self.rules))
+
+    def _level(self, score: float) -> str:
+        for level in self.levels:
+            if score >= level["min_score"]:
+                return level["label"]
+        return self.default_level
+
+    @staticmethod
+    def _as_int(score):
+        # Integer penalties keep integer scores, as the original hand-written rules did
+        return int(score) if isinstance(score, float) and score.is_integer() else score
+
+    def evaluate(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """Score one applicant"""
+        score = self.base_score
+        reasons = []
+        for feature, compare, threshold, penalty, reason in self._compiled:
+            if compare(features[feature], threshold):
+                score -= penalty
+                reasons.append(reason)
+        score = min(max(score, 0), 100)
+        return {"risk_score": self._as_int(score), "risk_level": self._level(score), "reasons": reasons}
+
+    def evaluate_columns(self, features) -> Dict[str, Any]:
+        """Score every row of a DataFrame or dict of equal-length arrays.
+
+        Each rule becomes one boolean mask; scores are base minus masks @ penalties.
+        Returns arrays "risk_score" and "risk_level", the (rows x rules) "fired"
+        matrix, and reasons as "reason_lists" (one per distinct combination of
+        fired rules) plus "reason_index" mapping each row to its list.
+        """
+        n_rows = len(features) if hasattr(features, "columns") else len(next(iter(features.values()), []))
+        fired = np.zeros((n_rows, len(self._compiled)), dtype=bool)
+        for j, (feature, compare, threshold, _, _) in enumerate(self._compiled):
+            if feature not in features:
+                raise KeyError(feature)
+            fired[:, j] = compare(np.asarray(features[feature]), threshold)
+
+        scores = np.clip(self.base_score - fired @ self._penalties, 0, 100)
+        levels = np.select([scores >= level["min_score"] for level in self.levels],
+                           [level["label"] for level in self.levels], default=self.default_level)
+
+        # Rows that fire the same rules share one reasons list, built once per bit pattern
+        if len(self._compiled) < 63:
+            patterns, inverse = np.unique(fired @ (1 << np.arange(len(self._compiled), dtype=np.int64)),
+                                          return_inverse=True)
+            patterns = [[int(code) >> j & 1 for j in range(len(self._compiled))] for code in patterns]
+        else:
+            patterns, inverse = np.unique(fired, axis=0, return_inverse=True)
+        reason_lists = [[r[4] for r, hit in zip(self._compiled, pattern) if hit] for pattern in patterns]
+        return {"risk_score": scores, "risk_level": levels, "fired": fired,
+                "reason_lists": reason_lists, "reason_index": inverse.reshape(-1)}
+
+
+DEFAULT_RULES = RuleSet.from_dict(DEFAULT_RULE_SET)
+
 
 class RiskScorer:
     """
     Module 4: Risk Scoring Engine
     - Calculates overall risk score (0-100)
     - Provides explanations for risk factors
+    - Rules come from a RuleSet: the built-in table, or a JSON file reloaded when it changes
+    - Given a FeatureEngineer, every rule set is planned against its feature graph before it is
+      used, and the scorer's own copy of it carries the plan as rules.feature_plan; one reading
+      a feature nothing provides fails at startup, or is rejected on reload
     """
 
+    def __init__(self, rules: Optional[RuleSet] = None, rules_path: Optional[str] = None, engineer=None):
+        self.rules_path = rules_path
+        self.engineer = engineer
+        self._rules_mtime = None
+        if rules_path:
+            self._rules_mtime = os.path.getmtime(rules_path)
+            rules = RuleSet.load(rules_path)
+        self.rules = self._planned(rules or DEFAULT_RULES)
+
+    def _planned(self, rules: RuleSet) -> RuleSet:
+        """A copy of rules with the plan for their features attached; raises UnknownFeatureError"""
+        if self.engineer is not None:
+            # Copied so scorers sharing a RuleSet (DEFAULT_RULES) never replace each other's plan
+            rules = copy.copy(rules)
+            rules.feature_plan = self.engineer.plan(rules.features, requester="rules")
+        return rules
+
+    def refresh(self) -> bool:
+        """Reload the rules file if it changed on disk; a broken file keeps the current rules"""
+        if not self.rules_path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+        except OSError:
+            logger.exception("Could not read rules file %s, keeping the current rules", self.rules_path)
+            return False
+        if mtime == self._rules_mtime:
+            return False
+        # Not retried until the file changes again
+        self._rules_mtime = mtime
+        try:
+            # Parsed and planned before the swap: the current rules stay until a complete replacement exists
+            rules = self._planned(RuleSet.load(self.rules_path))
+        except Exception:
+            logger.exception("Could not reload rules from %s, keeping the current rules", self.rules_path)
+            return False
+        self.rules = rules
+        logger.info("Loaded %d rules from %s", len(self.rules.rules), self.rules_path)
+        return True
+
+    @property
+    def input_features(self) -> List[str]:
+        return self.rules.features
+
     def calculate_risk(self, features: Dict[str, Any]) -> Dict[str, Any]:
-        score = 100
-        reasons = []
+        return self.rules.evaluate(features)
 
-        # --- Credit Score ---
-        if features["credit_score_normalized"] < 0.65:  # credit score < ~650
-            score -= 20
-            reasons.append("Credit score is below 650")
-
-        # --- DTI Ratio ---
-        if features["dti_ratio"] > 0.4:
-            score -= 15
-            reasons.append("High Debt-to-Income ratio increases repayment risk")
-
-        # --- LTV Ratio ---
-        if features["ltv_ratio"] > 0.8:
-            score -= 15
-            reasons.append("High Loan-to-Value ratio indicates low property equity")
-
-        # --- Fraud Check ---
-        if features["flag_fraud"] == 1:
-            score -= 25
-            reasons.append("Potential fraud signals detected in documents")
-
-        # --- Falling Property Trend ---
-        if features["flag_falling_property"] == 1:
-            score -= 10
-            reasons.append("Property value trend is falling")
-
-        # --- Final adjustments ---
-        if score < 0: score = 0
-        if score > 100: score = 100
-
-        # Risk Level
-        if score >= 75:
-            risk_level = "Low Risk"
-        elif score >= 50:
-            risk_level = "Medium Risk"
-        else:
-            risk_level = "High Risk"
+    def calculate_risk_batch(self, features_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score many applicants with one vectorized pass over the rule table"""
+        if not features_list:
+            return []
+        columns = {name: np.asarray([f[name] for f in features_list]) for name in self.rules.features}
+        return self._results(self.rules.evaluate_columns(columns))
+
+    def calculate_risk_frame(self, features, reasons: bool = True):
+        """Columnar scoring for a DataFrame of features; reasons are joined with "; " (or left out)"""
+        import pandas as pd
+
+        result = self.rules.evaluate_columns(features)
+        if not reasons:
+            return pd.DataFrame({"risk_score": result["risk_score"], "risk_level": result["risk_level"]},
+                                index=getattr(features, "index", None))
+        joined = np.asarray(["; ".join(r) for r in result["reason_lists"]], dtype=object)
+        return pd.DataFrame({
+            "risk_score": result["risk_score"],
+            "risk_level": result["risk_level"],
+            "reasons": joined[result["reason_index"]],
+        }, index=getattr(features, "index", None))
 
-        return {
-            "risk_score": score,
-            "risk_level": risk_level,
-            "reasons": reasons
-        }
+    def _results(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        as_int = self.rules._as_int
+        reason_lists = result["reason_lists"]
+        return [
+            {"risk_score": as_int(score), "risk_level": level, "reasons": reason_lists[i][:]}
+            for score, level, i in zip(result["risk_score"].tolist(), result["risk_level"].tolist(),
+                                       result["reason_index"].tolist())
+        ]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.portfolio_analytics import DEFAULT_RECOVERY_HAIRCUT, expected_loss
+
+# How a shock changes a feature column
+SHOCK_OPERATIONS = {
+    "add": lambda values, amount: values + amount,
+    "multiply": lambda values, amount: values * amount,
+    "set": lambda values, amount: np.full(len(values), amount, dtype=np.result_type(values, amount)),
+}
+
+# Declared value above market value by more than this share counts as overvalued under a price shock
+OVERVALUATION_MARGIN = 0.2
+
+
+class Scenario:
+    """
+    One macro scenario, applied to FeatureEngineer feature columns
+    - shocks: {feature: {"add" | "multiply" | "set": amount}}, e.g. {"regional_unemployment": {"add": 3}}
+    - property_price_change: relative move in market values (-0.15 = prices fall 15%); rescales
+      ltv_ratio, sets flag_falling_property and flags newly overvalued properties
+    - where: {column: [values]} limits the scenario to matching loans (e.g. {"industry": ["retail"]})
+    """
+
+    def __init__(self, name: str, shocks: Optional[Dict[str, Dict[str, float]]] = None,
+                 property_price_change: float = 0.0, where: Optional[Dict[str, List[Any]]] = None):
+        shocks = shocks or {}
+        for feature, shock in shocks.items():
+            if len(shock) != 1 or next(iter(shock)) not in SHOCK_OPERATIONS:
+                raise ValueError(f"Scenario {name!r}: shock on {feature} must be one of "
+                                 f"{', '.join(SHOCK_OPERATIONS)}, got {shock}")
+        if property_price_change <= -1:
+            raise ValueError(f"Scenario {name!r}: property_price_change must be above -1")
+        self.name = name
+        self.shocks = shocks
+        self.property_price_change = property_price_change
+        self.where = where or {}
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "Scenario":
+        return cls(name=config["name"], shocks=config.get("shocks"),
+                   property_price_change=config.get("property_price_change", 0.0), where=config.get("where"))
+
+    @classmethod
+    def load_all(cls, path: str) -> List["Scenario"]:
+        """Scenarios from a JSON list of {"name", "shocks", "property_price_change", "where"}"""
+        with open(path) as f:
+            return [cls.from_dict(config) for config in json.load(f)]
+
+    def changed_features(self) -> List[str]:
+        changed = list(self.shocks)
+        if self.property_price_change:
+            changed += ["market_value", "ltv_ratio", "flag_falling_property", "overvaluation_flag"]
+        return list(dict.fromkeys(changed))
+
+
+class ScenarioEngine:
+    """
+    Re-scores a book under many scenarios from one base feature matrix
+    - The base matrix (FeatureEngineer.calculate_features_frame output) is scored once
+    - A scenario copies only the columns it shocks, and only for the loans it applies to;
+      every other column is shared with the base matrix
+    - Scenarios that shock none of the scorer's input features reuse the base scores, and
+      scenarios whose scorer inputs match an earlier one reuse its scores
+    - Works with AIRiskScorer (summaries of probability_of_default) and RiskScorer (risk_score)
+    """
+
+    def __init__(self, scorer, features: pd.DataFrame, context: Optional[pd.DataFrame] = None,
+                 haircut: float = DEFAULT_RECOVERY_HAIRCUT):
+        self.scorer = scorer
+        self.features = features
+        # Columns scenarios may filter on that are not features (industry, employment_type, ...)
+        self.context = context
+        self.haircut = haircut
+        self.inputs = list(scorer.input_features)
+
+        base = scorer.calculate_risk_frame(features[self.inputs], reasons=False)
+        self.metric = "probability_of_default" if "probability_of_default" in base else "risk_score"
+        self.base_metric = base[self.metric].to_numpy(dtype=np.float64)
+        # Risk levels as small integer codes into self.levels, so migrations are a bincount
+        codes, levels = pd.factorize(base["risk_level"])
+        self.levels = list(levels)
+        self.base_level = codes
+        self.base_loss = self._expected_loss(self.base_metric, features)
+        self._memo: Dict[str, tuple] = {}
+
+    def _expected_loss(self, metric: np.ndarray, features) -> Optional[float]:
+        if self.metric != "probability_of_default" or not {"loan_amount", "market_value"} <= set(features):
+            return None
+        return float(expected_loss(metric, features["loan_amount"], features["market_value"], self.haircut).sum())
+
+    def _level_codes(self, levels) -> np.ndarray:
+        codes = pd.Index(self.levels).get_indexer(levels)
+        if (codes < 0).any():
+            # A level the base run never produced
+            self.levels += [str(level) for level in pd.unique(np.asarray(levels)[codes < 0])]
+            codes = pd.Index(self.levels).get_indexer(levels)
+        return codes
+
+    def _mask(self, scenario: Scenario) -> Optional[np.ndarray]:
+        """Loans the scenario applies to; None means all of them"""
+        if not scenario.where:
+            return None
+        mask = np.ones(len(self.features), dtype=bool)
+        for column, allowed in scenario.where.items():
+            source = self.context if self.context is not None and column in self.context else self.features
+            if column not in source:
+                raise KeyError(f"Scenario {scenario.name!r} filters on unknown column {column}")
+            mask &= pd.Series(source[column]).isin(allowed).to_numpy()
+        return mask
+
+    def shocked_columns(self, scenario: Scenario, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """New values of every column the scenario changes, for the given rows (all when None)"""
+        def base(name):
+            values = np.asarray(self.features[name])
+            return values if rows is None else values[rows]
+
+        shocked = {}
+        for feature, shock in scenario.shocks.items():
+            if feature not in self.features:
+                raise KeyError(f"Scenario {scenario.name!r} shocks unknown feature {feature}")
+            (operation, amount), = shock.items()
+            shocked[feature] = SHOCK_OPERATIONS[operation](base(feature), amount)
+
+        change = scenario.property_price_change
+        if change:
+            factor = 1 + change
+            market_value = shocked.get("market_value", base("market_value")) * factor
+            shocked["market_value"] = market_value
+            # LTV = loan / value, so it moves inversely with prices
+            shocked["ltv_ratio"] = shocked.get("ltv_ratio", base("ltv_ratio")) / factor
+            if change < 0:
+                shocked["flag_falling_property"] = np.ones(len(market_value), dtype=np.int64)
+            if "declared_value" in self.features and "overvaluation_flag" in self.features:
+                overvalued = base("declared_value") > market_value * (1 + OVERVALUATION_MARGIN)
+                shocked["overvaluation_flag"] = np.maximum(base("overvaluation_flag"), overvalued.astype(np.int64))
+        return shocked
+
+    def run(self, scenario: Scenario) -> Dict[str, Any]:
+        """Score one scenario and summarize how it moves the book"""
+        started = time.perf_counter()
+        mask = self._mask(scenario)
+        rows = None if mask is None else np.flatnonzero(mask)
+        n_shocked = len(self.features) if rows is None else len(rows)
+        relevant = [name for name in scenario.changed_features() if name in self.inputs]
+
+        reused_from = None
+        if not relevant or n_shocked == 0:
+            metric, level = self.base_metric, self.base_level
+            reused_from = "base"
+        else:
+            # Scenarios that feed the scorer identical inputs share one scoring pass
+            key = json.dumps([{k: v for k, v in scenario.shocks.items() if k in self.inputs},
+                              scenario.property_price_change if set(relevant) - set(scenario.shocks) else 0,
+                              scenario.where], sort_keys=True, default=str)
+            if key in self._memo:
+                metric, level, reused_from = self._memo[key]
+            else:
+                shocked = self.shocked_columns(scenario, rows)
+                inputs = pd.DataFrame({
+                    name: shocked[name] if name in shocked
+                    else (np.asarray(self.features[name]) if rows is None else np.asarray(self.features[name])[rows])
+                    for name in self.inputs
+                })
+                result = self.scorer.calculate_risk_frame(inputs, reasons=False)
+                if rows is None:
+                    metric = result[self.metric].to_numpy(dtype=np.float64)
+                    level = self._level_codes(result["risk_level"])
+                else:
+                    metric, level = self.base_metric.copy(), self.base_level.copy()
+                    metric[rows] = result[self.metric].to_numpy(dtype=np.float64)
+                    level[rows] = self._level_codes(result["risk_level"])
+                self._memo[key] = (metric, level, scenario.name)
+
+        summary = self.summarize(scenario, metric, level, rows)
+        summary.update({"loans_shocked": n_shocked, "reused_scores_from": reused_from,
+                        "seconds": round(time.perf_counter() - started, 4)})
+        return summary
+
+    def summarize(self, scenario: Scenario, metric: np.ndarray, level: np.ndarray,
+                  rows: Optional[np.ndarray]) -> Dict[str, Any]:
+        shift = metric - self.base_metric
+        moved = level != self.base_level
+        n_levels = len(self.levels)
+        counts = np.bincount(self.base_level[moved] * n_levels + level[moved], minlength=n_levels * n_levels)
+        migrations = {f"{self.levels[pair // n_levels]} -> {self.levels[pair % n_levels]}": int(counts[pair])
+                      for pair in np.flatnonzero(counts)}
+        summary = {
+            "scenario": scenario.name,
+            "metric": self.metric,
+            "base_mean": float(self.base_metric.mean()) if len(shift) else 0.0,
+            "stressed_mean": float(metric.mean()) if len(shift) else 0.0,
+            "mean_shift": float(shift.mean()) if len(shift) else 0.0,
+            "p95_abs_shift": float(np.percentile(np.abs(shift), 95)) if len(shift) else 0.0,
+            "max_abs_shift": float(np.abs(shift).max()) if len(shift) else 0.0,
+            "loans_changed": int(np.count_nonzero(shift)),
+            "level_migrations": migrations,
+        }
+        if self.base_loss is not None:
+            features = self.features
+            if scenario.property_price_change:
+                # Collateral is worth less, so recovery falls too
+                market_value = np.asarray(features["market_value"], dtype=np.float64).copy()
+                shocked = self.shocked_columns(scenario, rows)["market_value"]
+                if rows is None:
+                    market_value = shocked
+                else:
+                    market_value[rows] = shocked
+                features = {"loan_amount": features["loan_amount"], "market_value": market_value}
+            stressed_loss = self._expected_loss(metric, features)
+            summary.update({"base_expected_loss": self.base_loss, "stressed_expected_loss": stressed_loss,
+                            "expected_loss_change": stressed_loss / self.base_loss - 1 if self.base_loss else 0.0})
+        return summary
+
+    def run_all(self, scenarios: List[Scenario]) -> List[Dict[str, Any]]:
+        return [self.run(scenario) for scenario in scenarios]
+
+
+def load_book(input_path: str, chunksize: int = 50000, reference_path: Optional[str] = None,
+              context_columns=("industry", "employment_type", "price_trend")):
+    """Feature matrix and filter columns of every valid loan in a CSV or feature store"""
+    from modules.data_input import DataInputValidator
+    from modules.feature_engineering import FeatureEngineer
+    from modules.portfolio import read_chunks
+    from modules.reference_data import ReferenceData
+
+    validator, engineer = DataInputValidator(), FeatureEngineer()
+    reference = ReferenceData(reference_path) if reference_path else None
+    features, context = [], []
+    for chunk in read_chunks(input_path, chunksize):
+        if reference is not None:
+            filled = reference.resolve_columns(chunk)
+            if filled:
+                chunk = chunk.assign(**filled)
+        validation_result = validator.validate_frame(chunk)
+        if "valid" not in validation_result:
+            raise ValueError(validation_result["message"])
+        valid = np.asarray(validation_result["valid"], dtype=bool)
+        rows = chunk[valid] if not valid.all() else chunk
+        features.append(engineer.calculate_features_frame(rows))
+        context.append(pd.DataFrame({c: np.asarray(rows[c]) for c in context_columns if c in rows}))
+    return pd.concat(features, ignore_index=True), pd.concat(context, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # python -m modules.scenarios loan_risk_dataset.csv scenarios.json --engine compiled -o stress_report.json
+    import argparse
+    import sys
+
+    from modules.ml_risk_scoring import ENGINES
+
+    parser = argparse.ArgumentParser(prog="python -m modules.scenarios",
+                                     description="Re-score a loan book under macro stress scenarios.")
+    parser.add_argument("input", help="CSV in the loan_risk_dataset.csv layout, or a feature store directory")
+    parser.add_argument("scenarios", help="JSON list of scenarios")
+    parser.add_argument("--model", default="modules/model.pkl", help="Model file (default: modules/model.pkl)")
+    parser.add_argument("--engine", choices=[*ENGINES, "rules"], default="sklearn",
+                        help="Model engine, or rules for the rule-based RiskScorer (default: sklearn)")
+    parser.add_argument("--rules", help="Rules JSON for --engine rules (default: built-in rules)")
+    parser.add_argument("--reference-data", help="Reference data JSON filling external and location inputs")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("-o", "--output", help="Also write the per-scenario summaries as JSON")
+    args = parser.parse_args()
+
+    if args.engine == "rules":
+        from modules.risk_scoring import RiskScorer
+        scorer = RiskScorer(rules_path=args.rules)
+    else:
+        from modules.ml_risk_scoring import AIRiskScorer
+        scorer = AIRiskScorer(model_path=args.model, engine=args.engine)
+
+    scenarios = Scenario.load_all(args.scenarios)
+    started = time.perf_counter()
+    features, context = load_book(args.input, args.chunksize, args.reference_data)
+    engine = ScenarioEngine(scorer, features, context)
+    print(f"Scored {len(features):,} loans in {time.perf_counter() - started:.1f}s "
+          f"(base mean {engine.metric} {engine.base_metric.mean():.4f})")
+    summaries = []
+    for scenario in scenarios:
+        summary = engine.run(scenario)
+        summaries.append(summary)
+        reused = f" (reused {summary['reused_scores_from']})" if summary["reused_scores_from"] else ""
+        loss = (f", expected loss {summary['expected_loss_change']:+.1%}"
+                if summary.get("expected_loss_change") is not None else "")
+        print(f"{summary['scenario']:<30} mean {summary['stressed_mean']:.4f} ({summary['mean_shift']:+.4f}), "
+              f"{summary['loans_changed']:>10,} loans moved{loss}  {summary['seconds']:.2f}s{reused}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summaries, f, indent=2)
+            f.write("\n")
+    sys.exit(0)
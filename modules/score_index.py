@@ -0,0 +1,192 @@
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.dataset import DATASET_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Every input column a result depends on: validation and features read the dataset columns,
+# reference lookups the region and postcode keys. Other columns (labels, timestamps) are ignored.
+FINGERPRINT_COLUMNS = sorted([*DATASET_FIELDS, "region", "postcode"])
+
+# Fewer rescored rows than this keep the previous run's seconds-per-row estimate
+MIN_TIMED_ROWS = 1000
+
+# Result columns stored as text; the rest (probability, attributions) are floats
+TEXT_COLUMNS = ("status", "message", "risk_level", "reasons")
+
+
+def row_fingerprints(chunk: pd.DataFrame) -> np.ndarray:
+    """64-bit hash per row of the FINGERPRINT_COLUMNS present, as int64 (SQLite integers are signed)"""
+    columns = [c for c in FINGERPRINT_COLUMNS if c in chunk.columns]
+    # Whole numbers hash as float64 and complete flags as bool, whatever type their chunk was read with
+    recast = {c: "float64" for c in columns if pd.api.types.is_integer_dtype(chunk[c])}
+    recast.update({c: "bool" for c in columns
+                   if isinstance(chunk[c].dtype, pd.BooleanDtype) and not chunk[c].hasnans})
+    hashes = pd.util.hash_pandas_object(chunk[columns].astype(recast), index=False).to_numpy()
+    return hashes.view(np.int64)
+
+
+class ScoreIndex:
+    """
+    Persistent per-loan index for incremental portfolio runs
+    - SQLite file with one row per loan: its input fingerprint and its last result
+    - Every entry was scored under the result version in the meta table (model file, engine,
+      reasons, reference data); opening the index with another version drops every entry,
+      so the run after a model or rule change re-scores the whole book
+    - lookup() returns the stored results of loans whose fingerprint is unchanged; the rest
+      are scored and handed to store()
+    - prune() after a complete pass drops loans the run never looked up (repaid, sold), so the
+      index stays the size of the book
+    """
+
+    def __init__(self, path: str, version: str, result_columns: List[str]):
+        self.path = path
+        self.version = version
+        self.result_columns = ["status", "message", *result_columns]
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.previous_version = self._meta("version")
+        self.full_rescore = self.previous_version != version
+        stored_rate = self._meta("seconds_per_row")
+        self._previous_seconds_per_row = float(stored_rate) if stored_rate is not None else None
+        if self.full_rescore:
+            if self.previous_version is not None:
+                logger.info("Result version changed from %s to %s; re-scoring every loan", self.previous_version, version)
+            # One transaction: the index never pairs entries with the wrong version
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS loans")
+                columns = ", ".join(f'"{c}"' for c in self.result_columns)
+                self.conn.execute(f"CREATE TABLE loans (loan_id TEXT PRIMARY KEY, fingerprint INTEGER, {columns})")
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS chunk (position INTEGER, loan_id TEXT, fingerprint INTEGER)")
+        # Every loan id this run has looked up, for prune()
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (loan_id TEXT PRIMARY KEY)")
+
+        self.rows = 0
+        self.reused = 0
+        self.scored = 0
+        self.scoring_seconds = 0.0
+        self.pruned = 0
+        # Fingerprinting, lookups and stores: what the index costs on top of scoring
+        self.index_seconds = 0.0
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, loan_ids: np.ndarray, fingerprints: np.ndarray) -> pd.DataFrame:
+        """Stored results of the unchanged loans, indexed by their position in loan_ids"""
+        self.rows += len(loan_ids)
+        self.conn.execute("DELETE FROM temp.chunk")
+        self.conn.executemany("INSERT INTO temp.chunk VALUES (?, ?, ?)",
+                              zip(range(len(loan_ids)), loan_ids.tolist(), fingerprints.tolist()))
+        self.conn.execute("INSERT OR IGNORE INTO temp.seen SELECT loan_id FROM temp.chunk")
+        columns = ", ".join(f'l."{c}"' for c in self.result_columns)
+        rows = self.conn.execute(
+            f"SELECT c.position, {columns} FROM temp.chunk c "
+            "JOIN loans l ON l.loan_id = c.loan_id AND l.fingerprint = c.fingerprint").fetchall()
+        cached = pd.DataFrame(rows, columns=["position", *self.result_columns])
+        cached.index = cached.pop("position").astype(np.int64)
+        for column in self.result_columns:
+            if column not in TEXT_COLUMNS:
+                cached[column] = cached[column].astype(np.float64)
+        self.reused += len(cached)
+        return cached
+
+    def store(self, loan_ids: np.ndarray, fingerprints: np.ndarray, results: pd.DataFrame, seconds: float) -> None:
+        """Record freshly scored loans and the time scoring them took"""
+        started = time.perf_counter()
+        self.scored += len(loan_ids)
+        self.scoring_seconds += seconds
+        values = [results[c].astype(object).where(results[c].notna(), None).tolist() for c in self.result_columns]
+        placeholders = ", ".join("?" * (2 + len(self.result_columns)))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO loans VALUES ({placeholders})",
+                                  zip(loan_ids.tolist(), fingerprints.tolist(), *values))
+        self.index_seconds += time.perf_counter() - started
+
+    def prune(self) -> int:
+        """Delete the entries of loans not looked up this run; call only after the whole book was read"""
+        started = time.perf_counter()
+        with self.conn:
+            self.pruned = self.conn.execute(
+                "DELETE FROM loans WHERE loan_id NOT IN (SELECT loan_id FROM temp.seen)").rowcount
+        self.index_seconds += time.perf_counter() - started
+        return self.pruned
+
+    def seconds_per_row(self) -> Optional[float]:
+        if self.scored >= MIN_TIMED_ROWS:
+            return self.scoring_seconds / self.scored
+        return self._previous_seconds_per_row
+
+    def report(self) -> Dict[str, Any]:
+        per_row = self.seconds_per_row()
+        return {
+            "version": self.version,
+            "full_rescore": self.full_rescore,
+            "rows": self.rows,
+            "reused": self.reused,
+            "rescored": self.scored,
+            "pruned": self.pruned,
+            "skip_rate": round(self.reused / self.rows, 4) if self.rows else None,
+            "scoring_seconds": round(self.scoring_seconds, 3),
+            "index_seconds": round(self.index_seconds, 3),
+            # Estimate: reused rows at this run's (or the last timed run's) scoring cost per row, less the index's own cost
+            "seconds_saved": round(self.reused * per_row - self.index_seconds, 3) if per_row is not None else None,
+        }
+
+    def close(self) -> None:
+        if self.scored >= MIN_TIMED_ROWS:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('seconds_per_row', ?)",
+                                  (repr(self.scoring_seconds / self.scored),))
+        self.conn.close()
+
+
+class ChunkSplit(NamedTuple):
+    loan_ids: np.ndarray       # id column as strings, the index key
+    id_values: np.ndarray      # id column as read, for the output
+    fingerprints: np.ndarray
+    cached: pd.DataFrame       # stored results by position in the chunk
+    to_score: np.ndarray       # rows that are new or changed
+
+
+def split_chunk(index: ScoreIndex, chunk: pd.DataFrame, id_column: str) -> ChunkSplit:
+    """Which rows of a chunk can reuse their stored result"""
+    started = time.perf_counter()
+    id_values = chunk[id_column].to_numpy()
+    loan_ids = chunk[id_column].astype(str).to_numpy()
+    fingerprints = row_fingerprints(chunk)
+    cached = index.lookup(loan_ids, fingerprints)
+    to_score = np.ones(len(chunk), dtype=bool)
+    to_score[cached.index.to_numpy()] = False
+    index.index_seconds += time.perf_counter() - started
+    return ChunkSplit(loan_ids, id_values, fingerprints, cached, to_score)
+
+
+def merge_chunk(index: ScoreIndex, split: ChunkSplit, scored: Optional[pd.DataFrame], seconds: float,
+                row_offset: int, id_column: str) -> pd.DataFrame:
+    """Chunk output in input order: stored results re-emitted, scored rows (PortfolioScorer output
+    for split.to_score) recorded in the index"""
+    positions = np.flatnonzero(split.to_score)
+    parts = []
+    if len(split.cached):
+        reused_at = split.cached.index.to_numpy()
+        # Same layout as PortfolioScorer.score_chunk
+        reused = pd.DataFrame({id_column: split.id_values[reused_at], "row_id": row_offset + reused_at})
+        for column in index.result_columns:
+            reused[column] = split.cached[column].to_numpy()
+        parts.append(reused)
+    if scored is not None and len(positions):
+        scored = scored.reset_index(drop=True)
+        scored["row_id"] = row_offset + positions
+        index.store(split.loan_ids[positions], split.fingerprints[positions], scored, seconds)
+        parts.append(scored)
+    out = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return out.sort_values("row_id", kind="stable", ignore_index=True)
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.metrics import SHADOW_DROPPED_TOTAL, SHADOW_RESULTS_TOTAL, SHADOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def parse_specs(specs: str, model_path: str = "modules/model.pkl") -> List[Tuple[str, str, Optional[str]]]:
+    """Comma-separated shadow scorer specs -> [(spec, kind, path)].
+
+    "rules" or "rules:<rules.json>" is a RiskScorer; "<engine>" or "<engine>:<model.pkl>"
+    is an AIRiskScorer on that engine (default model_path). Files are checked here so a
+    bad spec fails before any shadow process starts.
+    """
+    from modules.ml_risk_scoring import ENGINES, model_artifact_path
+
+    parsed = []
+    for spec in (s.strip() for s in specs.split(",")):
+        if not spec:
+            continue
+        kind, _, path = spec.partition(":")
+        if kind == "rules":
+            path = path or None
+        elif kind in ENGINES:
+            path = path or model_path
+            if not os.path.exists(model_artifact_path(path, kind)):
+                raise FileNotFoundError(f"Shadow scorer '{spec}': {model_artifact_path(path, kind)} not found")
+        else:
+            raise ValueError(f"Unknown shadow scorer '{spec}', expected rules[:path] or one of "
+                             f"{', '.join(e + '[:path]' for e in ENGINES)}")
+        if path and not os.path.exists(path):
+            raise FileNotFoundError(f"Shadow scorer '{spec}': {path} not found")
+        parsed.append((spec, kind, path))
+    return parsed
+
+
+def build_scorers(specs: str, model_path: str = "modules/model.pkl") -> Dict[str, Any]:
+    """Shadow scorers by spec, e.g. "rules,sklearn:modules/model_v2.pkl" -> {spec: scorer}"""
+    from modules.feature_engineering import FeatureEngineer
+    from modules.ml_risk_scoring import AIRiskScorer
+    from modules.pipeline import file_fingerprint
+    from modules.risk_scoring import RiskScorer
+
+    scorers = {}
+    for spec, kind, path in parse_specs(specs, model_path):
+        if kind == "rules":
+            # Planned like the primary's rules: a reloaded file reading an unknown feature is rejected
+            scorers[spec] = RiskScorer(rules_path=path, engineer=FeatureEngineer())
+        else:
+            scorer = AIRiskScorer(model_path=path, engine=kind)
+            scorer.model_version = file_fingerprint(scorer.artifact_path)
+            scorers[spec] = scorer
+    return scorers
+
+
+# State of the shadow process, set up once by _init_process
+_PROCESS: Dict[str, Any] = {}
+
+
+def _init_process(specs: str, model_path: str, log_path: str) -> None:
+    # Lowest CPU priority: where cores are shared, request workers always run first
+    if hasattr(os, "nice"):
+        os.nice(19)
+    _PROCESS["scorers"] = build_scorers(specs, model_path)
+    _PROCESS["log"] = open(log_path, "a", buffering=1 << 16)
+
+
+def _ping() -> Dict[str, List[str]]:
+    return {name: list(scorer.input_features) for name, scorer in _PROCESS["scorers"].items()}
+
+
+def _score_batch(batch: List[Tuple]) -> List[Tuple[str, int, float, bool]]:
+    """Runs in the shadow process: score a batch with every shadow scorer and log it.
+
+    Returns (scorer, applicants, seconds, failed) per scorer for the parent's metrics.
+    """
+    features_list = [item[2] for item in batch]
+    shadow_results: Dict[str, List[Dict[str, Any]]] = {}
+    timings = []
+    for name, scorer in _PROCESS["scorers"].items():
+        refresh = getattr(scorer, "refresh", None)
+        if refresh is not None:
+            refresh()
+        started = time.perf_counter()
+        failed = False
+        try:
+            results = scorer.calculate_risk_batch(features_list)
+        except Exception as e:
+            logger.exception("Shadow scorer %s failed", name)
+            results = [{"error": str(e)}] * len(batch)
+            failed = True
+        timings.append((name, len(batch), time.perf_counter() - started, failed))
+        shadow_results[name] = results
+
+    log = _PROCESS["log"]
+    for i, (submitted_at, request_id, features, primary, model_version) in enumerate(batch):
+        record = {
+            "time": round(submitted_at, 6),
+            "request_id": request_id,
+            "model_version": model_version,
+            "features": features,
+            "primary": primary,
+            "shadows": {name: results[i] for name, results in shadow_results.items()},
+        }
+        log.write(json.dumps(record, default=float) + "\n")
+    log.flush()
+    return timings
+
+
+class ShadowRunner:
+    """
+    Shadow scoring off the request path
+    - submit() only enqueues the features the primary scorer already used
+    - A background thread groups queued applicants into batches and ships them to a
+      dedicated process, so shadow models never compete with requests for the GIL
+    - The shadow process calls calculate_risk_batch on every shadow scorer and appends
+      primary and shadow results to a JSON-lines log for offline comparison
+    - A full queue drops shadow work instead of slowing requests down
+    - A failing shadow scorer is logged and counted; it never affects the primary result
+    """
+
+    def __init__(self, specs: str, log_path: str, model_path: str = "modules/model.pkl",
+                 max_queue: int = 10000, max_batch_size: int = 256, max_wait_ms: float = 50.0,
+                 max_in_flight: int = 2, app: str = "ml"):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        if not parse_specs(specs, model_path):
+            raise ValueError("No shadow scorers given")
+        self.log_path = log_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.app = app
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._slots = threading.Semaphore(max_in_flight)
+        # spawn: forking a process that already runs threads (uvicorn, executors) is unsafe
+        self._pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_process, initargs=(specs, model_path, log_path))
+        # Fails here, at startup, when a spec or model file is bad
+        self.scorers = self._pool.submit(_ping).result()
+        # Features the primary pipeline computes on the shadow scorers' behalf
+        self.input_features = list(dict.fromkeys(f for features in self.scorers.values() for f in features))
+        self._thread = threading.Thread(target=self._worker, name="shadow-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, request_id: str, features: Dict[str, Any], primary: Dict[str, Any],
+               model_version: Optional[str] = None) -> bool:
+        """Queue one scored applicant; False if it was dropped"""
+        try:
+            self._queue.put_nowait((time.time(), request_id, features, primary, model_version))
+        except queue.Full:
+            SHADOW_DROPPED_TOTAL.inc(self.app)
+            return False
+        return True
+
+    def submit_many(self, request_ids: List[str], features_list: List[Dict[str, Any]],
+                    primaries: List[Dict[str, Any]], model_version: Optional[str] = None) -> int:
+        """Queue a scored batch; returns how many applicants were accepted"""
+        return sum(self.submit(request_id, features, primary, model_version)
+                   for request_id, features, primary in zip(request_ids, features_list, primaries))
+
+    def _worker(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            # Linger briefly so shadow scorers see a few large batches rather than many small ones
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            # While the shadow process is behind, the queue fills and further work is dropped
+            self._slots.acquire()
+            try:
+                future = self._pool.submit(_score_batch, batch)
+            except Exception:
+                self._slots.release()
+                logger.exception("Could not hand a batch of %d to the shadow process", len(batch))
+                continue
+            future.add_done_callback(self._record)
+
+    def _record(self, future) -> None:
+        self._slots.release()
+        try:
+            timings = future.result()
+        except Exception:
+            logger.exception("Shadow scoring failed")
+            return
+        for name, applicants, seconds, failed in timings:
+            SHADOW_RESULTS_TOTAL.inc(self.app, name, "error" if failed else "success", amount=applicants)
+            SHADOW_SECONDS.observe(seconds, self.app, name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"scorers": list(self.scorers), "queued": self._queue.qsize(), "log_path": self.log_path}
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Score what is already queued, then stop the batcher and the shadow process"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+
+def summarize(path: str) -> Dict[str, Dict[str, Any]]:
+    """Per shadow scorer: applicants, errors and agreement with the primary risk level"""
+    summary: Dict[str, Dict[str, Any]] = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            primary_level = record["primary"].get("risk_level")
+            for name, result in record["shadows"].items():
+                stats = summary.setdefault(name, {"applicants": 0, "errors": 0, "same_level": 0})
+                stats["applicants"] += 1
+                if "error" in result:
+                    stats["errors"] += 1
+                elif result.get("risk_level") == primary_level:
+                    stats["same_level"] += 1
+    for stats in summary.values():
+        scored = stats["applicants"] - stats["errors"]
+        stats["level_agreement"] = round(stats["same_level"] / scored, 4) if scored else None
+    return summary
+
+
+if __name__ == "__main__":
+    # Compare shadow scorers with the primary: python -m modules.shadow shadow_scores.jsonl
+    import sys
+
+    for name, stats in summarize(sys.argv[1] if len(sys.argv) > 1 else "shadow_scores.jsonl").items():
+        agreement = "n/a" if stats["level_agreement"] is None else f"{stats['level_agreement']:.1%}"
+        print(f"{name:<30} {stats['applicants']:>10,} applicants  {stats['errors']:>8,} errors  "
+              f"risk level agrees {agreement}")
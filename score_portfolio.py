@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+from modules.ml_risk_scoring import ENGINES, REASON_SOURCES
+from modules.portfolio import PortfolioScorer, open_writer, result_columns, result_version, score_file_parallel
+from modules.score_index import ScoreIndex
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="score-portfolio",
+        description="Stream a loan portfolio CSV (loan_risk_dataset.csv layout) through the scoring pipeline."
+    )
+    parser.add_argument("input", help="Input CSV with the loan_risk_dataset.csv columns, or a feature store directory")
+    parser.add_argument("output", help="Output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Output format (default: from extension)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument("--model", default="modules/model.pkl", help="Model file (default: modules/model.pkl)")
+    parser.add_argument("--engine", choices=ENGINES, default="sklearn",
+                        help="Model engine: pickled sklearn forest or exported node arrays (default: sklearn)")
+    parser.add_argument("--reasons", choices=REASON_SOURCES, default="thresholds",
+                        help="Reasons from fixed thresholds, or from the forest's per-feature TreeSHAP "
+                             "attributions, also written as attribution_<feature> columns (default: thresholds)")
+    parser.add_argument("--reference-data",
+                        help="Reference data JSON used to fill missing external and location columns "
+                             "from industry, region and postcode")
+    parser.add_argument("--id-column", help="Input column to carry through as the loan identifier")
+    parser.add_argument("--index",
+                        help="SQLite index of loan fingerprints and results (created if missing); only new or "
+                             "changed loans are scored, and a model, engine, reasons or reference data change "
+                             "re-scores everything. Needs --id-column")
+    parser.add_argument("--keep-unseen", action="store_true",
+                        help="Keep index entries of loans missing from this input, e.g. when scoring only part "
+                             "of the book (default: drop them once the run completes)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"Worker processes; 0 uses every core ({os.cpu_count()} here) (default: 1)")
+    args = parser.parse_args(argv)
+    if args.index and not args.id_column:
+        parser.error("--index needs --id-column")
+    return args
+
+
+def report_progress(rows_done: int, elapsed: float) -> None:
+    rate = rows_done / elapsed if elapsed > 0 else 0.0
+    print(f"scored {rows_done:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workers = args.workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    index = None
+    if args.index:
+        version = result_version(args.model, args.engine, args.reference_data, args.reasons)
+        index = ScoreIndex(args.index, version, result_columns(args.reasons))
+    writer = open_writer(args.output, args.format)
+    try:
+        if workers > 1:
+            rows = score_file_parallel(args.input, writer, workers, chunksize=args.chunksize,
+                                       model_path=args.model, id_column=args.id_column,
+                                       engine=args.engine, progress=report_progress,
+                                       reference_path=args.reference_data, reason_source=args.reasons,
+                                       index=index)
+        else:
+            scorer = PortfolioScorer(model_path=args.model, id_column=args.id_column, engine=args.engine,
+                                     reference_path=args.reference_data, reason_source=args.reasons)
+            rows = scorer.score_file(args.input, writer, chunksize=args.chunksize, progress=report_progress,
+                                     index=index)
+        if index is not None and not args.keep_unseen:
+            index.prune()
+    finally:
+        writer.close()
+        if index is not None:
+            index.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ Scored {rows:,} rows → {args.output} "
+          f"with {workers} worker(s) in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    if index is not None:
+        report = index.report()
+        saved = "n/a" if report["seconds_saved"] is None else f"~{report['seconds_saved']:.1f}s"
+        print(f"   index {args.index}: {'full re-score (new result version), ' if report['full_rescore'] else ''}"
+              f"{report['reused']:,} reused, {report['rescored']:,} re-scored, {report['pruned']:,} pruned, "
+              f"skip rate {report['skip_rate']:.1%}, index overhead {report['index_seconds']:.1f}s, "
+              f"net scoring time saved {saved}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+from itertools import combinations
+from math import factorial
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from modules import forest_engine
+from modules.forest_engine import CompiledForest
+from modules.ml_risk_scoring import ATTRIBUTION_REASONS, MODEL_FEATURES, AIRiskScorer
+
+
+def model_inputs(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(0, 1.2, n_rows), rng.uniform(0, 1.5, n_rows),
+                            rng.uniform(250, 900, n_rows), rng.integers(0, 2, n_rows)])
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    X = model_inputs(1000, seed=1)
+    y = (X[:, 0] + X[:, 1] - X[:, 2] / 850 + X[:, 3] + np.random.default_rng(2).normal(0, 0.3, len(X))) > 0.8
+    return RandomForestClassifier(n_estimators=8, max_depth=6, random_state=0).fit(X, y)
+
+
+def tree_expectation(tree, x, known, node=0):
+    """Positive-class output of one sklearn tree when only the features in known are set:
+    unknown splits take both children, weighted by their share of the node's cover"""
+    if tree.children_left[node] == -1:
+        value = tree.value[node, 0]
+        return value[1] / value.sum()
+    left, right = tree.children_left[node], tree.children_right[node]
+    feature = tree.feature[node]
+    if feature in known:
+        # Trees compare float32 inputs
+        child = left if np.float32(x[feature]) <= tree.threshold[node] else right
+        return tree_expectation(tree, x, known, child)
+    cover = tree.weighted_n_node_samples
+    return (cover[left] * tree_expectation(tree, x, known, left) +
+            cover[right] * tree_expectation(tree, x, known, right)) / cover[node]
+
+
+def brute_force_shapley(model, x):
+    """Shapley values of the coalition game defined by tree_expectation, averaged over the forest"""
+    n = len(x)
+
+    def value(known):
+        return np.mean([tree_expectation(e.tree_, x, known) for e in model.estimators_])
+
+    phi = np.zeros(n)
+    for j in range(n):
+        others = [k for k in range(n) if k != j]
+        for size in range(n):
+            weight = factorial(size) * factorial(n - size - 1) / factorial(n)
+            for members in combinations(others, size):
+                phi[j] += weight * (value(set(members) | {j}) - value(set(members)))
+    return phi, value(set())
+
+
+@pytest.mark.parametrize("max_cells", [forest_engine.MAX_COALITION_CELLS, 0])
+def test_attributions_match_brute_force(small_model, monkeypatch, max_cells):
+    # max_cells=0 sums every coalition over leaves instead of looking it up in a table
+    monkeypatch.setattr(forest_engine, "MAX_COALITION_CELLS", max_cells)
+    forest = CompiledForest.from_sklearn(small_model)
+    X = model_inputs(25, seed=3)
+    phi = forest.attributions(X)
+    for x, row in zip(X, phi):
+        expected, expected_value = brute_force_shapley(small_model, x)
+        np.testing.assert_allclose(row, expected, rtol=0, atol=1e-12)
+    assert forest.expected_value == pytest.approx(expected_value, abs=1e-12)
+
+
+def test_attributions_sum_to_prediction():
+    forest = CompiledForest.load("modules/model_forest")
+    X = model_inputs(2000)
+    phi = forest.attributions(X)
+    assert phi.shape == (len(X), len(MODEL_FEATURES))
+    np.testing.assert_allclose(phi.sum(axis=1), forest.predict_proba(X)[:, 1] - forest.expected_value,
+                               rtol=0, atol=1e-9)
+    # One row at a time gives the same values as a block
+    np.testing.assert_allclose(forest.attributions(X[7]), phi[7:8], rtol=0, atol=1e-12)
+
+
+def test_forest_without_cover_cannot_explain(small_model):
+    forest = CompiledForest.from_sklearn(small_model)
+    forest.cover = None
+    with pytest.raises(ValueError, match="node cover"):
+        forest.attributions(model_inputs(1))
+
+
+@pytest.fixture(scope="module")
+def features():
+    rng = np.random.default_rng(4)
+    n_rows = 300
+    return pd.DataFrame({
+        "dti_ratio": rng.uniform(0, 1, n_rows),
+        "ltv_ratio": rng.uniform(0, 1.3, n_rows),
+        "credit_score_normalized": rng.uniform(0.35, 1, n_rows),
+    })
+
+
+@pytest.mark.parametrize("engine", ["sklearn", "compiled"])
+def test_scorer_reasons_come_from_attributions(features, engine):
+    scorer = AIRiskScorer(engine=engine, reason_source="attributions")
+    rows = features.to_dict("records")
+    batch = scorer.calculate_risk_batch(rows)
+    frame = scorer.calculate_risk_frame(features)
+
+    phi = frame[[f"attribution_{name}" for name in MODEL_FEATURES]].to_numpy()
+    np.testing.assert_allclose(phi.sum(axis=1), frame["probability_of_default"] - scorer.expected_value,
+                               rtol=0, atol=1e-9)
+    for features_row, result, row in zip(rows, batch, phi):
+        assert result["attributions"] == {name: round(float(v), 4) for name, v in zip(MODEL_FEATURES, row)}
+        ranked = sorted((j for j, name in enumerate(MODEL_FEATURES) if name in ATTRIBUTION_REASONS and row[j] > 0),
+                        key=lambda j: -row[j])
+        assert result["reasons"] == [ATTRIBUTION_REASONS[MODEL_FEATURES[j]] for j in ranked[:scorer.top_k]]
+        assert scorer.calculate_risk(features_row) == result
+    assert frame["reasons"].tolist() == ["; ".join(result["reasons"]) for result in batch]
+
+    # The constant fraud flag is never a reason
+    reasons = {reason for result in batch for reason in result["reasons"]}
+    assert reasons <= set(ATTRIBUTION_REASONS.values())
+    assert "fraud_flag" not in ATTRIBUTION_REASONS
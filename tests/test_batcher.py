@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from modules.batcher import MicroBatcher
+from modules.executor import BoundedExecutor, QueueFullError
+
+
+class FakeScorer:
+    """Scores {"id": n} as {"id": n}; a batch holding a bad id fails as a whole, like a model call"""
+
+    def __init__(self, bad_ids=()):
+        self.bad_ids = set(bad_ids)
+        self.calls = []
+
+    def calculate_risk_batch(self, features_list):
+        ids = [features["id"] for features in features_list]
+        self.calls.append(ids)
+        bad = self.bad_ids.intersection(ids)
+        if bad:
+            raise ValueError(f"cannot score {sorted(bad)}")
+        return [{"id": i} for i in ids]
+
+
+async def predict_all(batcher, scorer, ids, timeout=5.0):
+    return await asyncio.gather(*(batcher.predict(scorer, {"id": i}, timeout) for i in ids),
+                                return_exceptions=True)
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor(max_workers=2, max_queue=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_concurrent_requests_share_one_call(executor):
+    scorer = FakeScorer()
+    results = asyncio.run(predict_all(MicroBatcher(executor, max_batch_size=32, max_wait_ms=20), scorer, range(10)))
+    assert results == [{"id": i} for i in range(10)]
+    assert scorer.calls == [list(range(10))]
+
+
+def test_failing_member_fails_alone(executor):
+    scorer = FakeScorer(bad_ids={3})
+    results = asyncio.run(predict_all(MicroBatcher(executor, max_batch_size=32, max_wait_ms=20), scorer, range(6)))
+
+    assert isinstance(results[3], ValueError)
+    assert "cannot score [3]" in str(results[3])
+    assert [r for i, r in enumerate(results) if i != 3] == [{"id": i} for i in range(6) if i != 3]
+    # The batch call failed, then every member was retried on its own
+    assert scorer.calls == [list(range(6))] + [[i] for i in range(6)]
+
+
+def test_full_batch_is_sent_without_waiting(executor):
+    scorer = FakeScorer()
+    # A wait far past the test timeout: only reaching max_batch_size can send these
+    batcher = MicroBatcher(executor, max_batch_size=4, max_wait_ms=60000)
+    results = asyncio.run(predict_all(batcher, scorer, range(8), timeout=1.0))
+    assert results == [{"id": i} for i in range(8)]
+    assert scorer.calls == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+
+def test_different_scorers_are_not_batched_together(executor):
+    first, second = FakeScorer(), FakeScorer()
+
+    async def interleaved():
+        batcher = MicroBatcher(executor, max_batch_size=32, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.predict(first if i < 3 else second, {"id": i}, 5.0) for i in range(5)))
+
+    assert asyncio.run(interleaved()) == [{"id": i} for i in range(5)]
+    assert first.calls == [[0, 1, 2]]
+    assert second.calls == [[3, 4]]
+
+
+def test_shed_batch_fails_every_member():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    scorer = FakeScorer()
+    release = threading.Event()
+
+    async def shed():
+        batcher = MicroBatcher(executor, max_batch_size=2, max_wait_ms=20)
+        # Hold the only executor slot so the batch is rejected on submission
+        blocker = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.01)
+        results = await predict_all(batcher, scorer, range(2))
+        release.set()
+        await blocker
+        return results
+
+    try:
+        results = asyncio.run(shed())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert all(isinstance(r, QueueFullError) for r in results)
+    assert scorer.calls == []
@@ -0,0 +1,174 @@
+import copy
+
+import pandas as pd
+import pytest
+
+from modules.data_input import INPUT_SCHEMA, OptionalField, DataInputValidator, extract_scoring_fields
+from modules.dataset import csv_dtypes
+
+VALID = {
+    "borrower_profile": {
+        "employment_type": "salaried",
+        "income_sources": [
+            {"source": "salary", "monthly_average_income": 50000, "income_stability_score": 0.9},
+            {"source": "rent", "monthly_average_income": 8000.5, "income_stability_score": 0.6}
+        ],
+        "bank_transactions": {"average_monthly_balance": 20000, "transaction_variance": 0.2},
+        "credit_score": 720
+    },
+    "loan_details": {"loan_amount": 200000, "interest_rate": 7.2, "tenure_years": 20},
+    "property_details": {"declared_value": 300000, "market_value": 290000},
+    "fraud_risk_signals": {"document_consistency_check": "passed"},
+    "external_data": {"industry": "IT", "industry_growth_rate": 0.05}
+}
+
+# Messages of the hand-written validator the compiled schema replaced, one per required field
+LEGACY_MISSING = {
+    ("borrower_profile", "employment_type"): "Missing borrower field: employment_type",
+    ("borrower_profile", "income_sources"): "Missing borrower field: income_sources",
+    ("borrower_profile", "bank_transactions"): "Missing borrower field: bank_transactions",
+    ("borrower_profile", "bank_transactions", "average_monthly_balance"):
+        "Missing field in bank_transactions: average_monthly_balance",
+    ("borrower_profile", "bank_transactions", "transaction_variance"):
+        "Missing field in bank_transactions: transaction_variance",
+    ("loan_details", "loan_amount"): "Missing loan field: loan_amount",
+    ("loan_details", "interest_rate"): "Missing loan field: interest_rate",
+    ("loan_details", "tenure_years"): "Missing loan field: tenure_years",
+    ("property_details", "declared_value"): "Missing property field: declared_value",
+    ("property_details", "market_value"): "Missing property field: market_value",
+    ("fraud_risk_signals", "document_consistency_check"): "Missing fraud field: document_consistency_check",
+    ("external_data", "industry"): "Missing external field: industry",
+    ("external_data", "industry_growth_rate"): "Missing external field: industry_growth_rate",
+}
+
+
+def changed(*path, value=None, remove=False):
+    """VALID with the field at path removed or set to value"""
+    data = copy.deepcopy(VALID)
+    parent = data
+    for key in path[:-1]:
+        parent = parent[key]
+    if remove:
+        del parent[path[-1]]
+    else:
+        parent[path[-1]] = value
+    return data
+
+
+def errors(data):
+    return DataInputValidator().validate_input(data).get("errors", [])
+
+
+def test_valid_payload_passes():
+    assert DataInputValidator().validate_input(VALID) == {"status": "success", "message": "Input validation passed"}
+    assert errors(changed("borrower_profile", "credit_score", remove=True)) == []
+
+
+def test_every_required_field_is_covered():
+    required = set()
+    for section, fields in INPUT_SCHEMA.items():
+        for name, spec in fields.items():
+            if not isinstance(spec, OptionalField):
+                required.add((section, name))
+            if isinstance(spec, dict):
+                required.update((section, name, nested) for nested in spec)
+    assert required == set(LEGACY_MISSING)
+
+
+@pytest.mark.parametrize("path", sorted(LEGACY_MISSING))
+def test_missing_field_keeps_legacy_message(path):
+    assert errors(changed(*path, remove=True)) == [LEGACY_MISSING[path]]
+
+
+def test_missing_sections_listed_in_schema_order():
+    data = copy.deepcopy(VALID)
+    del data["external_data"], data["loan_details"]
+    assert errors(data) == ["Missing sections: loan_details, external_data"]
+
+
+@pytest.mark.parametrize("data, message", [
+    ([VALID], "Application must be a JSON object"),
+    (changed("property_details", value=[1]), "Section property_details must be an object"),
+    (changed("borrower_profile", "income_sources", value=[]), "Borrower income_sources must be a non-empty list"),
+    (changed("borrower_profile", "income_sources", value={"source": "salary"}),
+     "Borrower income_sources must be a non-empty list"),
+    (changed("borrower_profile", "bank_transactions", value=5),
+     "Invalid type for borrower field: bank_transactions (expected object)"),
+    (changed("borrower_profile", "employment_type", value=3),
+     "Invalid type for borrower field: employment_type (expected string)"),
+    (changed("loan_details", "loan_amount", value="200000"), "Invalid type for loan field: loan_amount (expected number)"),
+    (changed("loan_details", "loan_amount", value=True), "Invalid type for loan field: loan_amount (expected number)"),
+    (changed("borrower_profile", "credit_score", value=None),
+     "Invalid type for borrower field: credit_score (expected number)"),
+    (changed("borrower_profile", "credit_score", value="720"),
+     "Invalid type for borrower field: credit_score (expected number)"),
+    (changed("loan_details", "debt_to_income_ratio", value="0.4"),
+     "Invalid type for loan field: debt_to_income_ratio (expected number)"),
+])
+def test_wrong_type(data, message):
+    assert errors(data) == [message]
+
+
+def test_list_items_report_their_index():
+    data = changed("borrower_profile", "income_sources", 1, "source", remove=True)
+    assert errors(data) == ["Missing field in income_sources[1]: source"]
+    data = changed("borrower_profile", "income_sources", 0, value="salary")
+    assert errors(data) == ["Invalid type for income_sources[0] (expected object)"]
+    data = changed("borrower_profile", "income_sources", 1, "monthly_average_income", value="8000")
+    assert errors(data) == ["Invalid type for field in income_sources[1]: monthly_average_income (expected number)"]
+
+
+def test_all_errors_reported_at_once():
+    data = changed("loan_details", "tenure_years", remove=True)
+    data["property_details"]["market_value"] = "x"
+    result = DataInputValidator().validate_input(data)
+    assert result["errors"] == ["Missing loan field: tenure_years",
+                                "Invalid type for property field: market_value (expected number)"]
+    assert result["message"] == "; ".join(result["errors"])
+
+
+def test_scoring_fields_keep_errors():
+    data = changed("loan_details", "loan_amount", value="200000")
+    data["borrower_profile"]["unused"] = {"nested": [1, 2]}
+    assert extract_scoring_fields(data) != data
+    assert errors(extract_scoring_fields(data)) == errors(data)
+
+
+@pytest.fixture
+def frame():
+    header = pd.read_csv("loan_risk_dataset.csv", nrows=0).columns
+    return pd.read_csv("loan_risk_dataset.csv", nrows=6, dtype=csv_dtypes(header))
+
+
+def test_frame_rows_fail_alone(frame):
+    frame["loan_amount"] = frame["loan_amount"].astype(object)
+    frame.loc[1, "loan_amount"] = "abc"
+    frame.loc[3, "industry"] = None
+    frame.loc[3, "credit_score"] = None
+    frame["unemployment_rate"] = frame["unemployment_rate"].astype(object)
+    frame.loc[4, "unemployment_rate"] = "high"
+
+    result = DataInputValidator().validate_frame(frame)
+    assert result["status"] == "partial"
+    assert result["message"] == "3 of 6 rows failed validation"
+    assert result["valid"] == [True, False, True, False, False, True]
+    assert result["errors"] == [
+        None,
+        "Invalid type for loan field: loan_amount (expected number)",
+        None,
+        "Missing external field: industry",
+        "Invalid type for property field: unemployment_rate (expected number)",
+        None,
+    ]
+    batch = DataInputValidator().validate_batch(frame)
+    assert [r["status"] for r in batch] == ["success", "error", "success", "error", "error", "success"]
+    assert batch[3]["errors"] == ["Missing external field: industry"]
+
+
+def test_frame_missing_required_columns(frame):
+    # credit_score is optional, so only industry is reported
+    result = DataInputValidator().validate_frame(frame.drop(columns=["industry", "credit_score"]))
+    assert result == {"status": "error", "message": "Missing columns: industry"}
+    batch = DataInputValidator().validate_batch(frame.drop(columns=["industry"]))
+    assert len(batch) == len(frame)
+    assert all(r["errors"] == ["Missing columns: industry"] for r in batch)
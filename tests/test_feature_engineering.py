@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.dataset import DATASET_FIELDS, csv_dtypes, row_to_payload
+from modules.feature_engineering import FEATURE_NAMES, FeatureEngineer
+
+DATASET = "loan_risk_dataset.csv"
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    header = pd.read_csv(DATASET, nrows=0).columns
+    return pd.read_csv(DATASET, nrows=500, dtype=csv_dtypes(header))
+
+
+def scalar_features(frame):
+    """calculate_features for every row, blank cells left out of the payload"""
+    engineer = FeatureEngineer()
+    return [engineer.calculate_features({}, row_to_payload({k: v for k, v in row.items() if not pd.isna(v)}))
+            for row in frame.to_dict("records")]
+
+
+def assert_same_features(frame_features, scalar_rows):
+    for name in FEATURE_NAMES:
+        expected = np.asarray([row[name] for row in scalar_rows], dtype=np.float64)
+        np.testing.assert_allclose(np.asarray(frame_features[name], dtype=np.float64), expected, err_msg=name)
+
+
+def test_frame_matches_scalar(dataset):
+    frame_features = FeatureEngineer().calculate_features_frame(dataset)
+    assert list(frame_features.columns) == FEATURE_NAMES
+    assert frame_features.index.equals(dataset.index)
+    assert_same_features(frame_features, scalar_features(dataset))
+
+
+def test_blank_cells_take_scalar_defaults(dataset):
+    rng = np.random.default_rng(0)
+    blanked = dataset.copy()
+    for column in ("income", "credit_score", "loan_to_value_ratio", "debt_to_income_ratio", "unemployment_rate",
+                   "rent_payment_on_time", "recession_indicator", "price_trend", "crime_index", "anomaly_patterns"):
+        blanked.loc[rng.random(len(blanked)) < 0.3, column] = None
+    assert_same_features(FeatureEngineer().calculate_features_frame(blanked), scalar_features(blanked))
+
+
+def test_absent_columns_take_scalar_defaults(dataset):
+    trimmed = dataset[["income", "loan_amount", "document_consistency_check"]]
+    assert_same_features(FeatureEngineer().calculate_features_frame(trimmed), scalar_features(trimmed))
+
+
+def test_dict_of_arrays_gives_dict(dataset):
+    columns = {name: dataset[name].to_numpy() for name in DATASET_FIELDS}
+    features = FeatureEngineer().calculate_features_frame(columns)
+    assert isinstance(features, dict)
+    assert_same_features(features, scalar_features(dataset))
@@ -0,0 +1,84 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from modules.forest_engine import CompiledForest
+from modules.ml_risk_scoring import MODEL_FEATURES
+
+
+def sklearn_proba(model, X):
+    """Positive-class probabilities, named columns for a model fitted on a frame"""
+    if getattr(model, "feature_names_in_", None) is not None:
+        X = pd.DataFrame(X, columns=model.feature_names_in_)
+    return model.predict_proba(X)[:, 1]
+
+
+def model_inputs(n_rows, seed=0):
+    """Rows spread over and beyond the training ranges of dti, ltv, credit score and fraud flag"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(0, 1.2, n_rows), rng.uniform(0, 1.5, n_rows),
+                            rng.uniform(250, 900, n_rows), rng.integers(0, 2, n_rows)])
+
+
+@pytest.fixture(scope="module")
+def sklearn_model():
+    return joblib.load("modules/model.pkl")
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    X = model_inputs(2000, seed=1)
+    y = (X[:, 0] + X[:, 1] - X[:, 2] / 850 + X[:, 3] + np.random.default_rng(2).normal(0, 0.3, len(X))) > 0.8
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize("model_name", ["sklearn_model", "small_model"])
+def test_probabilities_match_sklearn(request, model_name):
+    model = request.getfixturevalue(model_name)
+    forest = CompiledForest.from_sklearn(model)
+    X = model_inputs(3000)
+    expected = sklearn_proba(model, X)
+
+    for engine in ("bitmasks", "node walking"):
+        if engine == "node walking":
+            # As used for forests too large for leaf bitmasks
+            forest._bitmasks = None
+        proba = forest.predict_proba(X)
+        np.testing.assert_array_equal(proba[:, 1], expected, err_msg=engine)
+        np.testing.assert_allclose(proba[:, 0], 1 - expected, atol=1e-12, err_msg=engine)
+        np.testing.assert_array_equal([forest.predict_one(x) for x in X[:200]], expected[:200], err_msg=engine)
+
+
+def test_shipped_artifacts_match_pickle(sklearn_model):
+    X = model_inputs(2000)
+    expected = sklearn_proba(sklearn_model, X)
+    for path in ("modules/model_forest.npz", "modules/model_forest"):
+        forest = CompiledForest.load(path)
+        assert forest.feature_names == MODEL_FEATURES
+        np.testing.assert_array_equal(forest.predict_proba(X)[:, 1], expected, err_msg=path)
+
+
+def test_save_and_load_round_trip(small_model, tmp_path):
+    forest = CompiledForest.from_sklearn(small_model)
+    X = model_inputs(1000)
+    forest.save(str(tmp_path / "forest.npz"))
+    forest.save_mapped(str(tmp_path / "forest"))
+    # Saving over a mapped directory swaps it in place
+    forest.save_mapped(str(tmp_path / "forest"))
+    for path in (tmp_path / "forest.npz", tmp_path / "forest"):
+        loaded = CompiledForest.load(str(path))
+        np.testing.assert_array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+        np.testing.assert_array_equal(loaded.cover, forest.cover)
+
+
+def test_nan_input_is_rejected(small_model):
+    forest = CompiledForest.from_sklearn(small_model)
+    x = np.array([np.nan, 0.5, 600, 0])
+    with pytest.raises(ValueError, match="NaN"):
+        forest.predict_one(x)
+    with pytest.raises(ValueError, match="NaN"):
+        forest.predict_proba(np.vstack([model_inputs(3), x]))
+    with pytest.raises(ValueError, match="NaN"):
+        forest.attributions(x)
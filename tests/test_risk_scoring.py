@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.feature_engineering import FeatureEngineer
+from modules.risk_scoring import DEFAULT_RULE_SET, DEFAULT_RULES, RiskScorer, RuleSet
+
+
+def hand_written_risk(features):
+    """The hand-written rules the rule table replaced, kept as the reference"""
+    score = 100
+    reasons = []
+    if features["credit_score_normalized"] < 0.65:
+        score -= 20
+        reasons.append("Credit score is below 650")
+    if features["dti_ratio"] > 0.4:
+        score -= 15
+        reasons.append("High Debt-to-Income ratio increases repayment risk")
+    if features["ltv_ratio"] > 0.8:
+        score -= 15
+        reasons.append("High Loan-to-Value ratio indicates low property equity")
+    if features["flag_fraud"] == 1:
+        score -= 25
+        reasons.append("Potential fraud signals detected in documents")
+    if features["flag_falling_property"] == 1:
+        score -= 10
+        reasons.append("Property value trend is falling")
+    if score < 0: score = 0
+    if score > 100: score = 100
+    if score >= 75:
+        risk_level = "Low Risk"
+    elif score >= 50:
+        risk_level = "Medium Risk"
+    else:
+        risk_level = "High Risk"
+    return {"risk_score": score, "risk_level": risk_level, "reasons": reasons}
+
+
+def random_features(n_rows, seed=0):
+    """Feature rows around every threshold, the thresholds themselves included"""
+    rng = np.random.default_rng(seed)
+
+    def around(threshold, spread):
+        values = rng.uniform(threshold - spread, threshold + spread, n_rows)
+        values[rng.random(n_rows) < 0.1] = threshold
+        return values
+
+    columns = {
+        "credit_score_normalized": around(0.65, 0.3),
+        "dti_ratio": around(0.4, 0.3),
+        "ltv_ratio": around(0.8, 0.4),
+        "flag_fraud": rng.integers(0, 2, n_rows),
+        "flag_falling_property": rng.integers(0, 2, n_rows),
+    }
+    return [dict(zip(columns, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return random_features(2000)
+
+
+def test_calculate_risk_matches_hand_written(rows):
+    scorer = RiskScorer()
+    for features in rows:
+        result = scorer.calculate_risk(features)
+        assert result == hand_written_risk(features)
+        assert type(result["risk_score"]) is int
+
+
+def test_batch_matches_hand_written(rows):
+    results = RiskScorer().calculate_risk_batch(rows)
+    assert results == [hand_written_risk(features) for features in rows]
+    assert all(type(result["risk_score"]) is int for result in results)
+    assert RiskScorer().calculate_risk_batch([]) == []
+
+
+def test_frame_matches_hand_written(rows):
+    frame = pd.DataFrame(rows, index=pd.RangeIndex(100, 100 + len(rows)))
+    expected = [hand_written_risk(features) for features in rows]
+    result = RiskScorer().calculate_risk_frame(frame)
+    assert result.index.equals(frame.index)
+    assert result["risk_score"].tolist() == [r["risk_score"] for r in expected]
+    assert result["risk_level"].tolist() == [r["risk_level"] for r in expected]
+    assert result["reasons"].tolist() == ["; ".join(r["reasons"]) for r in expected]
+    assert list(RiskScorer().calculate_risk_frame(frame, reasons=False).columns) == ["risk_score", "risk_level"]
+
+
+def test_levels_default_to_the_built_in_ones(rows):
+    config = {key: value for key, value in DEFAULT_RULE_SET.items() if key != "levels"}
+    scorer = RiskScorer(RuleSet.from_dict(config))
+    assert [scorer.calculate_risk(features) for features in rows[:200]] == \
+        [hand_written_risk(features) for features in rows[:200]]
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"levels": []}, "at least one risk level"),
+    ({"levels": [{"label": "Low Risk"}]}, "missing min_score"),
+    ({"rules": [{"feature": "dti_ratio", "op": "=>", "threshold": 0.4, "penalty": 15, "reason": "x"}]},
+     "Unknown operator"),
+    ({"rules": [{"feature": "dti_ratio", "op": ">", "threshold": 0.4, "reason": "x"}]}, "missing penalty"),
+])
+def test_bad_rule_sets_are_rejected(change, message):
+    with pytest.raises(ValueError, match=message):
+        RuleSet.from_dict({**DEFAULT_RULE_SET, **change})
+
+
+def test_planning_leaves_default_rules_alone():
+    scorers = [RiskScorer(engineer=FeatureEngineer()) for _ in range(2)]
+    assert not hasattr(DEFAULT_RULES, "feature_plan")
+    assert scorers[0].rules is not scorers[1].rules
+    assert all(scorer.rules.feature_plan is not None for scorer in scorers)
+
+
+def test_refresh_swaps_in_changed_rules(tmp_path, rows):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(DEFAULT_RULE_SET))
+    scorer = RiskScorer(rules_path=str(path), engineer=FeatureEngineer())
+    assert not scorer.refresh()
+
+    stricter = {**DEFAULT_RULE_SET, "base_score": 90}
+    path.write_text(json.dumps(stricter))
+    os.utime(path, (0, os.path.getmtime(path) + 10))
+    assert scorer.refresh()
+    assert scorer.calculate_risk(rows[0])["risk_score"] == max(hand_written_risk(rows[0])["risk_score"] - 10, 0)
+
+    # A broken file keeps the current rules
+    path.write_text("{")
+    os.utime(path, (0, os.path.getmtime(path) + 20))
+    assert not scorer.refresh()
+    assert scorer.rules.base_score == 90
@@ -1,25 +1,175 @@
+import argparse
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
 
 import pandas as pd
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 import joblib
+from modules.feature_store import FeatureStore, is_store
+from modules.forest_engine import CompiledForest
+from modules.ml_risk_scoring import MODEL_FEATURES
 
-# Load dataset
-df = pd.read_csv("loan_risk_dataset.csv")
+TARGET = "default"
 
-# Features & Target
-X = df[["dti_ratio", "ltv_ratio", "credit_score", "fraud_flag"]]
-y = df["default"]
+# Explicit column types so chunked reads never depend on per-chunk type inference
+TRAINING_DTYPES = {
+    "dti_ratio": "float64",
+    "ltv_ratio": "float64",
+    "credit_score": "float64",
+    "fraud_flag": "int8",
+    TARGET: "int8",
+}
 
-# Split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Train
-model = RandomForestClassifier(n_estimators=200, random_state=42)
-model.fit(X_train, y_train)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="train-model",
+        description="Train (or extend) the random forest used by AIRiskScorer and export its artifacts."
+    )
+    parser.add_argument("--data", default="synthetic_loan_data.csv",
+                        help=f"Labelled CSV or feature store with {', '.join(MODEL_FEATURES)} and {TARGET} "
+                             "(default: synthetic_loan_data.csv)")
+    parser.add_argument("--output", default="modules/model.pkl", help="Model file (default: modules/model.pkl)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per CSV chunk (default: 100000)")
+    parser.add_argument("--n-estimators", type=int, default=200, help="Trees in a fresh forest (default: 200)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used for fitting; -1 uses every core (default: -1)")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Held-out fraction for accuracy (default: 0.2)")
+    parser.add_argument("--random-state", type=int, default=42, help="Seed for the split and the forest (default: 42)")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Load the existing --output model and add --add-trees trees fitted on --data")
+    parser.add_argument("--add-trees", type=int, default=50, help="Trees added by --warm-start (default: 50)")
+    return parser.parse_args(argv)
 
-print("Model Accuracy:", model.score(X_test, y_test))
 
-# Save model
-joblib.dump(model, "modules/model.pkl")
-print("✅ Trained model saved at modules/model.pkl")
+def metadata_path(model_path: str) -> str:
+    """Sidecar metadata file: modules/model.pkl -> modules/model.json"""
+    return model_path.rsplit(".", 1)[0] + ".json"
+
+
+def file_sha256(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def data_sha256(path: str) -> str:
+    """Hash of a CSV, or of every file of a feature store in name order"""
+    if is_store(path):
+        return file_sha256(*(os.path.join(path, name) for name in sorted(os.listdir(path))))
+    return file_sha256(path)
+
+
+def load_training_data(path: str, chunksize: int) -> pd.DataFrame:
+    """Read only the model columns, chunk by chunk with fixed dtypes, or map them from a feature store"""
+    columns = MODEL_FEATURES + [TARGET]
+    if is_store(path):
+        df = FeatureStore(path).frame(columns)
+    else:
+        chunks = pd.read_csv(path, usecols=columns, dtype=TRAINING_DTYPES, chunksize=chunksize)
+        df = pd.concat(chunks, ignore_index=True)
+    missing = df.isna().any()
+    if missing.any():
+        raise ValueError(f"Missing values in {path}: {', '.join(missing[missing].index)}")
+    return df[columns]
+
+
+def peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    # Load dataset
+    df = load_training_data(args.data, args.chunksize)
+    data_hash = data_sha256(args.data)
+    loaded = time.perf_counter()
+
+    # Features & Target
+    X = df[MODEL_FEATURES]
+    y = df[TARGET]
+
+    # Split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size,
+                                                        random_state=args.random_state)
+
+    # Train
+    parent = None
+    if args.warm_start:
+        model = joblib.load(args.output)
+        if list(getattr(model, "feature_names_in_", MODEL_FEATURES)) != MODEL_FEATURES:
+            raise ValueError(f"{args.output} was trained on different features")
+        if os.path.exists(metadata_path(args.output)):
+            with open(metadata_path(args.output)) as f:
+                parent = json.load(f)
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + args.add_trees, n_jobs=args.n_jobs)
+    else:
+        model = RandomForestClassifier(n_estimators=args.n_estimators, random_state=args.random_state,
+                                       n_jobs=args.n_jobs)
+    model.fit(X_train, y_train)
+    fitted = time.perf_counter()
+    # Scoring runs one applicant at a time; keep the saved model single-threaded
+    model.set_params(n_jobs=None, warm_start=False)
+
+    accuracy = model.score(X_test, y_test)
+    print("Model Accuracy:", accuracy)
+
+    # Save model
+    joblib.dump(model, args.output)
+    print(f"✅ Trained model saved at {args.output}")
+
+    # Export the flat node arrays used by AIRiskScorer(engine="compiled"): a portable .npz,
+    # and a directory every worker on a host memory-maps instead of loading its own copy
+    compiled = CompiledForest.from_sklearn(model)
+    mapped_path = os.path.splitext(args.output)[0] + "_forest"
+    compiled_path = mapped_path + ".npz"
+    compiled.save(compiled_path)
+    compiled.save_mapped(mapped_path)
+    print(f"✅ Compiled forest saved at {compiled_path} and {mapped_path}/")
+
+    elapsed = time.perf_counter() - started
+    metadata = {
+        "version": file_sha256(args.output)[:12],
+        "compiled_version": file_sha256(compiled_path)[:12],
+        "parent_version": parent["version"] if parent else None,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "features": MODEL_FEATURES,
+        "target": TARGET,
+        "n_estimators": len(model.estimators_),
+        "trees_added": args.add_trees if args.warm_start else len(model.estimators_),
+        "data_path": args.data,
+        "data_sha256": data_hash,
+        "training_rows": len(X_train),
+        "total_training_rows": len(X_train) + (parent["total_training_rows"] if parent else 0),
+        "test_accuracy": round(float(accuracy), 6),
+        "load_seconds": round(loaded - started, 3),
+        "fit_seconds": round(fitted - loaded, 3),
+        "total_seconds": round(elapsed, 3),
+        "peak_memory_mb": round(peak_memory_mb(), 1),
+        "n_jobs": args.n_jobs,
+        "sklearn_version": sklearn.__version__,
+    }
+    with open(metadata_path(args.output), "w") as f:
+        json.dump(metadata, f, indent=2)
+        f.write("\n")
+    print(f"✅ Metadata saved at {metadata_path(args.output)} (version {metadata['version']})")
+
+    print(f"⏱️ {len(df):,} rows: load {metadata['load_seconds']:.2f}s, fit {metadata['fit_seconds']:.2f}s, "
+          f"total {elapsed:.2f}s, peak memory {metadata['peak_memory_mb']:,.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())